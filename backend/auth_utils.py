@@ -1,7 +1,16 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 from passlib.context import CryptContext
 
+# bcrypt cost factor; raising it makes existing hashes get upgraded on their next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     """Hash a password for storing."""
@@ -9,4 +18,95 @@ def hash_password(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a stored password against one provided by user."""
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password: str, hashed_password: str):
+    """
+    Verify a password and, if its hash uses an outdated cost, return a fresh hash.
+
+    Returns ``(ok, new_hash)``; ``new_hash`` is None when the stored hash is current.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class HashQueueFull(Exception):
+    """Raised when the hashing pool already has ``max_pending`` jobs waiting."""
+
+
+class HashingPool:
+    """
+    Runs bcrypt in a small process pool so it never occupies the event loop or request threads.
+
+    At most ``max_pending`` hashes may be queued or running; past that,
+    callers get ``HashQueueFull`` straight away instead of waiting behind a
+    burst of signups.
+
+    Args:
+        workers: Worker processes (bcrypt is CPU-bound, so about one per core).
+        max_pending: Jobs allowed in flight before new ones are rejected.
+    """
+
+    def __init__(self, workers=None, max_pending=64):
+        self.workers = max(1, int(workers or min(4, os.cpu_count() or 1)))
+        self.max_pending = max(1, int(max_pending))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool configured from HASH_WORKERS / HASH_MAX_PENDING."""
+        return cls(
+            workers=int(os.getenv("HASH_WORKERS", "0")) or None,
+            max_pending=int(os.getenv("HASH_MAX_PENDING", "64")),
+        )
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HashQueueFull()
+            self._pending += 1
+            executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        return await self._run(verify_and_update, password, hashed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": BCRYPT_ROUNDS,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool.from_env()
@@ -0,0 +1,435 @@
+# backend/benchmarks/bench_api.py
+"""End-to-end load test of the whole API.
+
+Seeds a SQLite database in the temp directory (users with phone numbers,
+posts a second apart), starts a stub OpenAI-compatible server on a local port
+and a stub model behind the shared-memory inference server protocol, then runs
+``backend.main:app`` under uvicorn in a subprocess pointed at all three with
+INFERENCE_BACKEND=remote (SMS goes through the in-process stub transport). The
+stub model answers after ``--model-latency-ms`` without TensorFlow, so predict
+measures upload handling, preprocessing, batching, caching and remedies; pass
+``--real-model`` to load the configured INFERENCE_BACKEND instead. A fixed number of concurrent clients then send a weighted mix of
+real requests for ``--duration`` seconds after a warm-up:
+
+    predict   POST /predict/predict   multipart JPEG upload (pool of distinct images)
+    feed      GET  /community/posts   first page, or the next page of the client's scroll
+    like      POST /community/posts/{post_id}/like
+    otp       POST /auth/auth/send-otp
+    chat      POST /explore/chat      (pool of questions, so the chat cache sees repeats)
+
+Throughput, error counts and client-side p50/p95/p99 are reported per scenario.
+A saved run is a baseline for later ones; a p95 or throughput regression
+beyond ``--tolerance`` exits non-zero. ``api_baseline.json`` next to this file
+is the default baseline. It was recorded with the defaults (stub model), so a
+run is only compared against it when its mix, concurrency, workers and model
+match. Re-record it on the machine that runs the comparison:
+
+    python -m backend.benchmarks.bench_api                              # compared to api_baseline.json
+    python -m backend.benchmarks.bench_api --save-baseline backend/benchmarks/api_baseline.json
+    python -m backend.benchmarks.bench_api --concurrency 32 --duration 30 --baseline my_baseline.json
+    python -m backend.benchmarks.bench_api --no-predict --mix feed=10,like=3,otp=1,chat=2 --baseline ""
+
+Server-side stage timings for the run are in the app's /metrics, saved with
+``--metrics-out``.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Absolute, so the uvicorn subprocess opens the database seeded here whatever its working directory
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "cropcare_api_bench.sqlite3"))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from ..database import Base, engine, models  # noqa: E402
+from ..inference.backends import InferenceBackend  # noqa: E402
+from ..inference.labels import class_names  # noqa: E402
+from ..inference.server import serve  # noqa: E402
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "api_baseline.json")
+DEFAULT_MIX = "predict=2,feed=10,like=4,otp=1,chat=2"
+QUESTIONS = [
+    "How do I treat early blight on tomatoes?", "When should I irrigate potatoes?",
+    "What causes yellow leaves on corn?", "Is neem oil safe for grapes?", "How to prevent apple scab?",
+    "Best fertilizer for peppers?", "How do I control powdery mildew?", "Why are my strawberries rotting?",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible ``/chat/completions`` with a fixed delay; streams when asked to."""
+
+    latency = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+        words = "Remove infected leaves, improve airflow and apply a copper-based fungicide weekly.".split()
+        if payload.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in words:
+                self._chunk(f"data: {json.dumps({'choices': [{'delta': {'content': word + ' '}}]})}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self._chunk("")
+            return
+        body = json.dumps({"choices": [{"message": {"role": "assistant", "content": " ".join(words)}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_llm(latency):
+    handler = type("Handler", (StubLLMHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class StubModel(InferenceBackend):
+    """Stands in for the classifier: a fixed delay per forward pass, one confident class per image."""
+
+    name = "stub"
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def predict(self, batch):
+        time.sleep(self.latency)
+        classes = len(class_names)
+        picks = (np.abs(batch.reshape(len(batch), -1).mean(axis=1)) * 1e4).astype(int) % classes
+        probabilities = np.full((len(batch), classes), 0.1 / (classes - 1), dtype=np.float32)
+        probabilities[np.arange(len(batch)), picks] = 0.9
+        return probabilities
+
+
+def start_stub_model(latency, socket_path):
+    """Serve ``StubModel`` on ``socket_path`` for API workers running with INFERENCE_BACKEND=remote."""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    threading.Thread(target=serve, args=(listener, StubModel(latency)), daemon=True).start()
+    return listener
+
+
+def seed(users, posts):
+    """Fresh tables with ``users`` phone-verified users and ``posts`` posts, a second apart."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [{
+            "id": i, "username": f"bench{i}", "email": f"bench{i}@example.com",
+            "password_hash": "x", "phone_number": phone(i),
+        } for i in range(1, users + 1)])
+        # Distinct timestamps, so feed cursors walk the whole history like a real feed
+        start = datetime.now(timezone.utc) - timedelta(seconds=posts)
+        conn.execute(models.Post.__table__.insert(), [{
+            "user_id": 1 + i % users, "content": f"Synthetic post {i} about tomato blight",
+            "created_at": start + timedelta(seconds=i),
+        } for i in range(posts)])
+
+
+def phone(user_id):
+    return f"+9190000{user_id:05d}"
+
+
+def image_pool(size, seed=0):
+    """``size`` distinct phone-camera-sized JPEGs, so the prediction cache only helps on repeats."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(size):
+        base = rng.integers(0, 255, (3,), dtype=np.uint8)
+        pixels = np.clip(base + rng.normal(0, 25, (960, 1280, 3)), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, format="JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def scenarios(args, images):
+    async def predict(client, rng):
+        files = {"file": ("leaf.jpg", rng.choice(images), "image/jpeg")}
+        return await client.post("/predict/predict", files=files)
+
+    cursors = {}
+
+    async def feed(client, rng):
+        # Each client either starts over or keeps scrolling from where it left off
+        params = {"limit": 20}
+        if id(rng) in cursors and rng.random() < 0.7:
+            params["cursor"] = cursors[id(rng)]
+        response = await client.get("/community/posts", params=params)
+        if response.headers.get("x-next-cursor"):
+            cursors[id(rng)] = response.headers["x-next-cursor"]
+        else:
+            cursors.pop(id(rng), None)
+        return response
+
+    async def like(client, rng):
+        return await client.post(
+            f"/community/posts/{rng.randint(1, args.posts)}/like", json={"user_id": rng.randint(1, args.users)}
+        )
+
+    async def otp(client, rng):
+        return await client.post("/auth/auth/send-otp", json={"phone_number": phone(rng.randint(1, args.users))})
+
+    async def chat(client, rng):
+        return await client.post("/explore/chat", json={"query": rng.choice(QUESTIONS), "lang": "en"})
+
+    return {"predict": predict, "feed": feed, "like": like, "otp": otp, "chat": chat}
+
+
+def parse_mix(text, no_predict):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    if no_predict:
+        mix.pop("predict", None)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, name, seconds, status):
+        self.latencies.setdefault(name, []).append(seconds * 1000.0)
+        counts = self.statuses.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+        if not 200 <= status < 300:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def drive(base_url, mix, handlers, concurrency, seconds, seed=0):
+    recorder = Recorder()
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker(index):
+            rng = random.Random(seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = (await handlers[name](client, rng)).status_code
+                except httpx.HTTPError:
+                    status = 599
+                recorder.record(name, time.perf_counter() - started, status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for name, latencies in sorted(recorder.latencies.items()):
+        routes[name] = {
+            "requests": len(latencies),
+            "errors": recorder.errors.get(name, 0),
+            "statuses": {str(k): v for k, v in sorted(recorder.statuses[name].items())},
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {"elapsed_s": round(elapsed, 2), "total_rps": round(total / elapsed, 1), "routes": routes}
+
+
+def compare(result, baseline, tolerance):
+    """Regressions vs ``baseline``: lower total throughput, or a higher p95 / error rate on any route."""
+    problems = []
+    if result["total_rps"] < baseline["total_rps"] * (1 - tolerance):
+        problems.append(f"throughput {result['total_rps']} req/s vs baseline {baseline['total_rps']} req/s")
+    for name, route in result["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is None:
+            continue
+        # 1 ms of slack so sub-millisecond routes don't flap on noise
+        if route["p95_ms"] > before["p95_ms"] * (1 + tolerance) + 1.0:
+            problems.append(f"{name}: p95 {route['p95_ms']} ms vs baseline {before['p95_ms']} ms")
+        if route["errors"] / route["requests"] > before["errors"] / max(before["requests"], 1) + 0.01:
+            problems.append(f"{name}: {route['errors']}/{route['requests']} errors (baseline {before['errors']}/{before['requests']})")
+    return problems
+
+
+def start_server(args, llm_url, model_socket=None):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": llm_url,
+        "OPENAI_API_KEY": "bench",
+        "SMS_TRANSPORT": "stub",
+        "ENABLE_PREDICT": "0" if args.no_predict else "1",
+        "PYTHONPATH": os.pathsep.join(filter(None, [PROJECT_ROOT, env.get("PYTHONPATH")])),
+    })
+    if model_socket:
+        env.update({"INFERENCE_BACKEND": "remote", "INFERENCE_SOCKET": model_socket})
+    # OTP sends are the traffic here, not abuse
+    env.setdefault("OTP_RATE_LIMIT", "1000000")
+    # Stub-LLM remedies must not end up in the real remedy store
+    env.setdefault("REMEDY_STORE_PATH", os.path.join(tempfile.gettempdir(), "cropcare_api_bench_remedies.json"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {server.returncode} during startup")
+        try:
+            if httpx.get(base_url + "/", timeout=1.0).status_code == 200:
+                return server, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"API did not come up within {args.startup_timeout}s")
+
+
+def print_result(result):
+    print(f"{'route':>8} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, route in result["routes"].items():
+        print(f"{name:>8} {route['requests']:>9} {route['errors']:>7} {route['rps']:>8.1f} "
+              f"{route['p50_ms']:>8.2f} {route['p95_ms']:>8.2f} {route['p99_ms']:>8.2f}")
+    print(f"{'total':>8} {'':>9} {'':>7} {result['total_rps']:>8.1f}")
+    for name, route in result["routes"].items():
+        if route["errors"]:
+            print(f"  {name} statuses: {route['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. %(default)s")
+    parser.add_argument("--no-predict", action="store_true", help="Run with ENABLE_PREDICT=0 and no uploads")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--images", type=int, default=16, help="Distinct upload images")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Stub LLM response delay")
+    parser.add_argument("--model-latency-ms", type=float, default=30.0, help="Stub model delay per forward pass")
+    parser.add_argument("--real-model", action="store_true",
+                        help="Predict with the configured INFERENCE_BACKEND instead of the stub model")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--metrics-out", help="Save the app's /metrics after the run")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help='Baseline JSON to compare against (default: %(default)s; "" to skip)')
+    parser.add_argument("--save-baseline", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.workers > 1 and os.getenv("OTP_STORE", "memory") != "redis":
+        parser.error("--workers above 1 needs the shared OTP store: set OTP_STORE=redis and REDIS_URL")
+    mix = parse_mix(args.mix, args.no_predict)
+    seed(args.users, args.posts)
+    images = image_pool(args.images) if "predict" in mix else []
+    handlers = scenarios(args, images)
+    unknown = set(mix) - set(handlers)
+    if unknown:
+        parser.error(f"unknown scenarios in --mix: {', '.join(sorted(unknown))}")
+
+    llm = start_stub_llm(args.llm_latency_ms / 1000.0)
+    model = model_socket = None
+    if "predict" in mix and not args.real_model:
+        model_socket = os.path.join(tempfile.gettempdir(), f"cropcare_bench_model_{os.getpid()}.sock")
+        model = start_stub_model(args.model_latency_ms / 1000.0, model_socket)
+    server, base_url = start_server(args, f"http://127.0.0.1:{llm.server_address[1]}", model_socket)
+    try:
+        if args.warmup > 0:
+            asyncio.run(drive(base_url, mix, handlers, args.concurrency, args.warmup, seed=1))
+        recorder, elapsed = asyncio.run(drive(base_url, mix, handlers, args.concurrency, args.duration))
+        if args.metrics_out:
+            with open(args.metrics_out, "w") as f:
+                f.write(httpx.get(base_url + "/metrics").text)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        llm.shutdown()
+        if model is not None:
+            model.close()
+            os.unlink(model_socket)
+
+    result = summarize(recorder, elapsed)
+    result["config"] = {
+        "concurrency": args.concurrency, "duration": args.duration, "mix": mix, "workers": args.workers,
+        "users": args.users, "posts": args.posts, "llm_latency_ms": args.llm_latency_ms,
+        "model": "real" if args.real_model else f"stub ({args.model_latency_ms:g} ms)",
+    }
+    print_result(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+    # Comparing a freshly saved baseline with itself proves nothing
+    if args.baseline and os.path.abspath(args.baseline) != os.path.abspath(args.save_baseline or ""):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        recorded = baseline.get("config", {})
+        different = [key for key in ("mix", "concurrency", "workers", "model") if recorded.get(key) != result["config"][key]]
+        if different and args.baseline == BASELINE_PATH:
+            # The committed baseline only speaks for the setup it was recorded with
+            print(f"Not compared: {BASELINE_PATH} was recorded with a different {', '.join(different)}")
+            return
+        if different:
+            print(f"WARNING: baseline was recorded with a different {', '.join(different)}")
+        problems = compare(result, baseline, args.tolerance)
+        if problems:
+            for problem in problems:
+                print(f"REGRESSION: {problem}")
+            raise SystemExit(1)
+        print(f"OK: within {args.tolerance:.0%} of baseline ({baseline['total_rps']} req/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# backend/benchmarks/bench_cascade.py
+"""Accuracy and latency of crop-routed inference against the full model.
+
+Runs every image through three modes:
+
+    full        the full model, all classes (today's /predict)
+    crop        the crop is known (taken from the image's label), as with /predict?crop=...
+    cascade     no crop given; the configured router decides (CASCADE_ROUTER_MODEL,
+                CASCADE_HEADS_DIR, CASCADE_THRESHOLD), falling back to the full model
+
+With ``--data`` pointing at a PlantVillage-style folder (one sub-folder per
+class name, e.g. ``Tomato___Early_blight/``) top-1 accuracy is reported per
+mode; without it only latency is measured, on synthetic photos.
+
+    python -m backend.benchmarks.bench_cascade --data ~/plantvillage/val --per-class 20
+    CASCADE_ROUTER_MODEL=crop_router.keras CASCADE_HEADS_DIR=heads/ python -m backend.benchmarks.bench_cascade --data ...
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Time the models, not the batcher's wait for company
+os.environ.setdefault("BATCH_MAX_WAIT_MS", "0")
+
+import numpy as np  # noqa: E402
+
+from ..inference.backends import MODEL_PATH  # noqa: E402
+from ..inference.cascade import Cascade  # noqa: E402
+from ..inference.engine import InferenceEngine  # noqa: E402
+from ..inference.labels import class_names, crop_key  # noqa: E402
+from ..inference.preprocessing import preprocess  # noqa: E402
+from .bench_preprocessing import synthetic_photo  # noqa: E402
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+def load_samples(data_dir, per_class):
+    """``(label index or None, preprocessed (1, 224, 224, 3) batch)`` pairs."""
+    if not data_dir:
+        return [(None, preprocess(synthetic_photo(1280, 960))) for _ in range(per_class)]
+    samples = []
+    for label, name in enumerate(class_names):
+        folder = os.path.join(data_dir, name)
+        if not os.path.isdir(folder):
+            continue
+        files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_SUFFIXES))[:per_class]
+        for filename in files:
+            with open(os.path.join(folder, filename), "rb") as f:
+                samples.append((label, preprocess(f.read())))
+    return samples
+
+
+async def run_mode(cascade, samples, mode):
+    correct, timings, stages = 0, [], {}
+    for label, batch in samples:
+        crop = None
+        if mode == "crop":
+            # Synthetic images have no label; any crop exercises the same path
+            crop = crop_key(class_names[label]) if label is not None else "tomato"
+        started = time.perf_counter()
+        if mode == "full":
+            predictions, route = await cascade.full.predict(batch), {"stage": "full"}
+        else:
+            predictions, route = await cascade.predict(batch, crop)
+        timings.append((time.perf_counter() - started) * 1000.0)
+        stages[route["stage"]] = stages.get(route["stage"], 0) + 1
+        correct += label is not None and int(np.argmax(predictions[0])) == label
+    return correct, timings, stages
+
+
+async def run(args):
+    cascade = Cascade.from_env(InferenceEngine(args.model))
+    await cascade.warm_up()
+    samples = load_samples(args.data, args.per_class)
+    labelled = sum(label is not None for label, _ in samples)
+    print(f"{len(samples)} images, router: {bool(cascade.router)}, heads: {sorted(cascade.heads) or 'none'}, "
+          f"threshold: {cascade.threshold}")
+
+    print(f"{'mode':>8} {'top-1':>7} {'p50 ms':>8} {'p95 ms':>8} {'routes'}")
+    for mode in ("full", "crop", "cascade"):
+        # One untimed pass so each mode's models are warm
+        await run_mode(cascade, samples[:2], mode)
+        correct, timings, stages = await run_mode(cascade, samples, mode)
+        accuracy = f"{correct / labelled:.1%}" if labelled else "n/a"
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{mode:>8} {accuracy:>7} {statistics.median(timings):>8.2f} {p95:>8.2f} {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", help="Folder with one sub-folder of images per class name")
+    parser.add_argument("--per-class", type=int, default=20, help="Images per class (or synthetic images without --data)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_comments.py
+"""Comment-thread benchmark with an N+1 guard.
+
+Builds threads of growing size and checks that ``comment_thread`` issues the
+same, constant number of SQL statements for each, then reports latency.
+Exits non-zero if the query count grows with the thread (an N+1 regression).
+
+    python -m backend.benchmarks.bench_comments --sizes 10 100 1000 10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///comments_bench.sqlite3")
+
+from sqlalchemy import event  # noqa: E402
+
+from ..database import AsyncSessionLocal, Base, engine, get_async_engine, models  # noqa: E402
+from ..routes.community import comment_thread  # noqa: E402
+
+EXPECTED_QUERIES = 2  # comment rows via the recursive CTE + one selectinload for authors
+
+
+@contextmanager
+def count_queries(bind):
+    """Count SQL statements executed on ``bind`` inside the block."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", before_execute)
+
+
+def seed_thread(post_id, size, users, seed=0):
+    """A random reply tree: each comment answers the post or an earlier comment."""
+    rng = random.Random(seed)
+    first_id = post_id * 1_000_000
+    rows = []
+    for i in range(size):
+        parent = None if i == 0 or rng.random() < 0.3 else first_id + rng.randrange(i)
+        rows.append({
+            "id": first_id + i, "post_id": post_id, "user_id": rng.randint(1, users),
+            "parent_id": parent, "content": f"comment {i}",
+        })
+    with engine.begin() as conn:
+        conn.execute(models.Comment.__table__.insert(), rows)
+
+
+async def measure(sizes, limit):
+    def count(nodes):
+        return sum(1 + count(node["replies"]) for node in nodes)
+
+    failed = False
+    print(f"{'comments':>9} {'returned':>9} {'queries':>8} {'ms':>8}")
+    for post_id, size in enumerate(sizes, start=1):
+        async with AsyncSessionLocal() as db:
+            with count_queries(get_async_engine().sync_engine) as statements:
+                started = time.perf_counter()
+                thread, _ = await comment_thread(db, post_id, limit=limit)
+                elapsed = (time.perf_counter() - started) * 1000.0
+
+        print(f"{size:>9} {count(thread):>9} {len(statements):>8} {elapsed:>8.2f}")
+        failed |= len(statements) != EXPECTED_QUERIES
+    await get_async_engine().dispose()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100, help="Top-level comments per page")
+    args = parser.parse_args()
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+            for i in range(1, args.users + 1)
+        ])
+        conn.execute(models.Post.__table__.insert(), [
+            {"id": post_id, "user_id": 1, "content": f"post {post_id}"} for post_id in range(1, len(args.sizes) + 1)
+        ])
+    for post_id, size in enumerate(args.sizes, start=1):
+        seed_thread(post_id, size, args.users)
+
+    failed = asyncio.run(measure(args.sizes, args.limit))
+    if failed:
+        print(f"N+1 REGRESSION: expected {EXPECTED_QUERIES} queries per thread")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# backend/benchmarks/bench_db.py
+"""Requests/sec of the community feed on the sync vs the async database path.
+
+"sync" is the feed served the old way (``def`` route, ``Session`` from
+``get_db``, run in the threadpool); "async" is the real community router on
+``get_async_db``. Both run the same keyset query against the same database and
+are driven in-process through httpx's ASGI transport at several concurrency
+levels:
+
+    python -m backend.benchmarks.bench_db --concurrency 1 8 32 --requests 2000
+    DATABASE_URL=postgresql://localhost/cropcare_bench python -m backend.benchmarks.bench_db
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Optional
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///feed_bench.sqlite3")
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from ..database import Base, engine, get_async_engine, get_db, models, schemas  # noqa: E402
+from ..routes import community  # noqa: E402
+from ..routes.community import feed_statement, split_page  # noqa: E402
+
+
+def build_app():
+    app = FastAPI()
+    app.include_router(community.router, prefix="/async")
+
+    @app.get("/sync/posts", response_model=list[schemas.PostOut])
+    def sync_posts(cursor: Optional[str] = None, limit: int = 20, db: Session = Depends(get_db)):
+        posts, _ = split_page(db.execute(feed_statement(cursor, limit)).scalars().all(), limit)
+        return posts
+
+    return app
+
+
+def seed(total):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.execute(models.User.__table__.select().limit(1)).first() is None:
+            conn.execute(models.User.__table__.insert(), [{
+                "id": 1, "username": "bench", "email": "bench@example.com", "password_hash": "x",
+            }])
+        existing = conn.execute(models.Post.__table__.select().limit(total)).fetchall()
+        if len(existing) < total:
+            conn.execute(models.Post.__table__.insert(), [
+                {"user_id": 1, "content": f"Synthetic post {i}"} for i in range(total - len(existing))
+            ])
+
+
+async def drive(client, path, requests, concurrency):
+    remaining = iter(range(requests))
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            response = await client.get(path)
+            failures += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started), failures
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("sync", "async"):
+            # Warm both pools before timing
+            await drive(client, f"/{mode}/posts?limit={args.page_size}", 20, 4)
+        print(f"{'concurrency':>11} {'sync req/s':>11} {'async req/s':>12} {'failures':>9}")
+        for concurrency in args.concurrency:
+            rates, failures = {}, 0
+            for mode in ("sync", "async"):
+                rates[mode], failed = await drive(client, f"/{mode}/posts?limit={args.page_size}", args.requests, concurrency)
+                failures += failed
+            print(f"{concurrency:>11} {rates['sync']:>11.1f} {rates['async']:>12.1f} {failures:>9}")
+    await get_async_engine().dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    seed(args.posts)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
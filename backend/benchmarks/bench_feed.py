@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_feed.py
+"""Community feed benchmark: keyset pages vs OFFSET pages on a large posts table.
+
+Seeds a local SQLite file (or any DATABASE_URL, e.g. a scratch Postgres) with
+synthetic posts, then measures per-page latency at several feed depths:
+
+    python -m backend.benchmarks.bench_feed --posts 1000000
+    DATABASE_URL=postgresql://localhost/cropcare_bench python -m backend.benchmarks.bench_feed
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///feed_bench.sqlite3")
+
+from ..database import Base, SessionLocal, engine, models  # noqa: E402
+from ..routes.community import feed_statement, split_page  # noqa: E402
+
+
+def seed(total, chunk=50_000):
+    """Insert ``total`` posts spread over a year, one in fifty soft-deleted."""
+    with engine.begin() as conn:
+        if conn.execute(models.User.__table__.select().limit(1)).first() is None:
+            conn.execute(models.User.__table__.insert(), [{
+                "id": 1, "username": "bench", "email": "bench@example.com", "password_hash": "x",
+            }])
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=365) / max(total, 1)
+    for offset in range(0, total, chunk):
+        rows = [{
+            "user_id": 1,
+            "content": f"Synthetic post {i} about crop care",
+            "is_deleted": i % 50 == 0,
+            "created_at": start + step * i,
+        } for i in range(offset, min(offset + chunk, total))]
+        with engine.begin() as conn:
+            conn.execute(models.Post.__table__.insert(), rows)
+        print(f"  seeded {min(offset + chunk, total):,}/{total:,}", end="\r")
+    print()
+
+
+def keyset_page(db, cursor, limit):
+    # Same statement the async route runs, on a plain Session so only the query is timed
+    return split_page(db.execute(feed_statement(cursor, limit)).scalars().all(), limit)
+
+
+def offset_page(db, page, limit):
+    return (
+        db.query(models.Post)
+        .filter(models.Post.is_deleted.is_(False))
+        .order_by(models.Post.created_at.desc(), models.Post.id.desc())
+        .offset(page * limit).limit(limit).all()
+    )
+
+
+def timed(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 10, 100, 1000, 10000], help="Page numbers to sample")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    existing = db.query(models.Post).count()
+    if existing < args.posts:
+        print(f"Seeding {args.posts - existing:,} posts into {engine.url}")
+        seed(args.posts - existing)
+
+    # Walk the feed once to collect the cursor at every sampled depth.
+    cursors, cursor, page = {}, None, 0
+    max_depth = max(args.depths)
+    while page <= max_depth:
+        if page in args.depths:
+            cursors[page] = cursor
+        _, cursor = keyset_page(db, cursor, args.page_size)
+        if cursor is None:
+            break
+        page += 1
+
+    print(f"{'page':>8} {'keyset ms':>10} {'offset ms':>10}")
+    for depth in args.depths:
+        if depth not in cursors:
+            continue
+        keyset_ms = timed(lambda: keyset_page(db, cursors[depth], args.page_size))
+        offset_ms = timed(lambda: offset_page(db, depth, args.page_size))
+        print(f"{depth:>8} {keyset_ms:>10.2f} {offset_ms:>10.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
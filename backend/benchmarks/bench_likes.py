@@ -0,0 +1,132 @@
+# backend/benchmarks/bench_likes.py
+"""Concurrent-like load test: atomic counters vs the old read-modify-write.
+
+Many clients like the same few posts at once. The "legacy" mode reproduces
+the previous ``db_post.likes += 1`` pattern from threads; the "atomic" mode
+runs as many asyncio tasks through ``like_post`` (Like row +
+``UPDATE ... SET like_count = like_count + 1``) on the async engine.
+Afterwards every post's counter is checked against the expected total.
+
+    python -m backend.benchmarks.bench_likes --threads 16 --likes 200
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///likes_bench.sqlite3")
+
+from sqlalchemy import event, func  # noqa: E402
+
+from ..database import AsyncSessionLocal, Base, SessionLocal, engine, get_async_engine, models, schemas  # noqa: E402
+from ..routes.community import like_post  # noqa: E402
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    @event.listens_for(get_async_engine().sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+
+def reset(posts, users):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(models.Post.__table__.insert(), [
+            {"id": i, "user_id": 1, "content": f"post {i}"} for i in range(1, posts + 1)
+        ])
+
+
+def legacy_like(post_id, user_id):
+    db = SessionLocal()
+    try:
+        db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+        db_post.like_count += 1
+        db.commit()
+    finally:
+        db.close()
+
+
+async def atomic_like(post_id, user_id):
+    async with AsyncSessionLocal() as db:
+        await like_post(post_id, schemas.LikeCreate(user_id=user_id), db)
+
+
+def run_threads(threads, likes_per_thread, posts, errors):
+    def worker(t):
+        for i in range(likes_per_thread):
+            # Distinct users, so every like is legitimate and must be counted.
+            user_id = t * likes_per_thread + i + 1
+            try:
+                legacy_like(i % posts + 1, user_id)
+            except Exception as e:
+                errors.append(e)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+async def run_tasks(clients, likes_per_client, posts, errors):
+    async def worker(t):
+        for i in range(likes_per_client):
+            try:
+                await atomic_like(i % posts + 1, t * likes_per_client + i + 1)
+            except Exception as e:
+                errors.append(e)
+
+    await asyncio.gather(*(worker(t) for t in range(clients)))
+    await get_async_engine().dispose()
+
+
+def run(mode, threads, likes_per_thread, posts):
+    reset(posts, threads * likes_per_thread)
+    errors = []
+    started = time.perf_counter()
+    if mode == "legacy":
+        run_threads(threads, likes_per_thread, posts, errors)
+    else:
+        asyncio.run(run_tasks(threads, likes_per_thread, posts, errors))
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    counted = db.query(func.sum(models.Post.like_count)).scalar() or 0
+    db.close()
+    expected = threads * likes_per_thread
+    return {
+        "mode": mode,
+        "likes_per_sec": round(expected / elapsed, 1),
+        "expected": expected,
+        "counted": counted,
+        "lost": expected - counted - len(errors),
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent clients (threads or tasks)")
+    parser.add_argument("--likes", type=int, default=200, help="Likes per client")
+    parser.add_argument("--posts", type=int, default=4, help="Hot posts being liked")
+    args = parser.parse_args()
+
+    for mode in ("legacy", "atomic"):
+        result = run(mode, args.threads, args.likes, args.posts)
+        print(f"{result['mode']:>7}: {result['likes_per_sec']:>8} likes/s  "
+              f"counted {result['counted']}/{result['expected']}  lost {result['lost']}  errors {result['errors']}")
+    if result["lost"] or result["errors"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
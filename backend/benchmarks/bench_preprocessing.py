@@ -0,0 +1,72 @@
+# backend/benchmarks/bench_preprocessing.py
+"""Micro-benchmark: legacy predict() preprocessing vs backend.inference.preprocessing.
+
+Run from the project root:
+
+    python -m backend.benchmarks.bench_preprocessing --width 4000 --height 3000
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from ..inference.preprocessing import preprocess
+
+
+def legacy_preprocess(data: bytes) -> np.ndarray:
+    """The original path: full decode, convert, resize, img_to_array, expand_dims, preprocess_input."""
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    img = img.resize((224, 224))
+    img_array = np.asarray(img, dtype=np.float32)  # image.img_to_array
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array / 127.5 - 1.0  # mobilenet_v2.preprocess_input
+
+
+def synthetic_photo(width, height, fmt="JPEG") -> bytes:
+    """A smooth gradient with noise, so the JPEG compresses like a real photo."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+def timeit(fn, data, repeat):
+    fn(data)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "PNG"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    data = synthetic_photo(args.width, args.height, args.format)
+    print(f"Input: {args.width}x{args.height} {args.format}, {len(data) / 1e6:.1f} MB")
+
+    results = {}
+    for name, fn in (("legacy", legacy_preprocess), ("pipeline", preprocess)):
+        t = timeit(fn, data, args.repeat)
+        results[name] = t
+        print(f"{name:>9}: mean {t.mean():7.2f} ms  p50 {np.percentile(t, 50):7.2f} ms  p95 {np.percentile(t, 95):7.2f} ms")
+
+    speedup = results["legacy"].mean() / results["pipeline"].mean()
+    diff = np.abs(legacy_preprocess(data) - preprocess(data))
+    print(f"speedup: {speedup:.2f}x  mean |diff|: {diff.mean():.4f}  max |diff|: {diff.max():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_search.py
+"""Search benchmark on a synthetic corpus of posts, FAQs and help posts.
+
+Indexes ``--docs`` generated documents into the in-memory index and into the
+database-backed index for DATABASE_URL (FTS5 for SQLite, tsvector/GIN for
+Postgres), then reports indexing throughput, query latency for single words,
+prefixes and multi-word queries on the first and a deep page, and the cost of
+one incremental add.
+
+    python -m backend.benchmarks.bench_search --docs 500000
+    DATABASE_URL=postgresql://localhost/cropcare_bench python -m backend.benchmarks.bench_search
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///search_bench.sqlite3")
+
+from sqlalchemy import text  # noqa: E402
+
+from ..database import AsyncSessionLocal, Base, engine, get_async_engine  # noqa: E402
+from ..search import MemorySearchIndex, PostgresSearchIndex, SQLiteSearchIndex, search_index  # noqa: E402
+
+CROPS = ["tomato", "potato", "apple", "grape", "corn", "pepper", "peach", "cherry", "strawberry", "soybean"]
+CONDITIONS = ["early blight", "late blight", "leaf mold", "scab", "black rot", "rust", "powdery mildew",
+              "bacterial spot", "mosaic virus", "healthy leaves"]
+QUERIES = ["tomato", "blight", "tom", "pow mil", "apple scab", "late blight potato", "fungicide spray", "bacterial"]
+
+
+def corpus(total, seed=0):
+    """Yield ``(doc_type, doc_id, title, body)``; filler words follow a Zipf-like distribution."""
+    rng = random.Random(seed)
+    filler = [f"word{i}" for i in range(20_000)]
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(len(filler))))
+    extra = ["fungicide", "spray", "irrigation", "pruning", "yield", "soil", "nitrogen", "harvest"]
+    for i in range(total):
+        crop, condition = rng.choice(CROPS), rng.choice(CONDITIONS)
+        words = rng.choices(filler, cum_weights=cum_weights, k=rng.randint(20, 60)) + rng.sample(extra, 2) + [crop, condition]
+        rng.shuffle(words)
+        kind = "post" if i % 10 else rng.choice(["faq", "help"])
+        title = "" if kind == "post" else f"{crop} {condition}"
+        yield kind, i + 1, title, " ".join(words)
+
+
+async def as_async(documents):
+    for document in documents:
+        yield document
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def measure(index, db, repeat, page_size, deep_offset):
+    rows = []
+    for query in QUERIES:
+        for offset in (0, deep_offset):
+            timings, total = [], 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                total, _ = await index.search(db, query, page_size, offset)
+                timings.append((time.perf_counter() - started) * 1000.0)
+            rows.append((query, offset, total, statistics.median(timings), percentile(timings, 0.95)))
+    return rows
+
+
+async def run(args):
+    results = {}
+
+    memory = MemorySearchIndex()
+    started = time.perf_counter()
+    for document in corpus(args.docs):
+        memory.add_document(*document)
+    results["memory"] = (args.docs / (time.perf_counter() - started), memory)
+
+    sql = search_index if not isinstance(search_index, MemorySearchIndex) else None
+    if sql is not None:
+        Base.metadata.create_all(engine)
+        await sql.setup()
+        async with AsyncSessionLocal() as db:
+            if isinstance(sql, SQLiteSearchIndex):
+                await db.execute(text("DELETE FROM search_fts"))
+            elif isinstance(sql, PostgresSearchIndex):
+                await db.execute(text("TRUNCATE search_documents"))
+            started = time.perf_counter()
+            await sql.add_all(db, as_async(corpus(args.docs)))
+            await db.commit()
+            results[sql.name] = (args.docs / (time.perf_counter() - started), sql)
+
+    print(f"{'index':>8} {'docs/s':>10}")
+    for name, (rate, _) in results.items():
+        print(f"{name:>8} {rate:>10.0f}")
+
+    print(f"\n{'index':>8} {'query':>20} {'offset':>7} {'matches':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    async with AsyncSessionLocal() as db:
+        for name, (_, index) in results.items():
+            for query, offset, total, p50, p95 in await measure(index, db, args.repeat, args.page_size, args.deep_offset):
+                print(f"{name:>8} {query:>20} {offset:>7} {total:>9} {p50:>8.2f} {p95:>8.2f}")
+
+            started = time.perf_counter()
+            await index.add(db, "post", args.docs + 1, "", "fresh tomato blight report")
+            await db.commit()
+            add_ms = (time.perf_counter() - started) * 1000.0
+            total, _ = await index.search(db, "fresh tomato", 1, 0)
+            print(f"{name:>8} incremental add {add_ms:.2f} ms, searchable: {total >= 1}")
+    await get_async_engine().dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--deep-offset", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# backend/benchmarks/bench_signup.py
+"""Signup throughput under concurrent read traffic: inline bcrypt vs the hashing pool.
+
+A burst of signup requests runs alongside a steady stream of community feed
+reads, in-process through httpx's ASGI transport. "inline" hashes the way the
+old sync handlers did (bcrypt in the request threadpool); "pool" goes through
+``hashing_pool`` with its queue limit and 429s. The signup routes here do only
+the hashing step of ``signup_email``, so the numbers isolate bcrypt's cost.
+
+    python -m backend.benchmarks.bench_signup --signups 200 --readers 8 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///feed_bench.sqlite3")
+if "--rounds" in sys.argv:
+    # Must be set before auth_utils builds its CryptContext
+    os.environ["BCRYPT_ROUNDS"] = sys.argv[sys.argv.index("--rounds") + 1]
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from ..auth_utils import hash_password, hashing_pool  # noqa: E402
+from ..database import get_async_engine, schemas  # noqa: E402
+from ..routes import community  # noqa: E402
+from ..routes.auth import hashing  # noqa: E402
+from .bench_db import seed  # noqa: E402
+
+
+def build_app():
+    app = FastAPI()
+    app.include_router(community.router, prefix="/community")
+
+    @app.post("/inline/signup")
+    def inline_signup(user: schemas.UserCreate):
+        return {"length": len(hash_password(user.password))}
+
+    @app.post("/pool/signup")
+    async def pool_signup(user: schemas.UserCreate):
+        return {"length": len(await hashing(hashing_pool.hash(user.password)))}
+
+    return app
+
+
+async def run_mode(client, mode, signups, concurrency, readers):
+    done = asyncio.Event()
+    read_ms, statuses = [], {}
+
+    async def reader():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/community/posts?limit=20")
+            read_ms.append((time.perf_counter() - started) * 1000.0)
+
+    remaining = iter(range(signups))
+
+    async def signer():
+        for i in remaining:
+            response = await client.post(f"/{mode}/signup", json={"email": f"u{i}@example.com", "password": f"pw-{i}"})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    read_tasks = [asyncio.create_task(reader()) for _ in range(readers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(signer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*read_tasks)
+
+    read_ms.sort()
+    return {
+        "mode": mode,
+        "signups_per_sec": round(statuses.get(200, 0) / elapsed, 1),
+        "rejected_429": statuses.get(429, 0),
+        "reads_per_sec": round(len(read_ms) / elapsed, 1),
+        "read_p50_ms": round(statistics.median(read_ms), 2) if read_ms else None,
+        "read_p95_ms": round(read_ms[int(len(read_ms) * 0.95)], 2) if read_ms else None,
+    }
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/pool/signup", json={"password": "warm-up"})
+        for mode in ("inline", "pool"):
+            result = await run_mode(client, mode, args.signups, args.concurrency, args.readers)
+            print(f"{result['mode']:>6}: {result['signups_per_sec']:>7} signups/s  429s {result['rejected_429']:>4}  "
+                  f"reads {result['reads_per_sec']:>8}/s  p50 {result['read_p50_ms']} ms  p95 {result['read_p95_ms']} ms")
+    await get_async_engine().dispose()
+    hashing_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent signup clients")
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent feed readers")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--posts", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(args.posts)
+    print(f"bcrypt rounds {os.environ.get('BCRYPT_ROUNDS', '12')}, hashing pool {hashing_pool.stats()['workers']} workers")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_startup.py
+"""Startup-time benchmark for ``import backend.main``.
+
+Runs the import in a fresh interpreter under ``python -X importtime`` and
+reports wall time, the slowest modules by cumulative import time, and
+whether TensorFlow was imported. A stored baseline makes regressions fail:
+
+    python -m backend.benchmarks.bench_startup --save-baseline startup_baseline.json
+    python -m backend.benchmarks.bench_startup --baseline startup_baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def measure(env_overrides=None):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    env.update(env_overrides or {})
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError(f"import backend.main failed:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+    top_level = {name: cum for name, (_, cum) in modules.items() if "." not in name}
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(sum(top_level.values()) / 1000.0, 1),
+        "modules": len(modules),
+        "tensorflow_imported": "tensorflow" in modules,
+        "slowest": sorted(
+            ({"module": name, "cumulative_ms": round(cum / 1000.0, 1)} for name, (_, cum) in modules.items()),
+            key=lambda m: m["cumulative_ms"], reverse=True,
+        )[:15],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend.main import time")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs to take the best of")
+    parser.add_argument("--no-predict", action="store_true", help="Measure with ENABLE_PREDICT=0")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    overrides = {"ENABLE_PREDICT": "0"} if args.no_predict else {}
+    result = min((measure(overrides) for _ in range(args.repeat)), key=lambda r: r["import_ms"])
+
+    print(f"import backend.main: {result['import_ms']} ms import, {result['wall_ms']} ms wall, "
+          f"{result['modules']} modules, tensorflow imported: {result['tensorflow_imported']}")
+    for module in result["slowest"]:
+        print(f"  {module['cumulative_ms']:9.1f} ms  {module['module']}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline["import_ms"] * (1 + args.tolerance)
+        if result["import_ms"] > limit or (result["tensorflow_imported"] and not baseline["tensorflow_imported"]):
+            print(f"REGRESSION: {result['import_ms']} ms vs baseline {baseline['import_ms']} ms (limit {limit:.1f} ms)")
+            raise SystemExit(1)
+        print(f"OK: within {args.tolerance:.0%} of baseline {baseline['import_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# backend/benchmarks/bench_tta.py
+"""Extra latency of test-time augmentation over the single-pass prediction.
+
+For each augmentation budget this times building the views (NumPy only),
+one batched forward pass over all of them (what /predict?tta=N does) and,
+for comparison, one forward pass per view:
+
+    python -m backend.benchmarks.bench_tta --budgets 1 2 4 8 12
+    INFERENCE_BACKEND=tflite python -m backend.benchmarks.bench_tta
+    python -m backend.benchmarks.bench_tta --untrained    # no .keras file: same architecture, random weights
+
+The model is loaded with ``load_backend`` (INFERENCE_BACKEND etc. apply).
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from ..inference.backends import MODEL_PATH, load_backend
+from ..inference.labels import class_names
+from ..inference.preprocessing import preprocess
+from ..inference.tta import MAX_VIEWS, augment
+from .bench_preprocessing import synthetic_photo
+
+
+def untrained_backend():
+    """MobileNetV2 with the production head and random weights; same cost per forward pass."""
+    import tensorflow as tf
+
+    model = tf.keras.applications.MobileNetV2(input_shape=(224, 224, 3), weights=None, classes=len(class_names))
+    return load_backend(keras_model=model)
+
+
+def timed(fn, repeat):
+    fn()  # warm up (graph tracing, interpreter resize)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[1, 2, 4, 8, MAX_VIEWS])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--untrained", action="store_true", help="Random-weight MobileNetV2 instead of the model file")
+    args = parser.parse_args()
+
+    backend = untrained_backend() if args.untrained else load_backend(model_path=args.model)
+    image = preprocess(synthetic_photo(1280, 960))[0]
+
+    single = timed(lambda: backend.predict(image[None]), args.repeat)
+    print(f"backend: {backend.name}, single pass {single:.2f} ms")
+    print(f"{'views':>5} {'augment ms':>11} {'batched ms':>11} {'extra ms':>9} {'per-view calls ms':>18}")
+    for budget in args.budgets:
+        views = augment(image, budget)
+        augment_ms = timed(lambda: augment(image, budget), args.repeat)
+        batched_ms = timed(lambda: backend.predict(views), args.repeat)
+        sequential_ms = timed(lambda: [backend.predict(views[i:i + 1]) for i in range(len(views))], max(1, args.repeat // 4))
+        extra = augment_ms + batched_ms - single
+        print(f"{len(views):>5} {augment_ms:>11.2f} {batched_ms:>11.2f} {extra:>9.2f} {sequential_ms:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# backend/chat_cache.py
+"""Response cache for /explore/chat.
+
+Queries are normalized (Unicode form, case, punctuation, whitespace) and
+keyed together with the reply language, so "How to treat tomato early blight?"
+and "how to treat  Tomato early blight" share one entry. With the semantic
+index enabled, a miss is also compared by cosine similarity against earlier
+queries in the same language, and a close enough match returns the cached
+answer. A near-duplicate only counts if it names exactly the same crops and
+diseases (words of the model's class labels), so "tomato late blight" never
+gets the answer for "potato late blight" or "tomato early blight".
+
+Configuration (environment):
+    CHAT_CACHE_SIZE       maximum cached answers (default 1024)
+    CHAT_CACHE_TTL        seconds an answer stays valid (default 86400)
+    CHAT_CACHE_SEMANTIC   1 to enable the embedding-similarity index
+    CHAT_CACHE_THRESHOLD  cosine similarity needed for a semantic hit (default 0.95)
+    CHAT_CACHE_DIR        where the memory-mapped embedding matrix lives (default: temp dir, removed on close)
+"""
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .inference.labels import class_names
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(query: str, lang: str = "en") -> str:
+    return f"{(lang or 'en').lower()}:{normalize_query(query)}"
+
+
+# Crop and disease words of the class labels ("tomato", "early", "blight", "mites", ...)
+_LABEL_FILLER = {"including", "sour", "two", "common"}
+DOMAIN_TERMS = frozenset(
+    word
+    for name in class_names
+    for word in normalize_query(name.replace("_", " ")).split()
+    if word not in _LABEL_FILLER
+)
+
+
+def domain_terms(normalized: str) -> frozenset:
+    """Crop and disease words of a normalized query, plurals folded ("tomatoes" -> "tomato", "mites" -> "mite")."""
+    terms = set()
+    for word in normalized.split():
+        for candidate in (word[:-1] if word.endswith("s") else None, word[:-2] if word.endswith("es") else None, word):
+            if candidate in DOMAIN_TERMS:
+                terms.add(candidate)
+                break
+    return frozenset(terms)
+
+
+def embed(text: str, dim: int = 512) -> np.ndarray:
+    """
+    Local hashed embedding of words and character trigrams.
+
+    Not a learned model, but cheap, deterministic and good at catching
+    rephrasings that share most of their words.
+    """
+    padded = f" {text} "
+    features = text.split() + [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vec = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vec
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint64, count=len(features))
+    signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+    np.add.at(vec, ((hashes >> 1) % dim).astype(np.intp), signs)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticIndex:
+    """
+    Fixed-capacity cosine-similarity index over a memory-mapped float32 matrix.
+
+    Every vector belongs to a group (the reply language) and a search only
+    considers its own group.
+    """
+
+    def __init__(self, capacity, dim=512, directory=None):
+        self.capacity = capacity
+        self.dim = dim
+        self._temp_dir = None
+        if not directory:
+            directory = self._temp_dir = tempfile.mkdtemp(prefix="chat-cache-")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"embeddings-{os.getpid()}.f32")
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="w+", shape=(capacity, dim))
+        self._slots = {}
+        self._keys = [None] * capacity
+        self._group_of_slot = np.full(capacity, -1, dtype=np.int32)
+        self._group_ids = {}
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def add(self, key, vector, group=None):
+        slot = self._slots.get(key)
+        if slot is None:
+            if not self._free:
+                return
+            slot = self._free.pop()
+            self._slots[key] = slot
+            self._keys[slot] = key
+        self.matrix[slot] = vector
+        self._group_of_slot[slot] = self._group_ids.setdefault(group, len(self._group_ids))
+
+    def remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is not None:
+            self.matrix[slot] = 0.0
+            self._keys[slot] = None
+            self._group_of_slot[slot] = -1
+            self._free.append(slot)
+
+    def search(self, vector, group=None):
+        """Return ``(key, similarity)`` of the nearest stored vector in ``group``, or ``(None, 0.0)``."""
+        group_id = self._group_ids.get(group)
+        if not self._slots or group_id is None:
+            return None, 0.0
+        scores = self.matrix @ vector
+        scores[self._group_of_slot != group_id] = -np.inf
+        slot = int(np.argmax(scores))
+        if self._keys[slot] is None or scores[slot] == -np.inf:
+            return None, 0.0
+        return self._keys[slot], float(scores[slot])
+
+    def close(self):
+        """Drop the memory map and delete its file (and the temp dir, if this index made it)."""
+        if self.matrix is None:
+            return
+        self.matrix = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def __len__(self):
+        return len(self._slots)
+
+
+class ChatCache:
+    def __init__(self, max_entries=1024, ttl=86400.0, semantic=False, threshold=0.95, directory=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.index = SemanticIndex(max_entries, directory=directory) if semantic else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.getenv("CHAT_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("CHAT_CACHE_TTL", "86400")),
+            semantic=os.getenv("CHAT_CACHE_SEMANTIC") == "1",
+            threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.95")),
+            directory=os.getenv("CHAT_CACHE_DIR"),
+        )
+
+    def _get_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, answer = entry
+        if expires_at < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def _evict(self, key):
+        del self._entries[key]
+        if self.index is not None:
+            self.index.remove(key)
+
+    def get(self, query: str, lang: str = "en"):
+        key = cache_key(query, lang)
+        with self._lock:
+            answer = self._get_entry(key)
+            if answer is not None:
+                self.hits += 1
+                return answer
+            if self.index is not None:
+                lang, normalized = key.split(":", 1)
+                match, score = self.index.search(embed(normalized), lang)
+                # Similar wording isn't enough: crops and diseases must be the same ones
+                if (match is not None and score >= self.threshold
+                        and domain_terms(match.split(":", 1)[1]) == domain_terms(normalized)):
+                    answer = self._get_entry(match)
+                    if answer is not None:
+                        self.semantic_hits += 1
+                        return answer
+            self.misses += 1
+            return None
+
+    def set(self, query: str, answer: str, lang: str = "en"):
+        key = cache_key(query, lang)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+            if self.index is not None:
+                lang, normalized = key.split(":", 1)
+                self.index.add(key, embed(normalized), lang)
+
+    def close(self):
+        """Release the semantic index's memory-mapped file."""
+        with self._lock:
+            if self.index is not None:
+                self.index.close()
+                self.index = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "semantic": self.index is not None,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -1,9 +1,9 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from . import Base
-from datetime import datetime
+from datetime import datetime, timezone
 
 class User(Base):
     __tablename__ = "users"
@@ -14,8 +14,6 @@ class User(Base):
     phone_number = Column(String, unique=True, index=True, nullable=True)
     password_hash = Column(String(256), nullable=False)
     hashed_password = Column(String, nullable=True)  # for email login
-    otp_code = Column(String, nullable=True)  # for phone OTP
-    otp_expires_at = Column(String, nullable=True)  # store as ISO string
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -30,12 +28,23 @@ class Post(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
     is_deleted = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Denormalized counters, only ever changed with atomic UPDATE ... SET x = x + 1
+    like_count = Column(Integer, default=0, server_default="0", nullable=False)
+    comment_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Set by the application, not the database: the feed cursor binds created_at back into
+    # SQL, and SQLite's CURRENT_TIMESTAMP ("... HH:MM:SS") wouldn't match the bound
+    # "... HH:MM:SS.ffffff" text. upgrade.py converts rows written before this.
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     author = relationship("User", back_populates="posts")
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of the community feed: WHERE is_deleted ORDER BY created_at DESC, id DESC
+        Index("ix_posts_feed", "is_deleted", "created_at", "id"),
+    )
+
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -36,6 +36,7 @@ class Token(BaseModel):
 
 # ------------------ POSTS ------------------
 class PostCreate(BaseModel):
+    user_id: int
     content: str
 
 class PostOut(BaseModel):
@@ -43,6 +44,8 @@ class PostOut(BaseModel):
     content: str
     user_id: int
     is_deleted: bool
+    like_count: int = 0
+    comment_count: int = 0
     created_at: datetime
     class Config:
         orm_mode = True
@@ -50,7 +53,7 @@ class PostOut(BaseModel):
 
 # ------------------ COMMENTS ------------------
 class CommentCreate(BaseModel):
-    post_id: int
+    user_id: int
     content: str
     parent_id: Optional[int] = None
 
@@ -66,6 +69,26 @@ class Comment(BaseModel):  # Renamed from CommentOut to match community.py
         orm_mode = True
 
 
+class CommentAuthor(BaseModel):
+    id: int
+    username: Optional[str] = None
+    name: Optional[str] = None
+    class Config:
+        orm_mode = True
+
+class CommentNode(Comment):
+    author: Optional[CommentAuthor] = None
+    replies: List["CommentNode"] = []
+    has_more_replies: bool = False
+
+CommentNode.update_forward_refs()
+
+
+# ------------------ LIKES ------------------
+class LikeCreate(BaseModel):
+    user_id: int
+
+
 # ------------------ REPORTS ------------------
 class ReportCreate(BaseModel):
     target_type: str
@@ -135,4 +158,19 @@ class SupportMessageOut(SupportMessageBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+# ------------------ SEARCH ------------------
+class SearchHit(BaseModel):
+    type: str  # post, faq or help
+    id: int
+    title: str
+    snippet: str
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    results: List[SearchHit]
+    next_offset: Optional[int] = None
@@ -0,0 +1,77 @@
+# backend/database/upgrade.py
+"""Bring an existing database up to the current models.
+
+There are no migrations in this project; tables are created from the models.
+``create_all`` only adds missing tables, so columns, indexes and data fixes
+that later changes rely on are applied here. Every step checks before it
+changes anything, so running this again is harmless:
+
+    python -m backend.database.upgrade
+"""
+from sqlalchemy import func, inspect, select, text, update
+
+from . import Base, engine
+from . import models  # noqa: F401  (registers the tables on Base)
+
+
+def ensure_index(conn, index):
+    """Create ``index`` unless its table already has an index of that name."""
+    existing = {ix["name"] for ix in inspect(conn).get_indexes(index.table.name)}
+    if index.name in existing:
+        return False
+    index.create(conn)
+    return True
+
+
+def upgrade_feed(conn):
+    """ix_posts_feed, and SQLite created_at values in the format the feed cursor binds."""
+    steps = []
+    if ensure_index(conn, next(ix for ix in models.Post.__table__.indexes if ix.name == "ix_posts_feed")):
+        steps.append("created ix_posts_feed")
+    if conn.dialect.name == "sqlite":
+        # CURRENT_TIMESTAMP wrote "YYYY-MM-DD HH:MM:SS"; SQLAlchemy binds "YYYY-MM-DD HH:MM:SS.ffffff",
+        # and SQLite compares them as text
+        fixed = conn.execute(text(
+            "UPDATE posts SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+        )).rowcount
+        if fixed:
+            steps.append(f"normalized created_at of {fixed} posts")
+    return steps
+
+
+def upgrade_counters(conn):
+    """posts.like_count / comment_count, backfilled from likes and comments when first added."""
+    existing = {col["name"] for col in inspect(conn).get_columns("posts")}
+    added = [name for name in ("like_count", "comment_count") if name not in existing]
+    for name in added:
+        conn.execute(text(f"ALTER TABLE posts ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    if not added:
+        return []
+    # Same counts as community.reconcile_counters
+    Post, Like, Comment = models.Post, models.Like, models.Comment
+    likes = (
+        select(func.count(Like.id))
+        .where(Like.target_type == "post", Like.target_id == Post.id)
+        .scalar_subquery()
+    )
+    comments = select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+    conn.execute(update(Post).values(like_count=likes, comment_count=comments))
+    return [f"added and backfilled posts.{name}" for name in added]
+
+
+def upgrade():
+    steps = []
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        steps += upgrade_counters(conn)
+        steps += upgrade_feed(conn)
+    return steps
+
+
+def main():
+    steps = upgrade()
+    print("\n".join(steps) if steps else "Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# backend/inference/backends.py
+"""Selectable inference backends for the MobileNetV2 classifier.
+
+All backends take a preprocessed float32 batch of shape ``(N, 224, 224, 3)``
+and return class probabilities of shape ``(N, num_classes)``. The backend is
+chosen with the INFERENCE_BACKEND environment variable:
+
+    keras        Keras ``model.predict`` (reference implementation)
+    tf_function  ``tf.function``-compiled direct call with a fixed input signature
+    tflite       TFLite interpreter, optionally quantized (INFERENCE_QUANTIZATION=float16|int8)
+    onnx         ONNX Runtime, if installed
+    remote       a separate inference server process (see backend.inference.server)
+
+Check a backend against Keras before switching a node over:
+
+    python -m backend.inference.backends --backend tflite --quantization float16
+"""
+import argparse
+import os
+import threading
+
+import numpy as np
+
+INPUT_SHAPE = (224, 224, 3)
+
+MODEL_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "model", "mobilenetv2_cropcare.keras"))
+
+
+class InferenceBackend:
+    """Common interface for every backend."""
+
+    name = "base"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+def _tf():
+    # Imported on demand so processes using the remote backend never load TensorFlow.
+    import tensorflow as tf
+    return tf
+
+
+def load_keras_model(model_path=MODEL_PATH):
+    return _tf().keras.models.load_model(model_path)
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFFunctionBackend(InferenceBackend):
+    """Calls the model directly through a traced graph, skipping the Keras predict loop."""
+
+    name = "tf_function"
+
+    def __init__(self, model):
+        tf = _tf()
+        self.model = model
+        self._fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, *INPUT_SHAPE), dtype=tf.float32)],
+        )
+
+    def predict(self, batch):
+        return self._fn(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TFLite interpreter converted from the Keras model.
+
+    The converted flatbuffer is cached next to the ``.keras`` file, e.g.
+    ``mobilenetv2_cropcare.float16.tflite``. ``int8`` uses dynamic-range
+    quantization, so inputs and outputs stay float32.
+
+    Resizing an interpreter reallocates all of its tensors, so batches are
+    zero-padded to a power of two (capped at ``max_batch``, the micro-batcher's
+    BATCH_MAX_SIZE) and each of those sizes gets its own interpreter, built on
+    first use. Larger batches are run in ``max_batch`` chunks.
+    """
+
+    name = "tflite"
+    QUANTIZATIONS = (None, "float16", "int8")
+
+    def __init__(self, model_path=MODEL_PATH, keras_model=None, quantization=None, num_threads=None, max_batch=None):
+        if quantization not in self.QUANTIZATIONS:
+            raise ValueError(f"Unsupported TFLite quantization: {quantization}")
+        self.quantization = quantization
+        self.num_threads = num_threads
+        self.max_batch = max(1, max_batch or int(os.getenv("BATCH_MAX_SIZE", "16")))
+        self.tflite_path = self.converted_path(model_path, quantization)
+        if not os.path.exists(self.tflite_path):
+            self.convert(keras_model or load_keras_model(model_path), self.tflite_path, quantization)
+
+        self._interpreters = {}  # padded batch size -> (interpreter, input index, output index, lock)
+        self._lock = threading.Lock()
+        self._interpreter(1)
+
+    def padded_size(self, rows):
+        """The interpreter size that serves ``rows`` (at most ``max_batch``) rows."""
+        size = 1
+        while size < rows:
+            size *= 2
+        return min(size, self.max_batch)
+
+    def _interpreter(self, size):
+        with self._lock:
+            if size not in self._interpreters:
+                interpreter = _tf().lite.Interpreter(model_path=self.tflite_path, num_threads=self.num_threads)
+                input_index = interpreter.get_input_details()[0]["index"]
+                interpreter.resize_tensor_input(input_index, [size, *INPUT_SHAPE])
+                interpreter.allocate_tensors()
+                output_index = interpreter.get_output_details()[0]["index"]
+                self._interpreters[size] = (interpreter, input_index, output_index, threading.Lock())
+            return self._interpreters[size]
+
+    @staticmethod
+    def converted_path(model_path, quantization=None):
+        base, _ = os.path.splitext(model_path)
+        return f"{base}.{quantization}.tflite" if quantization else f"{base}.tflite"
+
+    @staticmethod
+    def convert(keras_model, output_path, quantization=None):
+        tf = _tf()
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        if quantization:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        with open(output_path, "wb") as f:
+            f.write(converter.convert())
+        return output_path
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) > self.max_batch:
+            return np.concatenate([
+                self.predict(batch[i:i + self.max_batch]) for i in range(0, len(batch), self.max_batch)
+            ])
+        rows = len(batch)
+        size = self.padded_size(rows)
+        if size > rows:
+            batch = np.concatenate([batch, np.zeros((size - rows, *INPUT_SHAPE), dtype=np.float32)])
+        interpreter, input_index, output_index, lock = self._interpreter(size)
+        # Each interpreter is stateful, so calls of the same size are serialized.
+        with lock:
+            interpreter.set_tensor(input_index, batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_index)[:rows].copy()
+
+
+class ONNXBackend(InferenceBackend):
+    """ONNX Runtime session; converts with tf2onnx when no ``.onnx`` file exists yet."""
+
+    name = "onnx"
+
+    def __init__(self, model_path=MODEL_PATH, keras_model=None, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package")
+
+        self.onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+        if not os.path.exists(self.onnx_path):
+            self.convert(keras_model or load_keras_model(model_path), self.onnx_path)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    @staticmethod
+    def convert(keras_model, output_path):
+        try:
+            import tf2onnx
+        except ImportError:
+            raise RuntimeError(f"{output_path} not found and tf2onnx is not installed to convert it")
+        tf = _tf()
+        spec = (tf.TensorSpec((None, *INPUT_SHAPE), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(keras_model, input_signature=spec, output_path=output_path)
+        return output_path
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+BACKENDS = ("keras", "tf_function", "tflite", "onnx", "remote")
+
+
+def load_backend(name=None, model_path=MODEL_PATH, keras_model=None, quantization=None, num_threads=None):
+    """
+    Build the configured backend.
+
+    Defaults come from INFERENCE_BACKEND, INFERENCE_QUANTIZATION and INFERENCE_THREADS.
+    ``keras_model`` is reused when given, so the ``.keras`` file is loaded at most once.
+    """
+    name = name or os.getenv("INFERENCE_BACKEND", "tf_function")
+    quantization = quantization or os.getenv("INFERENCE_QUANTIZATION") or None
+    num_threads = num_threads or (int(os.getenv("INFERENCE_THREADS")) if os.getenv("INFERENCE_THREADS") else None)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{name}', expected one of {BACKENDS}")
+
+    if name == "remote":
+        from .server import RemoteBackend
+        return RemoteBackend.from_env()
+    if name == "tflite":
+        return TFLiteBackend(model_path, keras_model, quantization, num_threads)
+    if name == "onnx":
+        return ONNXBackend(model_path, keras_model, num_threads)
+
+    keras_model = keras_model or load_keras_model(model_path)
+    if name == "keras":
+        return KerasBackend(keras_model)
+    return TFFunctionBackend(keras_model)
+
+
+def parity_check(reference: InferenceBackend, candidate: InferenceBackend, batch=None, atol=1e-2, seed=0) -> dict:
+    """
+    Compare ``candidate`` against ``reference`` on the same batch.
+
+    Without an explicit batch, random inputs in MobileNet's [-1, 1] range are used.
+    Passes when top-1 classes agree everywhere and probabilities are within ``atol``.
+    """
+    if batch is None:
+        rng = np.random.default_rng(seed)
+        batch = rng.uniform(-1.0, 1.0, size=(8, *INPUT_SHAPE)).astype(np.float32)
+    expected = np.asarray(reference.predict(batch))
+    actual = np.asarray(candidate.predict(batch))
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    top1_agreement = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    return {
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "samples": len(batch),
+        "max_abs_diff": max_abs_diff,
+        "top1_agreement": top1_agreement,
+        "passed": top1_agreement == 1.0 and max_abs_diff <= atol,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check an inference backend against Keras outputs")
+    parser.add_argument("--backend", choices=BACKENDS, default=os.getenv("INFERENCE_BACKEND", "tf_function"))
+    parser.add_argument("--quantization", choices=["float16", "int8"], default=None)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--atol", type=float, default=1e-2)
+    args = parser.parse_args()
+
+    keras_model = load_keras_model(args.model)
+    reference = KerasBackend(keras_model)
+    candidate = load_backend(args.backend, args.model, keras_model, args.quantization)
+    batch = np.random.default_rng(0).uniform(-1.0, 1.0, size=(args.samples, *INPUT_SHAPE)).astype(np.float32)
+    result = parity_check(reference, candidate, batch, atol=args.atol)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    raise SystemExit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
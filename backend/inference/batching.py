@@ -0,0 +1,209 @@
+# backend/inference/batching.py
+"""Dynamic micro-batching for model inference.
+
+Concurrent uploads are gathered into a single batch so that one forward pass
+serves several callers. A batch is dispatched when it reaches
+``max_batch_size`` rows or when the oldest request has waited ``max_wait_ms``.
+
+Callers may give up on a request (client disconnect, cancelled task): its
+future is cancelled and the request is dropped when dequeued. A request that
+is already in a batch can no longer be cancelled and simply completes.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+
+from ..metrics import stage
+
+
+class BatchQueueFull(Exception):
+    """Raised when the batcher cannot accept more pending requests."""
+
+
+class _Request:
+    __slots__ = ("inputs", "future", "enqueued_at")
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects inference requests from many threads and runs them together.
+
+    Args:
+        predict_fn: Callable taking a ``(N, ...)`` array and returning a ``(N, ...)`` array.
+        max_batch_size: Maximum number of rows in one forward pass.
+        max_wait_ms: How long the first request of a batch may wait for company.
+        max_queue_size: Pending requests allowed before ``submit`` raises ``BatchQueueFull``.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, max_queue_size=256):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._carry = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+        # Metrics
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._max_batch_rows = 0
+        self._last_batch_rows = 0
+        self._rejected = 0
+        self._errors = 0
+        self._waits_ms = deque(maxlen=1024)
+
+    @classmethod
+    def from_env(cls, predict_fn):
+        """Build a batcher configured from BATCH_MAX_SIZE / BATCH_MAX_WAIT_MS / BATCH_MAX_QUEUE."""
+        return cls(
+            predict_fn,
+            max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "16")),
+            max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "5")),
+            max_queue_size=int(os.getenv("BATCH_MAX_QUEUE", "256")),
+        )
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, inputs) -> Future:
+        """Queue ``inputs`` (shape ``(N, ...)``) and return a future for its ``(N, ...)`` outputs."""
+        request = _Request(np.asarray(inputs))
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise BatchQueueFull("Inference queue is full")
+        return request.future
+
+    def predict(self, inputs, timeout=None):
+        """Blocking helper: submit ``inputs`` and wait for the result."""
+        return self.submit(inputs).result(timeout)
+
+    def _next_request(self, timeout):
+        """The next live request; cancelled ones are skipped, the rest are marked running."""
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            # False if the caller already cancelled; after this the future can't be cancelled
+            if request.future.set_running_or_notify_cancel():
+                return request
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        try:
+            first = self._next_request(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        rows = len(first.inputs)
+        deadline = first.enqueued_at + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._next_request(timeout=max(0.0, remaining))
+            except queue.Empty:
+                break
+            if rows + len(request.inputs) > self.max_batch_size:
+                # Doesn't fit; it opens the next batch instead.
+                self._carry = request
+                break
+            batch.append(request)
+            rows += len(request.inputs)
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch:
+                try:
+                    self._dispatch(batch)
+                except Exception as e:
+                    # Never let one bad batch kill the thread every later request waits on
+                    print(f"[batcher] dispatch failed: {type(e).__name__}: {e}")
+                    self._fail(batch, e)
+
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        inputs = batch[0].inputs if len(batch) == 1 else np.concatenate([r.inputs for r in batch])
+        try:
+            with stage("model.predict"):
+                outputs = np.asarray(self.predict_fn(inputs))
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            self._fail(batch, e)
+            return
+
+        offset = 0
+        for request in batch:
+            n = len(request.inputs)
+            try:
+                request.future.set_result(outputs[offset:offset + n])
+            except InvalidStateError:
+                pass
+            offset += n
+
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._rows += len(inputs)
+            self._last_batch_rows = len(inputs)
+            self._max_batch_rows = max(self._max_batch_rows, len(inputs))
+            self._waits_ms.extend((started - r.enqueued_at) * 1000.0 for r in batch)
+
+    @staticmethod
+    def _fail(batch, error):
+        for request in batch:
+            try:
+                request.future.set_exception(error)
+            except InvalidStateError:
+                pass
+
+    def stats(self) -> dict:
+        """Batch size, queue depth and queue wait figures for tuning."""
+        with self._lock:
+            waits = np.fromiter(self._waits_ms, dtype=np.float64)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize() + (1 if self._carry is not None else 0),
+                "batches": self._batches,
+                "requests": self._requests,
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "avg_batch_size": round(self._rows / self._batches, 2) if self._batches else 0.0,
+                "last_batch_size": self._last_batch_rows,
+                "max_observed_batch_size": self._max_batch_rows,
+                "wait_ms_p50": round(float(np.percentile(waits, 50)), 3) if waits.size else 0.0,
+                "wait_ms_p99": round(float(np.percentile(waits, 99)), 3) if waits.size else 0.0,
+                "wait_ms_max": round(float(waits.max()), 3) if waits.size else 0.0,
+            }
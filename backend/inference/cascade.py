@@ -0,0 +1,160 @@
+# backend/inference/cascade.py
+"""Crop-routed two-stage inference.
+
+Every class is ``Crop___Condition``, so once the crop is known only that
+crop's few classes are candidates. The crop comes from the request (the user
+picked "Tomato") or from an optional cheap first-stage crop classifier. Its
+guess is used only above CASCADE_THRESHOLD; below that the full model runs
+unrestricted.
+
+With a crop, the second stage is that crop's own small head when one is
+configured (the compute saving). Otherwise it is the full model with its
+softmax restricted to the crop's classes and renormalized (the accuracy
+gain: look-alike diseases of other crops can't win).
+
+Router and heads are ordinary models served through their own
+``InferenceEngine`` (lazy load, micro-batching, INFERENCE_BACKEND). They take
+the same 224x224 input as the full model; a reduced-resolution model should
+start with its own Resizing layer. A model that fails to load is skipped
+and the full model is used instead.
+
+Configuration (environment):
+    CASCADE_ROUTER_MODEL   crop classifier with one output per crop in ``labels.CROPS`` order (default: none)
+    CASCADE_THRESHOLD      router confidence needed to trust its crop (default 0.9)
+    CASCADE_HEADS_DIR      directory of per-crop heads named ``<crop>.keras`` (e.g. ``tomato.keras``),
+                           outputs in that crop's class order (default: none)
+"""
+import asyncio
+import os
+
+import numpy as np
+
+from .engine import InferenceEngine, ModelNotReady
+from .labels import CROP_CLASSES, CROPS, class_names, crop_key
+
+
+def restrict(predictions: np.ndarray, crop: str) -> np.ndarray:
+    """``(N, classes)`` probabilities conditioned on ``crop``: other crops zeroed, each row renormalized."""
+    index = CROP_CLASSES[crop]
+    restricted = np.zeros_like(predictions)
+    restricted[:, index] = predictions[:, index]
+    totals = restricted.sum(axis=1, keepdims=True)
+    # A row with no mass on the crop at all becomes uniform over its classes
+    empty = totals[:, 0] <= 0
+    restricted[np.ix_(empty, index)] = 1.0
+    totals[empty] = len(index)
+    return restricted / totals
+
+
+def expand(head_predictions: np.ndarray, crop: str) -> np.ndarray:
+    """A crop head's ``(N, k)`` output placed into the full ``(N, classes)`` layout."""
+    full = np.zeros((len(head_predictions), len(class_names)), dtype=np.float32)
+    full[:, CROP_CLASSES[crop]] = head_predictions
+    return full
+
+
+class Cascade:
+    """
+    Routes each prediction to the cheapest model that can answer it.
+
+    Args:
+        full: ``InferenceEngine`` of the full 38-class model (always the fallback).
+        router: optional ``InferenceEngine`` of a crop classifier.
+        heads: ``{crop: InferenceEngine}`` of per-crop heads.
+        threshold: router confidence required to act on its crop.
+    """
+
+    def __init__(self, full, router=None, heads=None, threshold=0.9):
+        self.full = full
+        self.router = router
+        self.heads = dict(heads or {})
+        self.threshold = threshold
+        self.routes = {"full": 0, "restricted": 0, "head": 0}
+        self.router_calls = 0
+        self.router_confident = 0
+
+    @classmethod
+    def from_env(cls, full):
+        router_path = os.getenv("CASCADE_ROUTER_MODEL")
+        heads = {}
+        heads_dir = os.getenv("CASCADE_HEADS_DIR")
+        if heads_dir and os.path.isdir(heads_dir):
+            for filename in sorted(os.listdir(heads_dir)):
+                crop = crop_key(os.path.splitext(filename)[0])
+                if crop in CROP_CLASSES:
+                    heads[crop] = InferenceEngine(os.path.join(heads_dir, filename))
+                else:
+                    print(f"[cascade] ignoring {filename}: not a known crop ({', '.join(CROPS)})")
+        return cls(
+            full,
+            router=InferenceEngine(router_path) if router_path else None,
+            heads=heads,
+            threshold=float(os.getenv("CASCADE_THRESHOLD", "0.9")),
+        )
+
+    @property
+    def enabled(self):
+        return self.router is not None or bool(self.heads)
+
+    async def route(self, inputs):
+        """The router's crop and confidence for ``inputs`` (rows averaged), or ``(None, None)``."""
+        if self.router is None:
+            return None, None
+        try:
+            scores = np.asarray(await self.router.predict(inputs)).mean(axis=0)
+        except ModelNotReady:
+            return None, None
+        self.router_calls += 1
+        best = int(np.argmax(scores))
+        return CROPS[best], float(scores[best])
+
+    async def predict(self, inputs, crop=None):
+        """
+        ``(N, classes)`` probabilities for ``inputs`` and a description of the route taken.
+
+        ``crop`` (a ``labels.CROPS`` key) skips the router.
+        """
+        info = {"crop": crop, "crop_source": "request" if crop else None}
+        if crop is None:
+            routed, confidence = await self.route(inputs)
+            if routed is not None:
+                info["crop_confidence"] = round(confidence, 4)
+                if confidence >= self.threshold:
+                    self.router_confident += 1
+                    crop = info["crop"] = routed
+                    info["crop_source"] = "router"
+
+        if crop is None:
+            info["stage"] = "full"
+            predictions = await self.full.predict(inputs)
+        else:
+            predictions = None
+            head = self.heads.get(crop)
+            if head is not None:
+                try:
+                    predictions = expand(np.asarray(await head.predict(inputs)), crop)
+                    info["stage"] = "head"
+                except ModelNotReady:
+                    pass
+            if predictions is None:
+                predictions = restrict(np.asarray(await self.full.predict(inputs)), crop)
+                info["stage"] = "restricted"
+        self.routes[info["stage"]] += 1
+        return predictions, info
+
+    async def warm_up(self):
+        """Load the full model, router and heads in the background; failures stay in ``status()``."""
+        await asyncio.gather(self.full.warm_up(), *(engine.warm_up() for engine in self._stages()))
+
+    def _stages(self):
+        return ([self.router] if self.router else []) + list(self.heads.values())
+
+    def status(self) -> dict:
+        return {
+            "router": self.router.status() if self.router else None,
+            "threshold": self.threshold,
+            "heads": {crop: engine.status()["state"] for crop, engine in self.heads.items()},
+            "routes": dict(self.routes),
+            "router_calls": self.router_calls,
+            "router_confident": self.router_confident,
+        }
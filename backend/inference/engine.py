@@ -0,0 +1,84 @@
+# backend/inference/engine.py
+"""Lazily initialized inference engine.
+
+Importing the predict routes no longer imports TensorFlow or loads the
+model. The backend and its micro-batcher are built on first use, or
+earlier by ``warm_up`` started from the application lifespan hook.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from .backends import KerasBackend, load_backend, load_keras_model, parity_check
+from .batching import MicroBatcher
+from ..metrics import INFERENCE_IN_FLIGHT
+
+
+class ModelNotReady(Exception):
+    """The model failed to load, so predictions cannot be served."""
+
+
+class InferenceEngine:
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.backend = None
+        self.batcher = None
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.batcher is not None
+
+    def load(self) -> MicroBatcher:
+        """Load the backend and start the batcher once; safe to call from many threads."""
+        if self.batcher is not None:
+            return self.batcher
+        with self._lock:
+            if self.batcher is not None:
+                return self.batcher
+            self.state = "loading"
+            started = time.perf_counter()
+            try:
+                backend = load_backend(model_path=self.model_path)
+                # Optionally refuse to serve if the selected backend drifts from Keras
+                if os.getenv("INFERENCE_PARITY_CHECK") == "1" and backend.name != "keras":
+                    parity = parity_check(KerasBackend(load_keras_model(self.model_path)), backend)
+                    if not parity["passed"]:
+                        raise RuntimeError(f"Inference backend '{backend.name}' failed parity check: {parity}")
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"Failed to load model from {self.model_path}: {e}"
+                raise ModelNotReady(self.error)
+            self.backend = backend
+            # Concurrent uploads share forward passes through the micro-batcher
+            self.batcher = MicroBatcher.from_env(backend.predict).start()
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.state = "ready"
+            self.error = None
+            return self.batcher
+
+    async def predict(self, inputs):
+        """Run ``inputs`` through the batcher, loading the model off the event loop if needed."""
+        with INFERENCE_IN_FLIGHT.track():
+            batcher = self.batcher or await asyncio.to_thread(self.load)
+            return await asyncio.wrap_future(batcher.submit(inputs))
+
+    async def warm_up(self):
+        """Background warm-up; failures are kept in ``status()`` rather than raised."""
+        try:
+            await asyncio.to_thread(self.load)
+        except ModelNotReady:
+            pass
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "backend": self.backend.name if self.backend else None,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
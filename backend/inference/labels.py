@@ -0,0 +1,62 @@
+# backend/inference/labels.py
+"""Class labels of the MobileNetV2 model, in output order.
+
+Every label is ``Crop___Condition``; ``CROP_CLASSES`` groups the output
+indices by crop.
+"""
+import re
+
+import numpy as np
+
+
+class_names = [
+    'Apple___Apple_scab',
+    'Apple___Black_rot',
+    'Apple___Cedar_apple_rust',
+    'Apple___healthy',
+    'Blueberry___healthy',
+    'Cherry_(including_sour)___Powdery_mildew',
+    'Cherry_(including_sour)___healthy',
+    'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot',
+    'Corn_(maize)___Common_rust_',
+    'Corn_(maize)___Northern_Leaf_Blight',
+    'Corn_(maize)___healthy',
+    'Grape___Black_rot',
+    'Grape___Esca_(Black_Measles)',
+    'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
+    'Grape___healthy',
+    'Orange___Haunglongbing_(Citrus_greening)',
+    'Peach___Bacterial_spot',
+    'Peach___healthy',
+    'Pepper,_bell___Bacterial_spot',
+    'Pepper,_bell___healthy',
+    'Potato___Early_blight',
+    'Potato___Late_blight',
+    'Potato___healthy',
+    'Raspberry___healthy',
+    'Soybean___healthy',
+    'Squash___Powdery_mildew',
+    'Strawberry___Leaf_scorch',
+    'Strawberry___healthy',
+    'Tomato___Bacterial_spot',
+    'Tomato___Early_blight',
+    'Tomato___Late_blight',
+    'Tomato___Leaf_Mold',
+    'Tomato___Septoria_leaf_spot',
+    'Tomato___Spider_mites Two-spotted_spider_mite',
+    'Tomato___Target_Spot',
+    'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
+    'Tomato___Tomato_mosaic_virus',
+    'Tomato___healthy'
+]
+
+
+def crop_key(name: str) -> str:
+    """Normalized crop of a class name or user input: "Corn_(maize)___Common_rust_" and "Corn" both give "corn"."""
+    match = re.match(r"[a-z]+", name.strip().lower())
+    return match.group(0) if match else ""
+
+
+# Crops in first-appearance order, and the output indices of each crop's classes
+CROPS = list(dict.fromkeys(crop_key(name) for name in class_names))
+CROP_CLASSES = {crop: np.array([i for i, name in enumerate(class_names) if crop_key(name) == crop]) for crop in CROPS}
@@ -0,0 +1,203 @@
+# backend/inference/result_cache.py
+"""Content-addressed cache of prediction results.
+
+Entries are keyed by a hash of the uploaded bytes, so an identical re-upload
+skips decode, inference and the remedy lookup. With perceptual keys enabled,
+an 8x8 average hash of the normalized 224x224 tensor is also stored, so a
+re-encoded or resized copy of the same photo hits after decode but before
+inference.
+
+Configuration (environment):
+    PREDICTION_CACHE             memory (default), disk or off
+    PREDICTION_CACHE_SIZE        maximum entries (default 2048)
+    PREDICTION_CACHE_TTL         seconds an entry stays valid (default 86400)
+    PREDICTION_CACHE_DIR         directory of the disk backend
+    PREDICTION_CACHE_PERCEPTUAL  1 to enable perceptual keys
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class MemoryCacheBackend:
+    """In-process LRU map with per-entry TTL."""
+
+    def __init__(self, max_entries=2048, ttl=86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCacheBackend:
+    """SQLite file on local disk; survives restarts and is shared by workers on the same node."""
+
+    def __init__(self, directory, max_entries=2048, ttl=86400.0):
+        os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "predictions.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def content_key(data: bytes) -> str:
+    return "blake2b:" + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def perceptual_key(img_array: np.ndarray) -> str:
+    """Average hash of a normalized ``(1, 224, 224, 3)`` or ``(224, 224, 3)`` tensor."""
+    gray = np.asarray(img_array).reshape(img_array.shape[-3:]).mean(axis=-1)
+    h, w = gray.shape
+    small = gray[: h - h % 8, : w - w % 8].reshape(8, h // 8, 8, w // 8).mean(axis=(1, 3))
+    bits = (small > small.mean()).ravel()
+    return "ahash:" + f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+class PredictionCache:
+    """Prediction results keyed by content hash, and optionally by perceptual hash."""
+
+    def __init__(self, backend, perceptual=False):
+        self.backend = backend
+        self.perceptual = perceptual
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build the configured cache, or return None when PREDICTION_CACHE=off."""
+        kind = os.getenv("PREDICTION_CACHE", "memory")
+        if kind == "off":
+            return None
+        size = int(os.getenv("PREDICTION_CACHE_SIZE", "2048"))
+        ttl = float(os.getenv("PREDICTION_CACHE_TTL", "86400"))
+        if kind == "disk":
+            directory = os.getenv("PREDICTION_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache"))
+            backend = DiskCacheBackend(os.path.abspath(directory), size, ttl)
+        elif kind == "memory":
+            backend = MemoryCacheBackend(size, ttl)
+        else:
+            raise ValueError(f"Unknown PREDICTION_CACHE '{kind}', expected memory, disk or off")
+        return cls(backend, perceptual=os.getenv("PREDICTION_CACHE_PERCEPTUAL") == "1")
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def lookup_bytes(self, key):
+        """Look up by content key; a miss is only counted once the perceptual lookup also misses."""
+        result = self.backend.get(key)
+        if result is not None:
+            self._count("hits")
+        elif not self.perceptual:
+            self._count("misses")
+        return result
+
+    def lookup_tensor(self, img_array, key=None, variant=""):
+        """
+        Look up by perceptual hash; on a hit the result is also stored under ``key``.
+
+        ``variant`` separates results that differ for the same image, e.g. the remedy language.
+        """
+        result = self.backend.get(f"{perceptual_key(img_array)}:{variant}")
+        if result is None:
+            self._count("misses")
+            return None
+        self._count("perceptual_hits")
+        if key is not None:
+            self.backend.set(key, result)
+        return result
+
+    def store(self, result, key, img_array=None, variant=""):
+        self.backend.set(key, result)
+        if self.perceptual and img_array is not None:
+            self.backend.set(f"{perceptual_key(img_array)}:{variant}", result)
+
+    def stats(self) -> dict:
+        total = self.hits + self.perceptual_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "perceptual_hits": self.perceptual_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.perceptual_hits) / total, 4) if total else 0.0,
+        }
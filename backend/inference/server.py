@@ -0,0 +1,246 @@
+# backend/inference/server.py
+"""Standalone inference server sharing tensors with API workers through shared memory.
+
+One server process (or a small pre-forked pool, optionally pinned to CPU
+cores) owns the model. API workers run with INFERENCE_BACKEND=remote and
+never import TensorFlow. Each worker connection creates one shared-memory
+segment that holds an input region of ``capacity`` images and an output
+region of ``capacity`` probability rows. Only small fixed-size headers
+travel over the Unix socket, so image tensors are never pickled or copied
+through the kernel.
+
+    python -m backend.inference.server --socket /tmp/cropcare-inference.sock --workers 2 --cpus 0-7
+    INFERENCE_BACKEND=remote INFERENCE_SOCKET=/tmp/cropcare-inference.sock WEB_CONCURRENCY=8 \
+        OTP_STORE=redis REDIS_URL=redis://localhost:6379/0 uvicorn backend.main:app
+
+(Several API workers need the shared redis OTP store; see ``otp_store``.)
+
+Protocol (all integers little-endian):
+    handshake  client -> "CCI1" u32 capacity, u16 name_len, name ; server -> "OK"
+    request    client -> u32 rows                                 ; server -> u8 status, u32 rows_or_msg_len [, msg]
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import struct
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .backends import INPUT_SHAPE, InferenceBackend, load_backend
+from .batching import MicroBatcher
+from .labels import class_names
+
+MAGIC = b"CCI1"
+HANDSHAKE = struct.Struct("<4sIH")
+REQUEST = struct.Struct("<I")
+REPLY = struct.Struct("<BI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+INPUT_ROW_BYTES = int(np.prod(INPUT_SHAPE)) * 4
+OUTPUT_ROW_BYTES = len(class_names) * 4
+
+
+def _recv_exact(conn, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    received = 0
+    while received < n:
+        count = conn.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Inference connection closed")
+        received += count
+    return bytes(buf)
+
+
+def _views(shm, capacity):
+    """Input and output arrays laid out back to back in one segment."""
+    inputs = np.ndarray((capacity, *INPUT_SHAPE), dtype=np.float32, buffer=shm.buf)
+    outputs = np.ndarray((capacity, len(class_names)), dtype=np.float32, buffer=shm.buf, offset=capacity * INPUT_ROW_BYTES)
+    return inputs, outputs
+
+
+def _attach(name):
+    """Attach to a segment owned by the client without letting this process unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class RemoteBackend(InferenceBackend):
+    """Client side: an ``InferenceBackend`` that forwards batches to the inference server."""
+
+    name = "remote"
+
+    def __init__(self, socket_path, capacity=64, connect_timeout=5.0):
+        self.socket_path = socket_path
+        self.capacity = capacity
+        self.connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._shm = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv("INFERENCE_SOCKET", "/tmp/cropcare-inference.sock"),
+            capacity=int(os.getenv("INFERENCE_SHM_ROWS", "64")),
+        )
+
+    def _connect(self):
+        self.close()
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self.capacity * (INPUT_ROW_BYTES + OUTPUT_ROW_BYTES)
+        )
+        self._inputs, self._outputs = _views(self._shm, self.capacity)
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(self.connect_timeout)
+        conn.connect(self.socket_path)
+        conn.settimeout(None)
+        name = self._shm.name.encode()
+        conn.sendall(HANDSHAKE.pack(MAGIC, self.capacity, len(name)) + name)
+        if _recv_exact(conn, 2) != b"OK":
+            raise ConnectionError("Inference server rejected the handshake")
+        self._conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._shm is not None:
+            self._inputs = self._outputs = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _run(self, batch):
+        n = len(batch)
+        self._inputs[:n] = batch
+        self._conn.sendall(REQUEST.pack(n))
+        status, value = REPLY.unpack(_recv_exact(self._conn, REPLY.size))
+        if status != STATUS_OK:
+            raise RuntimeError(f"Inference server error: {_recv_exact(self._conn, value).decode()}")
+        return self._outputs[:n].copy()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._connect()
+                    return np.concatenate([
+                        self._run(batch[i:i + self.capacity]) for i in range(0, len(batch), self.capacity)
+                    ])
+                except (ConnectionError, OSError):
+                    # Server restarted: reconnect once, then give up.
+                    self.close()
+                    if attempt:
+                        raise
+
+
+def _serve_connection(conn, batcher):
+    shm = None
+    try:
+        magic, capacity, name_len = HANDSHAKE.unpack(_recv_exact(conn, HANDSHAKE.size))
+        if magic != MAGIC:
+            return
+        shm = _attach(_recv_exact(conn, name_len).decode())
+        inputs, outputs = _views(shm, capacity)
+        conn.sendall(b"OK")
+        while True:
+            (rows,) = REQUEST.unpack(_recv_exact(conn, REQUEST.size))
+            try:
+                if rows > capacity:
+                    raise ValueError(f"{rows} rows exceed the shared buffer capacity of {capacity}")
+                outputs[:rows] = batcher.predict(inputs[:rows])
+            except Exception as e:
+                message = str(e).encode()
+                conn.sendall(REPLY.pack(STATUS_ERROR, len(message)) + message)
+            else:
+                conn.sendall(REPLY.pack(STATUS_OK, rows))
+    except ConnectionError:
+        pass
+    finally:
+        conn.close()
+        if shm is not None:
+            inputs = outputs = None
+            shm.close()
+
+
+def _worker(listener, cpus):
+    cpus = cpus & os.sched_getaffinity(0) if cpus else None
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    backend = load_backend(os.getenv("INFERENCE_SERVER_BACKEND", "tf_function"))
+    print(f"[inference-server {os.getpid()}] {backend.name} ready on cpus {sorted(cpus) if cpus else 'all'}", flush=True)
+    serve(listener, backend)
+
+
+def serve(listener, backend: InferenceBackend):
+    """Answer clients on ``listener`` with ``backend`` until the listener is closed."""
+    # Requests from different API workers are merged into shared forward passes.
+    batcher = MicroBatcher.from_env(backend.predict).start()
+    try:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=_serve_connection, args=(conn, batcher), daemon=True).start()
+    finally:
+        batcher.stop()
+
+
+def parse_cpus(spec):
+    """``"0-3,6"`` -> ``[0, 1, 2, 3, 6]``."""
+    cpus = []
+    for part in filter(None, spec.split(",")):
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared-memory inference server")
+    parser.add_argument("--socket", default=os.getenv("INFERENCE_SOCKET", "/tmp/cropcare-inference.sock"))
+    parser.add_argument("--workers", type=int, default=1, help="Model-owning processes to pre-fork")
+    parser.add_argument("--cpus", default="", help="CPU list to split between workers, e.g. 0-7")
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(args.socket)
+    listener.listen(128)
+
+    cpus = parse_cpus(args.cpus)
+    per_worker = max(1, len(cpus) // args.workers) if cpus else 0
+    # Fork before TensorFlow is imported; each worker loads its own model.
+    ctx = multiprocessing.get_context("fork")
+    workers = []
+    for i in range(args.workers):
+        worker_cpus = set(cpus[i * per_worker:(i + 1) * per_worker]) if cpus else None
+        process = ctx.Process(target=_worker, args=(listener, worker_cpus), daemon=True)
+        process.start()
+        workers.append(process)
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
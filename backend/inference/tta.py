@@ -0,0 +1,92 @@
+# backend/inference/tta.py
+"""Test-time augmentation and top-k selection.
+
+``augment`` turns one preprocessed image into a stack of views (flips,
+rotations and zoomed crops) built with a single NumPy gather, so the whole
+stack goes through the model as one batch instead of one ``predict`` call
+per view. The views' class probabilities are averaged.
+
+Views are taken in a fixed order of usefulness, so a budget of ``n`` always
+means the first ``n``:
+
+    identity, hflip, center_crop, vflip, rot90, rot270, crop_top_left,
+    crop_top_right, crop_bottom_left, crop_bottom_right, hflip_center_crop, rot180
+
+Rotations need a square input and are skipped otherwise.
+"""
+import functools
+
+import numpy as np
+
+# Zoomed crops cover this fraction of each axis and are resized back (nearest neighbour)
+CROP_SCALE = 0.875
+
+# name: (crop row start, crop col start) as a fraction of the margin (None = whole axis),
+#       flip rows, flip cols, transpose. rot90 = flip cols then transpose, rot270 = flip rows then transpose.
+VIEWS = {
+    "identity":          (None, None, False, False, False),
+    "hflip":             (None, None, False, True, False),
+    "center_crop":       (0.5, 0.5, False, False, False),
+    "vflip":             (None, None, True, False, False),
+    "rot90":             (None, None, False, True, True),
+    "rot270":            (None, None, True, False, True),
+    "crop_top_left":     (0.0, 0.0, False, False, False),
+    "crop_top_right":    (0.0, 1.0, False, False, False),
+    "crop_bottom_left":  (1.0, 0.0, False, False, False),
+    "crop_bottom_right": (1.0, 1.0, False, False, False),
+    "hflip_center_crop": (0.5, 0.5, False, True, False),
+    "rot180":            (None, None, True, True, False),
+}
+MAX_VIEWS = len(VIEWS)
+
+
+def _axis(size, crop_start, flip):
+    if crop_start is None:
+        index = np.arange(size)
+    else:
+        crop = max(1, int(round(size * CROP_SCALE)))
+        start = int(round((size - crop) * crop_start))
+        index = start + (np.arange(size) * crop) // size
+    return index[::-1] if flip else index
+
+
+@functools.lru_cache(maxsize=16)
+def _plan(height, width, n):
+    """
+    Flat pixel indices ``(n, H, W)`` of the first ``n`` views of an ``height x width`` image.
+
+    Every flip, crop and rotation is a gather of source pixels, so all views
+    come out of one ``take`` over the flattened image.
+    """
+    names = [name for name, spec in VIEWS.items() if height == width or not spec[4]][:n]
+    index = np.empty((len(names), height, width), dtype=np.intp)
+    for i, name in enumerate(names):
+        row_start, col_start, flip_rows, flip_cols, transpose = VIEWS[name]
+        rows = _axis(height, row_start, flip_rows)
+        cols = _axis(width, col_start, flip_cols)
+        index[i] = rows[None, :] * width + cols[:, None] if transpose else rows[:, None] * width + cols[None, :]
+    return tuple(names), index
+
+
+def view_names(budget, height=224, width=224):
+    return _plan(height, width, max(1, budget))[0]
+
+
+def augment(image: np.ndarray, budget: int) -> np.ndarray:
+    """
+    ``(H, W, C)`` image to an ``(n, H, W, C)`` batch of its first ``n = min(budget, MAX_VIEWS)`` views.
+
+    View 0 is the image itself, so averaging over the batch never loses the
+    single-pass prediction.
+    """
+    height, width, channels = image.shape
+    _, index = _plan(height, width, max(1, budget))
+    pixels = np.ascontiguousarray(image).reshape(height * width, channels)
+    return pixels.take(index.ravel(), axis=0).reshape(*index.shape, channels)
+
+
+def top_classes(probabilities: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` most likely classes, most likely first."""
+    k = min(k, len(probabilities))
+    index = np.argpartition(probabilities, -k)[-k:]
+    return index[np.argsort(probabilities[index])[::-1]]
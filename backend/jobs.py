@@ -0,0 +1,214 @@
+# backend/jobs.py
+"""In-process background jobs for slow side effects (SMS, notifications).
+
+Routes enqueue a named job and return; a few worker tasks on the event loop
+run it. Failed jobs are retried with exponential backoff, and a job that
+still fails after its last retry is appended to a dead-letter log (JSON lines)
+so it can be inspected. Each attempt is cut off after a timeout. Jobs that are
+still queued, running or waiting out a retry backoff when the queue is
+stopped are dead-lettered too (with a ``note``), rather than silently dropped.
+
+Job arguments often hold personal data (phone numbers, OTP codes, support
+messages), so the dead-letter record never contains them. It keeps the job
+name, attempts and error, plus whatever the handler's ``redact`` function
+returns (e.g. the recipient with all but its last characters masked).
+
+Configuration (environment):
+    JOB_WORKERS           concurrent worker tasks (default 4)
+    JOB_MAX_QUEUE         queued jobs before enqueue raises JobQueueFull (default 1000)
+    JOB_MAX_RETRIES       retries after the first attempt (default 3)
+    JOB_RETRY_BASE        first backoff in seconds, doubled per retry (default 1)
+    JOB_TIMEOUT           seconds an attempt may take before it counts as failed (default 30)
+    JOB_DEAD_LETTER_PATH  dead-letter log (default backend/data/dead_letters.jsonl)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+
+DEAD_LETTER_PATH = os.path.abspath(
+    os.getenv("JOB_DEAD_LETTER_PATH", os.path.join(os.path.dirname(__file__), "data", "dead_letters.jsonl"))
+)
+
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds ``max_queue`` jobs."""
+
+
+def mask(value, keep=4) -> str:
+    """All but the last ``keep`` characters (at most half of them) hidden ("+919812345678" -> "*********5678")."""
+    value = str(value or "")
+    keep = min(keep, len(value) // 2)
+    return "*" * (len(value) - keep) + value[len(value) - keep:]
+
+
+class JobQueue:
+    """
+    Named async handlers run by a pool of worker tasks.
+
+    Handlers are registered once (``register("sms", send_sms, redact=...)``)
+    and jobs carry only the handler name and its keyword arguments. The
+    dead-letter log records ``redact(**kwargs)`` instead of the arguments.
+    """
+
+    def __init__(self, workers=4, max_queue=1000, max_retries=3, retry_base=1.0, timeout=30.0,
+                 dead_letter_path=DEAD_LETTER_PATH):
+        self.workers = max(1, int(workers))
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.timeout = timeout
+        self.dead_letter_path = dead_letter_path
+        self._handlers = {}
+        self._redactors = {}
+        self._timeouts = {}
+        self._queue = None
+        self._tasks = []
+        self._retrying = {}  # backoff task -> (name, kwargs, next attempt, last error)
+        self.dead_letters = deque(maxlen=100)
+
+        # Metrics
+        self._enqueued = 0
+        self._succeeded = 0
+        self._retried = 0
+        self._failed = 0
+        self._rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_queue=int(os.getenv("JOB_MAX_QUEUE", "1000")),
+            max_retries=int(os.getenv("JOB_MAX_RETRIES", "3")),
+            retry_base=float(os.getenv("JOB_RETRY_BASE", "1")),
+            timeout=float(os.getenv("JOB_TIMEOUT", "30")),
+        )
+
+    def register(self, name, handler, redact=None, timeout=None):
+        """
+        Register ``handler`` (an async callable taking keyword arguments) under ``name``.
+
+        ``redact`` takes the same keyword arguments and returns the dict kept
+        in a dead letter; without it only the job name, attempts and error are kept.
+        ``timeout`` overrides the queue's per-attempt timeout for this handler.
+        """
+        self._handlers[name] = handler
+        self._redactors[name] = redact
+        self._timeouts[name] = timeout
+        return handler
+
+    def start(self):
+        # Workers are bound to the running loop, so they're (re)created lazily
+        if not self._tasks or all(task.done() for task in self._tasks):
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def stop(self, timeout=5.0):
+        """
+        Give queued jobs ``timeout`` seconds to finish, then cancel the workers.
+
+        Whatever is left (running, queued or waiting to be retried) goes to the dead-letter log.
+        """
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        retrying, self._retrying = self._retrying, {}
+        for task, (name, kwargs, attempt, error) in retrying.items():
+            if task.cancel():
+                self._failed += 1
+                self._dead_letter(name, kwargs, attempt - 1, error, note="not retried: shutting down")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *retrying, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            name, kwargs, attempt = self._queue.get_nowait()
+            self._failed += 1
+            self._dead_letter(name, kwargs, attempt - 1, None, note="not run: shutting down")
+
+    def enqueue(self, name, /, **kwargs):
+        """Queue a job and return immediately; raises JobQueueFull when the queue is at capacity."""
+        if name not in self._handlers:
+            raise KeyError(f"No job handler registered for {name!r}")
+        self.start()
+        try:
+            self._queue.put_nowait((name, kwargs, 0))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise JobQueueFull()
+        self._enqueued += 1
+
+    async def _worker(self):
+        while True:
+            name, kwargs, attempt = await self._queue.get()
+            timeout = self._timeouts.get(name) or self.timeout
+            try:
+                await asyncio.wait_for(self._handlers[name](**kwargs), timeout)
+                self._succeeded += 1
+            except asyncio.CancelledError:
+                self._failed += 1
+                self._dead_letter(name, kwargs, attempt, None, note="interrupted: shutting down")
+                raise
+            except Exception as e:
+                self._retry_or_bury(name, kwargs, attempt, e)
+            finally:
+                self._queue.task_done()
+
+    def _retry_or_bury(self, name, kwargs, attempt, error):
+        if attempt >= self.max_retries:
+            self._failed += 1
+            self._dead_letter(name, kwargs, attempt, error)
+            return
+        self._retried += 1
+        delay = self.retry_base * (2 ** attempt) * random.uniform(0.5, 1.0)
+        # Back off outside the workers so a failing job doesn't hold one up
+        task = asyncio.create_task(self._requeue(name, kwargs, attempt + 1, delay))
+        self._retrying[task] = (name, kwargs, attempt + 1, error)
+        task.add_done_callback(lambda done: self._retrying.pop(done, None))
+
+    async def _requeue(self, name, kwargs, attempt, delay):
+        await asyncio.sleep(delay)
+        await self._queue.put((name, kwargs, attempt))
+
+    def _dead_letter(self, name, kwargs, attempt, error, note=None):
+        redact = self._redactors.get(name)
+        try:
+            details = redact(**kwargs) if redact else {}
+        except Exception as e:
+            details = {"redact_error": type(e).__name__}
+        record = {
+            "job": name,
+            "details": details,
+            "attempts": attempt + 1,
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "failed_at": time.time(),
+        }
+        if note:
+            record["note"] = note
+        self.dead_letters.append(record)
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            print(f"[jobs] could not write dead letter for {name}: {e}")
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "retrying": len(self._retrying),
+            "enqueued": self._enqueued,
+            "succeeded": self._succeeded,
+            "retried": self._retried,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+
+job_queue = JobQueue.from_env()
@@ -0,0 +1,265 @@
+# backend/llm_client.py
+"""Shared async client for the OpenAI-compatible chat completions API.
+
+One pooled ``httpx.AsyncClient`` is reused by every route. Each call gets an
+overall deadline, concurrency is bounded by a semaphore, transient failures
+are retried with jittered exponential backoff, and a circuit breaker stops
+calling the upstream while it is failing.
+
+Configuration (environment):
+    OPENAI_API_KEY          API key sent as a bearer token
+    OPENAI_BASE_URL         default https://api.openai.com/v1; point it at a local mock server in tests
+    LLM_MODEL               default gpt-3.5-turbo
+    LLM_TIMEOUT             per-call deadline in seconds (default 20)
+    LLM_MAX_CONCURRENCY     simultaneous upstream calls (default 16)
+    LLM_MAX_RETRIES         retries after the first attempt (default 2)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from .metrics import LLM_IN_FLIGHT, stage
+
+load_dotenv()
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    """The upstream could not produce an answer within the deadline."""
+
+
+class CircuitOpen(LLMUnavailable):
+    """Calls are short-circuited because the upstream keeps failing."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens for
+    ``reset_timeout`` seconds; then a single trial call is let through.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Free the half-open trial slot of a call that ended without an outcome (e.g. cancelled)."""
+        self._trial_in_flight = False
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url=None,
+        api_key=None,
+        model=None,
+        timeout=None,
+        max_concurrency=None,
+        max_retries=None,
+        backoff_base=0.25,
+        breaker=None,
+        transport=None,
+    ):
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+        self.model = model or os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+        self.timeout = float(timeout or os.getenv("LLM_TIMEOUT", "20"))
+        self.max_concurrency = int(max_concurrency or os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("LLM_MAX_RETRIES", "2"))
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self._transport = transport
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _payload(self, messages, max_tokens, temperature, stream=False):
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": stream,
+        }
+
+    async def _backoff(self, attempt):
+        # Full jitter: spreads retries from many callers over the whole window.
+        await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+
+    async def _with_retries(self, call):
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            raise CircuitOpen("LLM circuit is open")
+        try:
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await self._backoff(attempt - 1)
+                try:
+                    result = await call()
+                except (_RetryableError, httpx.TransportError) as e:
+                    last_error = e
+                    continue
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                self.breaker.record_success()
+                return result
+            self.breaker.record_failure()
+            raise LLMUnavailable(f"LLM call failed after {self.max_retries + 1} attempts: {last_error}")
+        finally:
+            # A cancelled trial (client disconnect, deadline) recorded nothing; don't keep the
+            # breaker waiting for it forever. CancelledError isn't an Exception, so it lands here.
+            if trial:
+                self.breaker.release_trial()
+
+    async def chat(self, messages, max_tokens=200, temperature=0.7, timeout=None) -> str:
+        """Return the assistant reply for ``messages``. Raises ``LLMUnavailable`` on failure or deadline."""
+
+        async def call():
+            response = await self.client.post("/chat/completions", json=self._payload(messages, max_tokens, temperature))
+            if response.status_code in RETRYABLE_STATUS:
+                raise _RetryableError(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"].strip()
+
+        try:
+            async with self._semaphore:
+                with LLM_IN_FLIGHT.track(), stage("llm.chat"):
+                    return await asyncio.wait_for(self._with_retries(call), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise LLMUnavailable("LLM call exceeded its deadline")
+        except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+            raise LLMUnavailable(str(e))
+
+    async def stream_chat(self, messages, max_tokens=200, temperature=0.7, timeout=None):
+        """
+        Yield reply tokens as they arrive.
+
+        Connecting is retried like ``chat``; once the first token has been
+        yielded the stream is not restarted. The deadline covers the whole stream.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        async def open_stream():
+            request = self.client.build_request(
+                "POST", "/chat/completions", json=self._payload(messages, max_tokens, temperature, stream=True)
+            )
+            response = await self.client.send(request, stream=True)
+            if response.status_code in RETRYABLE_STATUS:
+                await response.aclose()
+                raise _RetryableError(f"HTTP {response.status_code}")
+            if response.is_error:
+                await response.aclose()
+                raise LLMUnavailable(f"HTTP {response.status_code}")
+            return response
+
+        async with self._semaphore:
+            with LLM_IN_FLIGHT.track():
+                try:
+                    with stage("llm.stream_connect"):
+                        response = await asyncio.wait_for(self._with_retries(open_stream), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    self.breaker.record_failure()
+                    raise LLMUnavailable("LLM stream did not start before its deadline")
+                try:
+                    lines = response.aiter_lines()
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise LLMUnavailable("LLM stream exceeded its deadline")
+                        try:
+                            line = await asyncio.wait_for(lines.__anext__(), remaining)
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            raise LLMUnavailable("LLM stream exceeded its deadline")
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+                except (httpx.HTTPError, KeyError, IndexError, ValueError, AttributeError) as e:
+                    # Transport errors and malformed SSE chunks alike
+                    raise LLMUnavailable(f"Bad LLM stream: {e}")
+                finally:
+                    await response.aclose()
+
+
+_client = None
+
+
+def get_client() -> LLMClient:
+    """Process-wide client, created on first use."""
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
+
+
+async def close_client():
+    if _client is not None:
+        await _client.aclose()
@@ -1,11 +1,72 @@
 # backend/main.py
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import explore,auth,community,help,predict# Import our explore routes
+from .routes import explore,auth,community,help,search# Import our explore routes
+from .llm_client import close_client
+from .database import dispose_async_engine
+from .auth_utils import hashing_pool
+from .jobs import job_queue
+from .prediction_jobs import close_callback_client
+from .search import search_index
+from . import metrics, uploads
+
+# ENABLE_PREDICT=0 runs the API without the predict router (and never touches TensorFlow)
+ENABLE_PREDICT = os.getenv("ENABLE_PREDICT", "1") != "0"
+# PREDICT_WARMUP=0 defers model loading to the first prediction
+PREDICT_WARMUP = os.getenv("PREDICT_WARMUP", "1") != "0"
+
+if ENABLE_PREDICT:
+    from .routes import predict
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    try:
+        # Creates/backfills the index (or loads the in-memory one) from the database
+        await search_index.setup()
+    except Exception as e:
+        print(f"[search] {search_index.name} index setup failed: {e}")
+    warm_up = None
+    if ENABLE_PREDICT and PREDICT_WARMUP:
+        # Load the model (and any cascade router/heads) in the background so startup isn't blocked on TensorFlow
+        warm_up = asyncio.create_task(predict.cascade.warm_up())
+    if ENABLE_PREDICT:
+        # Also resumes prediction jobs queued before a restart
+        predict.prediction_jobs.start()
+    yield
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+    if ENABLE_PREDICT:
+        # Interrupted prediction jobs go back to the queue for the next start
+        await predict.prediction_jobs.stop()
+    # Let queued SMS/notifications/callbacks go out, then release pooled upstream and database connections
+    await job_queue.stop()
+    await close_callback_client()
+    await close_client()
+    await dispose_async_engine()
+    hashing_pool.shutdown()
+    explore.chat_cache.close()
+
 
 app = FastAPI( title="CropCareAI Backend",
     description="Backend API for CropCareAI project - disease detection, community, and AI support",
-    version="1.0.0")
+    version="1.0.0",
+    lifespan=lifespan)
+
+# Upload bodies are capped while they stream in, before the multipart parser buffers them
+app.add_middleware(uploads.UploadLimitMiddleware, limits={
+    "/predict/predict": uploads.UPLOAD_MAX_BYTES + uploads.MULTIPART_OVERHEAD,
+    "/predict/batch": uploads.BATCH_UPLOAD_MAX_BYTES + uploads.MULTIPART_OVERHEAD,
+    "/predict/jobs": uploads.UPLOAD_MAX_BYTES + uploads.MULTIPART_OVERHEAD,
+})
+
+# Per-route latency histograms, in-flight gauge and the opt-in profiler
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Enable CORS
 app.add_middleware(
@@ -22,10 +83,23 @@ app.include_router(explore.router, prefix="/explore", tags=["Explore"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(community.router, prefix="/community", tags=["Community"])
 app.include_router(help.router, prefix="/help", tags=["Help & Support"])
-app.include_router(predict.router, prefix="/predict", tags=["Predict"])
+app.include_router(search.router, prefix="/search", tags=["Search"])
+if ENABLE_PREDICT:
+    app.include_router(predict.router, prefix="/predict", tags=["Predict"])
 
 
 
 @app.get("/")
 def root():
     return {"message": "CropCare AI Backend is running!"}
+
+
+# Queue depths read at scrape time
+metrics.Gauge("job_queue_depth", "Background jobs waiting to run", function=lambda: job_queue.stats()["queued"])
+metrics.Gauge("hashing_pending", "Password hashes queued or running", function=lambda: hashing_pool.stats()["pending"])
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,291 @@
+# backend/metrics.py
+"""Prometheus metrics and an opt-in request profiler.
+
+Counters, gauges and histograms are kept in plain dicts behind a lock and
+rendered in the Prometheus text format by ``render()`` (served at /metrics).
+Recording a value is a dict lookup and a couple of additions, so everything
+here stays on in production.
+
+``MetricsMiddleware`` records a latency histogram per route template, method
+and status plus an in-flight gauge. Stage timers inside the predict pipeline,
+the LLM client and the database engines use ``stage()`` and
+``instrument_engine()``.
+
+Configuration (environment):
+    PROFILE_ENABLED       1 to allow per-request cProfile dumps (default off)
+    PROFILE_HEADER        request header that asks for a profile (default X-Profile)
+    PROFILE_SAMPLE_RATE   fraction of requests profiled without the header (default 0)
+    PROFILE_DIR           where .prof files go (default backend/.cache/profiles)
+"""
+import bisect
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; ``function`` makes it read a live value at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def track(self, *labels):
+        """Context manager counting the blocks currently inside it."""
+        return _InFlight(self, labels)
+
+    def render(self):
+        if self.function is not None:
+            try:
+                self.set(self.function())
+            except Exception:
+                pass
+        return super().render()
+
+
+class _InFlight:
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge, labels):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(*self.labels)
+
+    def __exit__(self, *exc):
+        self.gauge.dec(*self.labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """Context manager observing the block's duration in seconds."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in named pipeline stages", ("stage",))
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Database statement latency", ("operation",))
+INFERENCE_IN_FLIGHT = Gauge("inference_requests_in_flight", "Predictions waiting on or running in the model")
+LLM_IN_FLIGHT = Gauge("llm_requests_in_flight", "Calls currently open to the LLM upstream")
+
+
+def stage(name):
+    """``with stage("predict.decode"): ...`` records the block in stage_duration_seconds."""
+    return STAGE_SECONDS.time(name)
+
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def instrument_engine(engine):
+    """Time every statement run on a (sync) SQLAlchemy engine, labelled by its verb."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, verb if verb in _OPERATIONS else "OTHER")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute doesn't run for failed statements
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+    return engine
+
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile").lower().encode()
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), ".cache", "profiles"))
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9]+")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering, so streaming routes are unaffected).
+
+    With PROFILE_ENABLED=1, a request carrying the profile header (or picked
+    by PROFILE_SAMPLE_RATE) runs under cProfile and the dump's path comes back
+    in ``X-Profile-File``. Only one request is profiled at a time, and since the
+    event loop is shared the profile also shows whatever else ran meanwhile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._profiling = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        profile_path = None
+        if PROFILE_ENABLED and (
+            any(name == PROFILE_HEADER for name, _ in scope["headers"]) or random.random() < PROFILE_SAMPLE_RATE
+        ) and self._profiling.acquire(blocking=False):
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            slug = _UNSAFE.sub("_", scope["path"]).strip("_") or "root"
+            profile_path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{slug}.prof")
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_path:
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"x-profile-file", profile_path.encode())]
+            await send(message)
+
+        profiler = cProfile.Profile() if profile_path else None
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+                self._profiling.release()
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route_template(scope), str(status))
+
+
+def route_template(scope):
+    """
+    The matched route's path template, e.g. ``/community/posts/{post_id}/like``.
+
+    Templates keep the label set bounded; unmatched paths share one series.
+    Newer FastAPI keeps included routers nested, so ``scope["route"].path``
+    lacks the include prefix; the full template is on the effective route
+    context FastAPI stores in the scope.
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    template = getattr(context, "path_format", None)
+    if template:
+        return template
+    return getattr(scope.get("route"), "path", "<unmatched>")
@@ -0,0 +1,270 @@
+# backend/otp_store.py
+"""Short-lived storage for phone login codes.
+
+Codes live outside the ``users`` table, expire on their own, allow a limited
+number of guesses, and each phone number may only request a few per window.
+
+The memory and fakeredis stores live inside one process. With more than one
+worker process, send-otp and verify-otp can land on different workers and
+valid codes are rejected, so multi-worker deployments need OTP_STORE=redis.
+Startup is refused with a per-process store when WEB_CONCURRENCY (the worker
+count read by uvicorn and gunicorn) is above 1, or when this process is a
+worker spawned by ``uvicorn --workers N`` with N above 1 (read from the
+parent's command line under /proc).
+
+Configuration (environment):
+    OTP_STORE          memory (default), redis or fakeredis; redis is required with several workers
+                       (pip install redis)
+    REDIS_URL          connection URL of the redis backend (default redis://localhost:6379/0)
+    OTP_TTL            seconds a code stays valid (default 300)
+    OTP_MAX_ATTEMPTS   wrong guesses before a code is burned (default 5)
+    OTP_RATE_LIMIT     codes a phone may request per window (default 3)
+    OTP_RATE_WINDOW    rate-limit window in seconds (default 600)
+"""
+import asyncio
+import hmac
+import multiprocessing
+import os
+import time
+
+# verify() outcomes
+VALID = "valid"
+INVALID = "invalid"
+EXPIRED = "expired"
+LOCKED = "locked"
+
+
+class OTPRateLimited(Exception):
+    """Raised when a phone number has requested too many codes in the current window."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many OTP requests, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class MemoryOTPStore:
+    """Per-process TTL map; fine for a single worker or development."""
+
+    def __init__(self, ttl=300, max_attempts=5, rate_limit=3, rate_window=600):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._codes = {}   # phone -> [code, expires_at, attempts]
+        self._sends = {}   # phone -> [window_start, count]
+        self._lock = asyncio.Lock()
+        self._next_sweep = 0.0
+
+    def _sweep(self, now):
+        # Drop expired entries at most once per TTL so the maps can't grow without bound
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.ttl
+        self._codes = {phone: entry for phone, entry in self._codes.items() if entry[1] > now}
+        self._sends = {phone: entry for phone, entry in self._sends.items() if entry[0] + self.rate_window > now}
+
+    async def issue(self, phone, code):
+        """Store ``code`` for ``phone``, replacing any earlier one; raises OTPRateLimited."""
+        async with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            window = self._sends.get(phone)
+            if window is None or window[0] + self.rate_window <= now:
+                window = self._sends[phone] = [now, 0]
+            if window[1] >= self.rate_limit:
+                raise OTPRateLimited(int(window[0] + self.rate_window - now) + 1)
+            window[1] += 1
+            self._codes[phone] = [code, now + self.ttl, 0]
+
+    async def verify(self, phone, code):
+        async with self._lock:
+            now = time.monotonic()
+            entry = self._codes.get(phone)
+            if entry is None or entry[1] <= now:
+                self._codes.pop(phone, None)
+                return EXPIRED
+            entry[2] += 1
+            if hmac.compare_digest(entry[0].encode(), code.encode()):
+                del self._codes[phone]
+                return VALID
+            if entry[2] >= self.max_attempts:
+                del self._codes[phone]
+                return LOCKED
+            return INVALID
+
+    def __len__(self):
+        return len(self._codes)
+
+
+class RedisOTPStore:
+    """
+    Codes in Redis, shared by every worker; expiry is left to Redis key TTLs.
+
+    ``client`` is anything with the async ``get/set/incr/ttl/delete`` methods
+    and ``pipeline`` of ``redis.asyncio.Redis`` (``FakeRedis`` below stands in
+    locally).
+    """
+
+    def __init__(self, client, ttl=300, max_attempts=5, rate_limit=3, rate_window=600, prefix="otp"):
+        self.client = client
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.prefix = prefix
+
+    def _keys(self, phone):
+        return (f"{self.prefix}:code:{phone}", f"{self.prefix}:attempts:{phone}", f"{self.prefix}:sends:{phone}")
+
+    async def _count(self, key, seconds):
+        """INCR ``key``, created with a ``seconds`` TTL; one MULTI, so a counter never outlives its window."""
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(key, 0, ex=seconds, nx=True)
+            pipe.incr(key)
+            _, count = await pipe.execute()
+        return count
+
+    async def issue(self, phone, code):
+        code_key, attempts_key, sends_key = self._keys(phone)
+        sends = await self._count(sends_key, self.rate_window)
+        if sends > self.rate_limit:
+            raise OTPRateLimited(max(1, await self.client.ttl(sends_key)))
+        await self.client.delete(attempts_key)
+        await self.client.set(code_key, code, ex=self.ttl)
+
+    async def verify(self, phone, code):
+        code_key, attempts_key, _ = self._keys(phone)
+        stored = await self.client.get(code_key)
+        if stored is None:
+            return EXPIRED
+        if isinstance(stored, bytes):
+            stored = stored.decode()
+        attempts = await self._count(attempts_key, self.ttl)
+        if hmac.compare_digest(stored.encode(), code.encode()):
+            await self.client.delete(code_key, attempts_key)
+            return VALID
+        if attempts >= self.max_attempts:
+            await self.client.delete(code_key, attempts_key)
+            return LOCKED
+        return INVALID
+
+
+class FakeRedis:
+    """The handful of ``redis.asyncio.Redis`` commands RedisOTPStore uses, kept in memory."""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at or None)
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    async def get(self, key):
+        item = self._live(key)
+        return None if item is None else item[0]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and self._live(key) is not None:
+            return None
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def incr(self, key):
+        item = self._live(key)
+        value = (int(item[0]) if item else 0) + 1
+        self._data[key] = (value, item[1] if item else None)
+        return value
+
+    async def expire(self, key, seconds):
+        item = self._live(key)
+        if item is None:
+            return False
+        self._data[key] = (item[0], time.monotonic() + seconds)
+        return True
+
+    async def ttl(self, key):
+        item = self._live(key)
+        if item is None:
+            return -2
+        return -1 if item[1] is None else int(item[1] - time.monotonic()) + 1
+
+    async def delete(self, *keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues FakeRedis commands and runs them back to back (none of them yields, so they run as one)."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._commands.clear()
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+def worker_count():
+    """WEB_CONCURRENCY, or ``--workers`` of the uvicorn supervisor that spawned this process."""
+    workers = int(os.getenv("WEB_CONCURRENCY", "1") or "1")
+    parent = multiprocessing.parent_process()
+    if parent is None:
+        return workers
+    try:
+        with open(f"/proc/{parent.pid}/cmdline", "rb") as f:
+            args = f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return workers
+    for flag, value in zip(args, args[1:] + [""]):
+        if flag.startswith("--workers="):
+            flag, value = "--workers", flag.partition("=")[2]
+        if flag == "--workers" and value.isdigit():
+            workers = max(workers, int(value))
+    return workers
+
+
+def from_env():
+    """Build the OTP store selected by OTP_STORE."""
+    options = dict(
+        ttl=int(os.getenv("OTP_TTL", "300")),
+        max_attempts=int(os.getenv("OTP_MAX_ATTEMPTS", "5")),
+        rate_limit=int(os.getenv("OTP_RATE_LIMIT", "3")),
+        rate_window=int(os.getenv("OTP_RATE_WINDOW", "600")),
+    )
+    kind = os.getenv("OTP_STORE", "memory").lower()
+    workers = worker_count()
+    if kind != "redis" and workers > 1:
+        raise RuntimeError(
+            f"OTP_STORE={kind} keeps codes in one process, but the app runs {workers} workers: "
+            "codes sent by one worker would be rejected by the others. Set OTP_STORE=redis and REDIS_URL."
+        )
+    if kind == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("OTP_STORE=redis requires the redis package")
+        client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        return RedisOTPStore(client, **options)
+    if kind == "fakeredis":
+        return RedisOTPStore(FakeRedis(), **options)
+    return MemoryOTPStore(**options)
@@ -0,0 +1,486 @@
+# backend/prediction_jobs.py
+"""Asynchronous prediction jobs.
+
+``POST /predict/jobs`` stores the upload in a local SQLite queue and returns
+a job id at once, so a slow connection never has to hold a request open
+through decode, inference and the remedy lookup. Worker tasks claim queued
+jobs, run the normal prediction pipeline and store the result. Clients poll
+``GET /predict/jobs/{id}``, or pass a ``callback_url`` that gets the result
+POSTed to it (through the background job queue, so failed deliveries are
+retried).
+
+The queue is a file, so jobs survive a restart. A claimed job holds a lease;
+if its worker dies, the job is picked up again once the lease runs out.
+A job that loses its worker PREDICT_JOB_MAX_ATTEMPTS times (e.g. an input
+that crashes it) is marked failed instead of being claimed again. When the
+batcher is full the job goes back in the queue for PREDICT_JOB_BUSY_DELAY
+seconds without using up an attempt. Every job, finished or not, is deleted
+PREDICT_JOB_TTL seconds after its last update.
+
+Callbacks only go to public addresses: the host is resolved when the job is
+submitted and again before each delivery, and loopback, private, link-local
+and reserved addresses are refused unless PREDICT_CALLBACK_HOSTS lists the
+host explicitly.
+
+Configuration (environment):
+    PREDICT_JOBS_DB               SQLite file of the queue (default backend/data/prediction_jobs.sqlite3)
+    PREDICT_JOB_WORKERS           concurrent jobs per process (default 2)
+    PREDICT_JOB_MAX_PENDING       queued + running jobs before new ones get 503 (default 500)
+    PREDICT_JOB_MAX_PENDING_MB    stored uploads of queued + running jobs before new ones get 503 (default 512)
+    PREDICT_JOB_MAX_ATTEMPTS      tries per job before it is marked failed (default 3)
+    PREDICT_JOB_LEASE             seconds a claimed job may run before it is reclaimed (default 300)
+    PREDICT_JOB_BUSY_DELAY        seconds a job waits before retrying after "server busy" (default 5)
+    PREDICT_JOB_TTL               seconds a job and its result are kept (default 86400)
+    PREDICT_CALLBACK_SECRET       if set, callbacks carry X-Signature: sha256=<HMAC of the body>
+    PREDICT_CALLBACK_HOSTS        comma-separated hosts callbacks may go to; only these are allowed when set,
+                                  and they may resolve to private addresses (default: any public host)
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+from .inference.batching import BatchQueueFull
+from .jobs import job_queue
+
+DB_PATH = os.path.abspath(
+    os.getenv("PREDICT_JOBS_DB", os.path.join(os.path.dirname(__file__), "data", "prediction_jobs.sqlite3"))
+)
+CALLBACK_SECRET = os.getenv("PREDICT_CALLBACK_SECRET", "")
+CALLBACK_HOSTS = {host.strip().lower() for host in os.getenv("PREDICT_CALLBACK_HOSTS", "").split(",") if host.strip()}
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class PredictionJobsFull(Exception):
+    """Raised when ``max_pending`` jobs, or ``max_pending_bytes`` of uploads, are already queued or running."""
+
+
+class PredictionJobStore:
+    """Jobs table in a local SQLite file (WAL), shared by every worker process on the node."""
+
+    def __init__(self, path=DB_PATH, max_pending=500, max_pending_bytes=512 * 2**20, max_attempts=3, lease=300.0,
+                 ttl=86400.0):
+        self.path = path
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prediction_jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, upload BLOB,"
+                " callback_url TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL, lease_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_prediction_jobs_status ON prediction_jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_prediction_jobs_updated ON prediction_jobs (updated_at)")
+            self._conn = conn
+        return self._conn
+
+    def create(self, upload: bytes, params: dict, callback_url=None) -> str:
+        """Queue a job and return its id; raises PredictionJobsFull at capacity."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            # IMMEDIATE takes the write lock first, so the capacity check holds across processes
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                pending, pending_bytes = db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(upload)), 0) FROM prediction_jobs WHERE status IN (?, ?)",
+                    (QUEUED, RUNNING),
+                ).fetchone()
+                # Uploads stay on disk until their job ends, so both the count and their size are capped
+                if pending >= self.max_pending or pending_bytes + len(upload) > self.max_pending_bytes:
+                    raise PredictionJobsFull()
+                db.execute(
+                    "INSERT INTO prediction_jobs (id, status, params, upload, callback_url, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, json.dumps(params), upload, callback_url, now, now),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self):
+        """Take the oldest due queued (or lease-expired) job: ``(id, upload, params, callback_url, attempts)`` or None."""
+        now = time.time()
+        with self._lock:
+            # Queued jobs may be held back (lease_until) after a busy retry; lease-expired jobs
+            # are only reclaimed while they have attempts left (see fail_abandoned)
+            row = self._db().execute(
+                "UPDATE prediction_jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ?"
+                " WHERE id = (SELECT id FROM prediction_jobs"
+                "  WHERE (status = ? AND (lease_until IS NULL OR lease_until <= ?))"
+                "   OR (status = ? AND lease_until < ? AND attempts < ?) ORDER BY created_at LIMIT 1)"
+                " RETURNING id, upload, params, callback_url, attempts",
+                (RUNNING, now + self.lease, now, QUEUED, now, RUNNING, now, self.max_attempts),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]), row[3], row[4]
+
+    def fail_abandoned(self):
+        """Fail lease-expired jobs that have used every attempt; returns their ``(id, callback_url, error)``."""
+        now = time.time()
+        error = f"Worker lost the job {self.max_attempts} times"
+        with self._lock:
+            return self._db().execute(
+                "UPDATE prediction_jobs SET status = ?, error = ?, upload = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE status = ? AND lease_until < ? AND attempts >= ?"
+                " RETURNING id, callback_url, error",
+                (FAILED, error, now, RUNNING, now, self.max_attempts),
+            ).fetchall()
+
+    def finish(self, job_id, result=None, error=None):
+        """Store the outcome and drop the upload."""
+        with self._lock:
+            self._db().execute(
+                "UPDATE prediction_jobs SET status = ?, result = ?, error = ?, upload = NULL,"
+                " lease_until = NULL, updated_at = ? WHERE id = ?",
+                (FAILED if error else DONE, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def requeue(self, job_id, error=None, refund=False, delay=0.0):
+        """
+        Put a claimed job back in the queue.
+
+        ``refund`` doesn't count the interrupted attempt; ``delay`` keeps the
+        job from being claimed again for that many seconds.
+        """
+        now = time.time()
+        with self._lock:
+            self._db().execute(
+                "UPDATE prediction_jobs SET status = ?, error = ?, attempts = attempts - ?, lease_until = ?,"
+                " updated_at = ? WHERE id = ?",
+                (QUEUED, error, 1 if refund else 0, now + delay if delay > 0 else None, now, job_id),
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db().execute(
+                "SELECT id, status, result, error, attempts, created_at, updated_at FROM prediction_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = {"id": row[0], "status": row[1], "attempts": row[4], "created_at": row[5], "updated_at": row[6]}
+        if row[1] == DONE:
+            job["result"] = json.loads(row[2])
+        elif row[1] == FAILED:
+            job["error"] = row[3]
+        job["expires_at"] = row[6] + self.ttl
+        return job
+
+    def cleanup(self) -> int:
+        """Delete jobs untouched for ``ttl`` seconds; returns how many went."""
+        with self._lock:
+            return self._db().execute(
+                "DELETE FROM prediction_jobs WHERE updated_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) FROM prediction_jobs GROUP BY status").fetchall()
+        return {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class PredictionJobRunner:
+    """
+    Worker tasks that claim jobs from the store and run ``process(upload, **params)``.
+
+    ``process`` is the predict route's pipeline. "Server busy" (the batcher's
+    queue is full) puts the job back for ``busy_delay`` seconds without using
+    an attempt, any other ``HTTPException`` (e.g. an undecodable image) fails
+    the job at once, and any other error is retried until the store's
+    ``max_attempts``.
+
+    Claims run on a thread that finishes even if its worker task is
+    cancelled, so every job this process holds is tracked until it ends;
+    ``stop`` puts back whatever is still held rather than leaving it RUNNING
+    until the lease runs out.
+    """
+
+    def __init__(self, store, process=None, workers=2, busy_delay=5.0, poll_interval=1.0, cleanup_interval=60.0):
+        self.store = store
+        self.process = process
+        self.workers = max(1, int(workers))
+        self.busy_delay = busy_delay
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._wake = None
+        self._tasks = []
+        self._claimed = set()
+        self._claims_lock = threading.Lock()
+        self._stopping = False
+
+        # Metrics
+        self._succeeded = 0
+        self._failed = 0
+        self._retried = 0
+        self._busy = 0
+        self._abandoned = 0
+        self._rejected = 0
+        self._expired = 0
+
+    @classmethod
+    def from_env(cls, process=None):
+        store = PredictionJobStore(
+            max_pending=int(os.getenv("PREDICT_JOB_MAX_PENDING", "500")),
+            max_pending_bytes=int(float(os.getenv("PREDICT_JOB_MAX_PENDING_MB", "512")) * 2**20),
+            max_attempts=int(os.getenv("PREDICT_JOB_MAX_ATTEMPTS", "3")),
+            lease=float(os.getenv("PREDICT_JOB_LEASE", "300")),
+            ttl=float(os.getenv("PREDICT_JOB_TTL", "86400")),
+        )
+        return cls(
+            store,
+            process,
+            workers=int(os.getenv("PREDICT_JOB_WORKERS", "2")),
+            busy_delay=float(os.getenv("PREDICT_JOB_BUSY_DELAY", "5")),
+        )
+
+    def start(self):
+        if not self._tasks or all(task.done() for task in self._tasks):
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._cleaner()))
+        return self
+
+    async def stop(self):
+        with self._claims_lock:
+            self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Claimed while a worker was being cancelled, so never run: back to the queue
+        with self._claims_lock:
+            orphans, self._claimed = self._claimed, set()
+        for job_id in orphans:
+            await asyncio.to_thread(self.store.requeue, job_id, None, True)
+        self.store.close()
+
+    async def submit(self, upload: bytes, params: dict, callback_url=None) -> str:
+        try:
+            job_id = await asyncio.to_thread(self.store.create, upload, params, callback_url)
+        except PredictionJobsFull:
+            self._rejected += 1
+            raise
+        self.start()
+        self._wake.set()
+        return job_id
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _claim(self):
+        """``store.claim`` that records the job before returning (runs on a thread)."""
+        job = self.store.claim()
+        if job is None:
+            return None
+        with self._claims_lock:
+            if not self._stopping:
+                self._claimed.add(job[0])
+                return job
+        # Claimed after stop() collected the orphans: hand it straight back
+        self.store.requeue(job[0], None, True)
+        return None
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self._claim)
+            if job is None:
+                # Idle: wait for a submit in this process, or poll for jobs queued by other workers
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if not await self._run(*job):
+                # The batcher is full; give it a moment before claiming more work
+                await asyncio.sleep(self.busy_delay * random.uniform(0.5, 1.0))
+
+    async def _run(self, job_id, upload, params, callback_url, attempts):
+        """Run one claimed job; returns False if it was put back because the server is busy."""
+        try:
+            return await self._attempt(job_id, upload, params, callback_url, attempts)
+        finally:
+            with self._claims_lock:
+                self._claimed.discard(job_id)
+
+    async def _attempt(self, job_id, upload, params, callback_url, attempts):
+        try:
+            result = await self.process(upload, **params)
+        except asyncio.CancelledError:
+            # Shutting down: put it back rather than waiting out the lease
+            await asyncio.to_thread(self.store.requeue, job_id, None, True)
+            raise
+        except HTTPException as e:
+            if isinstance(e.__cause__, BatchQueueFull):
+                self._busy += 1
+                delay = self.busy_delay * random.uniform(1.0, 2.0)
+                await asyncio.to_thread(self.store.requeue, job_id, str(e.detail), True, delay)
+                return False
+            await self._finish(job_id, callback_url, error=str(e.detail))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts < self.store.max_attempts:
+                self._retried += 1
+                await asyncio.to_thread(self.store.requeue, job_id, error)
+            else:
+                await self._finish(job_id, callback_url, error=error)
+        else:
+            await self._finish(job_id, callback_url, result=result)
+        return True
+
+    async def _finish(self, job_id, callback_url, result=None, error=None):
+        await asyncio.to_thread(self.store.finish, job_id, result, error)
+        if error:
+            self._failed += 1
+        else:
+            self._succeeded += 1
+        self._notify(job_id, callback_url, result, error)
+
+    def _notify(self, job_id, callback_url, result=None, error=None):
+        if callback_url:
+            payload = {"id": job_id, "status": FAILED if error else DONE}
+            payload["error" if error else "result"] = error or result
+            try:
+                job_queue.enqueue("prediction_callback", url=callback_url, payload=payload)
+            except Exception as e:
+                print(f"[prediction_jobs] callback for {job_id} not queued: {e}")
+
+    async def _cleaner(self):
+        while True:
+            try:
+                # Jobs whose worker keeps dying (out of attempts, lease expired) fail here
+                for job_id, callback_url, error in await asyncio.to_thread(self.store.fail_abandoned):
+                    self._abandoned += 1
+                    self._failed += 1
+                    self._notify(job_id, callback_url, error=error)
+                self._expired += await asyncio.to_thread(self.store.cleanup)
+            except sqlite3.Error as e:
+                print(f"[prediction_jobs] cleanup failed: {e}")
+            await asyncio.sleep(self.cleanup_interval)
+
+    async def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.store.max_pending,
+            "max_pending_bytes": self.store.max_pending_bytes,
+            **await asyncio.to_thread(self.store.counts),
+            "succeeded": self._succeeded,
+            "failed_total": self._failed,
+            "retried": self._retried,
+            "busy_retries": self._busy,
+            "abandoned": self._abandoned,
+            "rejected": self._rejected,
+            "expired": self._expired,
+        }
+
+
+class CallbackNotAllowed(ValueError):
+    """The callback URL is not http(s), or its host is not allowed or doesn't resolve to a public address."""
+
+
+async def _check_destination(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise CallbackNotAllowed("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if CALLBACK_HOSTS:
+        # An explicit allow-list is trusted as is, internal hosts included
+        if host not in CALLBACK_HOSTS:
+            raise CallbackNotAllowed("callback_url host is not allowed")
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, parts.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise CallbackNotAllowed("callback_url host does not resolve")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        # Unwrap IPv4-mapped IPv6 (::ffff:127.0.0.1) before judging it
+        address = getattr(address, "ipv4_mapped", None) or address
+        if not address.is_global or address.is_multicast:
+            raise CallbackNotAllowed("callback_url must resolve to a public address")
+
+
+async def check_callback_url(url):
+    """
+    Only http(s) URLs to hosts that resolve to public addresses (no loopback,
+    private, link-local or reserved ranges), or only PREDICT_CALLBACK_HOSTS when set.
+    """
+    try:
+        await _check_destination(url)
+    except CallbackNotAllowed as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return url
+
+
+_callback_client = None
+
+
+async def deliver_callback(url, payload):
+    """``prediction_callback`` job handler; a non-2xx answer raises so the job queue retries it."""
+    global _callback_client
+    if _callback_client is None:
+        _callback_client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=5.0))
+    # Checked again at delivery: DNS may have changed since the job was submitted
+    await _check_destination(url)
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if CALLBACK_SECRET:
+        signature = hmac.new(CALLBACK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Signature"] = f"sha256={signature}"
+    # Redirects are not followed, so an allowed host can't bounce the POST inward
+    response = await _callback_client.post(url, content=body, headers=headers)
+    response.raise_for_status()
+
+
+async def close_callback_client():
+    global _callback_client
+    if _callback_client is not None:
+        await _callback_client.aclose()
+        _callback_client = None
+
+
+def redact_callback(url, payload):
+    """Dead-letter record of a ``prediction_callback`` job: the job and target host, not the result."""
+    return {"id": payload.get("id"), "host": urlsplit(url).hostname}
+
+
+job_queue.register("prediction_callback", deliver_callback, redact=redact_callback)
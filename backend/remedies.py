@@ -0,0 +1,183 @@
+# backend/remedies.py
+"""Precomputed remedy knowledge base for the disease classes.
+
+The model can only predict a fixed set of ``class_names``, so remedies are
+stored per class and language in a local JSON file and read from there on
+the request path. The LLM is only consulted on a miss, and concurrent misses
+for the same class/language share a single call. Only the ``LANGUAGES`` the
+app offers are accepted (the routes answer 422 for others), so the file and
+the cache keys stay bounded.
+
+Several API workers may learn remedies at once: each write takes a lock file,
+merges what is already on disk and replaces the file atomically.
+
+Fill the store offline before deploying:
+
+    python -m backend.remedies --lang en hi
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from .inference.labels import class_names
+from .llm_client import get_client
+
+REMEDY_STORE_PATH = os.path.abspath(
+    os.getenv("REMEDY_STORE_PATH", os.path.join(os.path.dirname(__file__), "data", "remedies.json"))
+)
+FALLBACK_REMEDY = "AI assistant unavailable. Please try again later."
+# Language codes offered by the app (see the frontend's language selector)
+LANGUAGES = ("en", "hi", "bn", "te", "mr", "ta", "gu", "kn")
+LANG_PATTERN = f"^({'|'.join(LANGUAGES)})$"
+
+
+async def fetch_remedy(disease: str, lang: str = "en") -> str:
+    """Ask the LLM for a remedy. Raises ``LLMUnavailable`` on any upstream failure."""
+    prompt = f"A farmer's crop is diagnosed with {disease}. Suggest detailed, actionable remedies for this disease."
+    if lang != "en":
+        prompt += f" Answer in the language with code '{lang}'."
+    return await get_client().chat(
+        [
+            {"role": "system", "content": "You are an expert agricultural assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=100,
+        temperature=0.7
+    )
+
+
+class RemedyStore:
+    """
+    Per-class, per-language remedies backed by a JSON file.
+
+    The file maps ``lang -> class name -> remedy`` and is rewritten atomically
+    whenever a new remedy is learned, keeping entries other processes added.
+    """
+
+    def __init__(self, path=REMEDY_STORE_PATH, fetch=fetch_remedy):
+        self.path = path
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._remedies = self._load()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes read-merge-write across processes sharing the file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._remedies, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, disease: str, lang: str = "en"):
+        return self._remedies.get(lang, {}).get(disease)
+
+    def put(self, disease: str, lang: str, remedy: str):
+        with self._lock, self._file_lock():
+            merged = self._load()
+            for known_lang, entries in self._remedies.items():
+                merged.setdefault(known_lang, {}).update(entries)
+            merged.setdefault(lang, {})[disease] = remedy
+            # Swapped in whole, so lookups never see a half-merged dict
+            self._remedies = merged
+            self._save()
+
+    async def get(self, disease: str, lang: str = "en") -> str:
+        """Return the stored remedy, falling back to one deduplicated LLM call on a miss."""
+        if lang not in LANGUAGES:
+            raise ValueError(f"Unsupported language '{lang}', expected one of {LANGUAGES}")
+        remedy = self.lookup(disease, lang)
+        if remedy is not None:
+            self.hits += 1
+            return remedy
+
+        key = (disease, lang)
+        flight = self._flights.get(key)
+        if flight is None:
+            self.misses += 1
+            flight = self._flights[key] = asyncio.ensure_future(self._fetch_and_store(disease, lang))
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        # Shielded so a cancelled caller doesn't cancel the call others are waiting on.
+        return await asyncio.shield(flight)
+
+    async def _fetch_and_store(self, disease, lang):
+        try:
+            remedy = await self.fetch(disease, lang)
+        except Exception:
+            # Failures are not stored, so the next request retries.
+            return FALLBACK_REMEDY
+        await asyncio.to_thread(self.put, disease, lang, remedy)
+        return remedy
+
+    def missing(self, lang: str = "en"):
+        return [name for name in class_names if self.lookup(name, lang) is None]
+
+    def stats(self) -> dict:
+        return {
+            "languages": {lang: len(entries) for lang, entries in self._remedies.items()},
+            "classes": len(class_names),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+async def warm_up(store: RemedyStore, languages=("en",), overwrite=False, concurrency=4):
+    """Fill the store for every class and language, returning the number of remedies fetched."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fill(name, lang):
+        async with semaphore:
+            try:
+                remedy = await store.fetch(name, lang)
+            except Exception as e:
+                print(f"[{lang}] {name}: failed ({e})")
+                return 0
+        store.put(name, lang, remedy)
+        print(f"[{lang}] {name}")
+        return 1
+
+    jobs = [
+        fill(name, lang)
+        for lang in languages
+        for name in (class_names if overwrite else store.missing(lang))
+    ]
+    return sum(await asyncio.gather(*jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute remedies for every disease class")
+    parser.add_argument("--lang", nargs="+", default=["en"], choices=LANGUAGES, help="Language codes to fill")
+    parser.add_argument("--overwrite", action="store_true", help="Refetch remedies that are already stored")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--path", default=REMEDY_STORE_PATH)
+    args = parser.parse_args()
+
+    store = RemedyStore(args.path)
+    fetched = asyncio.run(warm_up(store, args.lang, args.overwrite, args.concurrency))
+    print(f"Fetched {fetched} remedies into {args.path}")
+
+
+if __name__ == "__main__":
+    main()
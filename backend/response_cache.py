@@ -0,0 +1,116 @@
+# backend/response_cache.py
+"""Pre-serialized responses for read-mostly routes.
+
+A route's JSON body is rendered to bytes once and served from memory until a
+write route invalidates it, so a hit skips the database, Pydantic and JSON
+encoding. Every response carries an ``ETag`` (hash of the body),
+``Last-Modified`` (when the entry was last invalidated) and ``Cache-Control``,
+and conditional requests that still match are answered with 304.
+
+Configuration (environment):
+    RESPONSE_CACHE_MAX_AGE   Cache-Control max-age in seconds for browsers/CDNs (default 60)
+    RESPONSE_CACHE_TTL       seconds an entry is kept in-process (default 300); bounds how
+                             long other workers serve a body this worker invalidated
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "60"))
+TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, body, last_modified, expires_at):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.last_modified = int(last_modified)
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    Keyed store of rendered JSON bodies with explicit invalidation.
+
+    A build that overlaps an ``invalidate`` of the same key is served but not
+    stored, so a write can't be hidden behind a body rendered before it.
+    """
+
+    def __init__(self, max_age=MAX_AGE, ttl=TTL):
+        self.max_age = max_age
+        self.ttl = ttl
+        self._entries = {}
+        self._generations = {}
+        self._modified = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def get(self, key, build):
+        """Return the cached entry for ``key``, rendering ``await build()`` on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self.hits += 1
+            return entry
+        self.misses += 1
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        body = json.dumps(jsonable_encoder(await build()), separators=(",", ":"), ensure_ascii=False).encode()
+        with self._lock:
+            entry = CachedResponse(body, self._modified.get(key, self._started), time.monotonic() + self.ttl)
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self, *keys):
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._modified[key] = now
+
+    def respond(self, request: Request, entry: CachedResponse) -> Response:
+        """The entry as a response, or an empty 304 if the client's copy is still current."""
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            "Cache-Control": f"public, max-age={self.max_age}",
+        }
+        if not_modified(request, entry):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+def not_modified(request: Request, entry: CachedResponse) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return entry.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -1,124 +1,132 @@
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import SessionLocal, models, schemas
-from ..auth_utils import hash_password, verify_password
-from datetime import datetime, timedelta
-import random, os
-from twilio.rest import Client
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db, models, schemas
+from ..auth_utils import HashQueueFull, hashing_pool
+from .. import otp_store, sms
+from ..jobs import JobQueueFull, job_queue
+import secrets, os
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 def generate_otp(length=6):
-    return str(random.randint(10**(length-1), (10**length)-1))
+    # secrets, not random: codes must not be predictable from earlier ones
+    return str(10**(length-1) + secrets.randbelow(9 * 10**(length-1)))
 
-def otp_expiry(minutes=5):
-    return datetime.utcnow() + timedelta(minutes=minutes)
+otp_codes = otp_store.from_env()
+job_queue.register("sms", sms.send_sms, redact=sms.redact_sms)
 
-def send_sms_via_twilio(phone_number, otp):
-    """
-    Send OTP to user via Twilio SMS API.
+async def find_user(db: AsyncSession, *criteria):
+    return (await db.execute(select(models.User).where(*criteria).limit(1))).scalars().first()
 
-    Raises:
-        Exception: If Twilio credentials are not set in environment variables.
-    """
-    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-    twilio_phone = os.getenv("TWILIO_PHONE_NUMBER")
-
-    if not account_sid or not auth_token or not twilio_phone:
-        raise Exception("Twilio credentials not set in environment variables")
-
-    client = Client(account_sid, auth_token)
-    client.messages.create(
-        body=f"Your OTP is {otp}",
-        from_=twilio_phone,
-        to=phone_number
-    )
-
-def get_db():
-    """
-    Dependency that provides a SQLAlchemy database session.
-    Yields a database session and ensures it is closed after use.
-    """
-    db = SessionLocal()
+async def hashing(job):
+    """Await a hashing-pool job, turning an overloaded pool into a 429."""
     try:
-        yield db
-    finally:
-        db.close()
+        return await job
+    except HashQueueFull:
+        raise HTTPException(status_code=429, detail="Too many requests, please retry", headers={"Retry-After": "1"})
 
 # Email signup
 @router.post("/signup/email", response_model=schemas.UserOut)
-def signup_email(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def signup_email(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     if not user.email:
         raise HTTPException(status_code=400, detail="Email is required for email signup")
-    existing = db.query(models.User).filter(models.User.email == user.email).first()
+    existing = await find_user(db, models.User.email == user.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_pw = hash_password(user.password)
+    # bcrypt is CPU-bound; it runs in the hashing pool, off the event loop and request threads
+    hashed_pw = await hashing(hashing_pool.hash(user.password))
     db_user = models.User(name=user.name, email=user.email, phone_number=user.phone_number, hashed_password=hashed_pw)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
 # Phone signup
 @router.post("/signup/phone", response_model=schemas.UserOut)
-def signup_phone(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def signup_phone(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     if not user.phone_number:
         raise HTTPException(status_code=400, detail="Phone number is required for phone signup")
-    existing = db.query(models.User).filter(models.User.phone_number == user.phone_number).first()
+    existing = await find_user(db, models.User.phone_number == user.phone_number)
     if existing:
         raise HTTPException(status_code=400, detail="Phone number already registered")
     # Set a random password for phone-only users to avoid issues with password-based login
     random_password = generate_otp(10)
-    hashed_pw = hash_password(random_password)
+    hashed_pw = await hashing(hashing_pool.hash(random_password))
     db_user = models.User(name=user.name, phone_number=user.phone_number, hashed_password=hashed_pw)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
-    raise HTTPException(status_code=401, detail="Invalid email or password")
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
+@router.get("/hashing/stats")
+def hashing_stats():
+    return hashing_pool.stats()
+
+# Email login
+@router.post("/login/email", response_model=schemas.UserOut)
+async def login_email(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    if not credentials.email or not credentials.password:
+        raise HTTPException(status_code=400, detail="Email and password are required")
+    user = await find_user(db, models.User.email == credentials.email)
+    if not user or not user.hashed_password:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    ok, new_hash = await hashing(hashing_pool.verify_and_update(credentials.password, user.hashed_password))
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was stored; upgrade it while we have the password
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
 # Phone login (send OTP)
 @router.post("/send-otp")
-def send_otp(request: schemas.UserOTPLogin, db: Session = Depends(get_db)):
+async def send_otp(request: schemas.UserOTPLogin, db: AsyncSession = Depends(get_async_db)):
     otp = generate_otp()
-    expiry = otp_expiry()
+    try:
+        # Rate-limited per phone before anything touches the users table
+        await otp_codes.issue(request.phone_number, otp)
+    except otp_store.OTPRateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-    user = db.query(models.User).filter(models.User.phone_number == request.phone_number).first()
+    user = await find_user(db, models.User.phone_number == request.phone_number)
     if not user:
         # Auto-register with phone number
         user = models.User(phone_number=request.phone_number)
         db.add(user)
-        db.commit()
-        db.refresh(user)
-
-    user.otp_code = otp
-    user.otp_expires_at = expiry
-    db.commit()
+        await db.commit()
+        await db.refresh(user)
 
     # Configurable default country code (can be set via environment variable or config file)
     DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "+91")
+    formatted_number = request.phone_number.strip()
+    # Basic validation: check if the number starts with '+' (international format)
+    if not formatted_number.startswith("+"):
+        if DEFAULT_COUNTRY_CODE:
+            formatted_number = DEFAULT_COUNTRY_CODE + formatted_number
+        else:
+            raise HTTPException(status_code=400, detail="Phone number must include country code or set DEFAULT_COUNTRY_CODE")
     try:
-        formatted_number = request.phone_number.strip()
-        # Basic validation: check if the number starts with '+' (international format)
-        if not formatted_number.startswith("+"):
-            if DEFAULT_COUNTRY_CODE:
-                formatted_number = DEFAULT_COUNTRY_CODE + formatted_number
-            else:
-                raise HTTPException(status_code=400, detail="Phone number must include country code or set DEFAULT_COUNTRY_CODE")
-        send_sms_via_twilio(formatted_number, otp)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send OTP: {str(e)}")
+        # Delivered by the background job queue (with retries); don't wait on Twilio here
+        job_queue.enqueue("sms", to=formatted_number, body=f"Your OTP is {otp}")
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Failed to send OTP: server busy, please retry")
 
     return {"message": "OTP sent successfully"}
 
 # OTP verification
 @router.post("/verify-otp", response_model=schemas.UserOut)
-def verify_otp(request: schemas.UserOTPVerify, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.phone_number == request.phone_number).first()
-    if not user or user.otp_code != request.otp_code:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-    if not user.otp_expires_at or datetime.utcnow() > user.otp_expires_at:
+async def verify_otp(request: schemas.UserOTPVerify, db: AsyncSession = Depends(get_async_db)):
+    outcome = await otp_codes.verify(request.phone_number, request.otp_code)
+    if outcome == otp_store.LOCKED:
+        raise HTTPException(status_code=429, detail="Too many attempts, request a new OTP")
+    if outcome == otp_store.EXPIRED:
         raise HTTPException(status_code=400, detail="OTP expired")
+    if outcome != otp_store.VALID:
+        raise HTTPException(status_code=400, detail="Invalid OTP")
+    user = await find_user(db, models.User.phone_number == request.phone_number)
+    if not user:
+        raise HTTPException(status_code=400, detail="Invalid OTP")
     return user
@@ -1,58 +1,304 @@
 """Community routes for the CropCareAI backend."""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import base64
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, update, delete, func, select, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from ..database import models, schemas
-from ..database import get_db
+from ..database import get_async_db
+from ..search import search_index
 from pydantic import BaseModel
 
 router = APIRouter()
 
-# Get all posts
-@router.get("/posts", response_model=list[schemas.CommunityPost])
-def get_posts(db: Session = Depends(get_db)):
-    posts = db.query(models.CommunityPost).all()
+FEED_PAGE_SIZE = int(os.getenv("COMMUNITY_PAGE_SIZE", "20"))
+FEED_MAX_PAGE_SIZE = int(os.getenv("COMMUNITY_MAX_PAGE_SIZE", "100"))
+THREAD_MAX_DEPTH = int(os.getenv("COMMUNITY_THREAD_MAX_DEPTH", "8"))
+
+
+def encode_cursor(post) -> str:
+    """Opaque cursor pointing just after ``post`` in feed order."""
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, post_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def feed_statement(cursor: Optional[str] = None, limit: int = FEED_PAGE_SIZE):
+    """
+    Non-deleted posts, newest first, starting after ``cursor``; one extra row tells if there's a next page.
+
+    Keyset pagination on (created_at, id) walks ix_posts_feed, so every page
+    costs the same regardless of how deep into the feed it is.
+    """
+    stmt = select(models.Post).where(models.Post.is_deleted.is_(False))
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            models.Post.created_at < created_at,
+            and_(models.Post.created_at == created_at, models.Post.id < post_id),
+        ))
+    return stmt.order_by(models.Post.created_at.desc(), models.Post.id.desc()).limit(limit + 1)
+
+
+def split_page(posts, limit):
+    next_cursor = encode_cursor(posts[limit - 1]) if len(posts) > limit else None
+    return posts[:limit], next_cursor
+
+
+async def feed_page(db: AsyncSession, cursor: Optional[str] = None, limit: int = FEED_PAGE_SIZE):
+    """One page of the feed and the cursor of the next page."""
+    posts = (await db.execute(feed_statement(cursor, limit))).scalars().all()
+    return split_page(posts, limit)
+
+
+# Get one page of the feed; the next page's cursor is returned in the X-Next-Cursor header
+@router.get("/posts", response_model=list[schemas.PostOut])
+async def get_posts(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    posts, next_cursor = await feed_page(db, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return posts
 
+async def require_user(db: AsyncSession, user_id: int):
+    """404 unless ``user_id`` exists (rather than a foreign-key IntegrityError, i.e. a 500, on insert)."""
+    if await db.scalar(select(models.User.id).where(models.User.id == user_id)) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+async def commit_or_404(db: AsyncSession, detail: str):
+    """Commit; a foreign-key failure (a row deleted since it was checked) becomes a 404."""
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=detail)
+
+
 # Create a new post
-@router.post("/posts", response_model=schemas.CommunityPost)
-def create_post(post: schemas.CommunityPostCreate, db: Session = Depends(get_db)):
-    db_post = models.CommunityPost(
-        title=post.title,
-        content=post.content,
-        author=post.author,
-        likes=0
+@router.post("/posts", response_model=schemas.PostOut)
+async def create_post(post: schemas.PostCreate, db: AsyncSession = Depends(get_async_db)):
+    await require_user(db, post.user_id)
+    db_post = models.Post(
+        user_id=post.user_id,
+        content=post.content
     )
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+    # Indexed in the same transaction, so a post is searchable as soon as it's visible
+    await search_index.add(db, "post", db_post.id, "", db_post.content)
+    await commit_or_404(db, "User not found")
+    await db.refresh(db_post)
     return db_post
 
+async def bump_counter(db: AsyncSession, post_id: int, column, delta: int = 1) -> bool:
+    """Atomically add ``delta`` to a post counter in SQL; returns False if the post doesn't exist."""
+    result = await db.execute(
+        update(models.Post)
+        .where(models.Post.id == post_id, models.Post.is_deleted.is_(False))
+        .values({column: column + delta})
+    )
+    return result.rowcount > 0
+
 # Add a comment to a post
 @router.post("/posts/{post_id}/comments", response_model=schemas.Comment)
-def create_comment(post_id: int, comment: schemas.CommentCreate, db: Session = Depends(get_db)):
-    db_post = db.query(models.CommunityPost).filter(models.CommunityPost.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
+async def create_comment(post_id: int, comment: schemas.CommentCreate, db: AsyncSession = Depends(get_async_db)):
+    await require_user(db, comment.user_id)
+    if comment.parent_id is not None:
+        # A reply must stay in its parent's thread
+        parent_post = await db.scalar(select(models.Comment.post_id).where(models.Comment.id == comment.parent_id))
+        if parent_post is None:
+            raise HTTPException(status_code=404, detail="Parent comment not found")
+        if parent_post != post_id:
+            raise HTTPException(status_code=400, detail="Parent comment belongs to another post")
     db_comment = models.Comment(
         content=comment.content,
-        post_id=post_id
+        post_id=post_id,
+        user_id=comment.user_id,
+        parent_id=comment.parent_id
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    if not await bump_counter(db, post_id, models.Post.comment_count):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
+    await commit_or_404(db, "User, post or parent comment not found")
+    await db.refresh(db_comment)
     return db_comment
 
+async def comment_thread(db: AsyncSession, post_id: int, after: Optional[int] = None, limit: int = FEED_PAGE_SIZE, max_depth: int = THREAD_MAX_DEPTH):
+    """
+    A page of top-level comments with their replies, as a list of nested dicts.
+
+    Always two queries: a recursive CTE collects the page's comment ids down
+    to ``max_depth + 1`` levels and loads the rows, then ``selectinload``
+    fetches all authors at once. The tree is assembled in one pass.
+    """
+    roots = (
+        select(models.Comment.id)
+        .where(models.Comment.post_id == post_id, models.Comment.parent_id.is_(None))
+        .where(models.Comment.id > (after or 0))
+        .order_by(models.Comment.id)
+        .limit(limit)
+        .subquery()
+    )
+    tree = (
+        select(models.Comment.id, literal(0).label("depth"))
+        .where(models.Comment.id.in_(select(roots.c.id)))
+        .cte("thread", recursive=True)
+    )
+    tree = tree.union_all(
+        select(models.Comment.id, tree.c.depth + 1)
+        .where(models.Comment.parent_id == tree.c.id, tree.c.depth <= max_depth)
+    )
+    rows = (await db.execute(
+        select(models.Comment, tree.c.depth)
+        .join(tree, models.Comment.id == tree.c.id)
+        .options(selectinload(models.Comment.author))
+        .order_by(tree.c.depth, models.Comment.created_at, models.Comment.id)
+    )).all()
+
+    nodes, top_level = {}, []
+    for comment, depth in rows:
+        if depth > max_depth:
+            # Only fetched to know that a reply exists below the cut-off.
+            nodes[comment.parent_id]["has_more_replies"] = True
+            continue
+        author = comment.author
+        node = nodes[comment.id] = {
+            "id": comment.id,
+            "post_id": comment.post_id,
+            "user_id": comment.user_id,
+            "parent_id": comment.parent_id,
+            "content": "" if comment.is_deleted else comment.content,
+            "is_deleted": comment.is_deleted,
+            "created_at": comment.created_at,
+            "author": {"id": author.id, "username": author.username, "name": author.name} if author else None,
+            "replies": [],
+            "has_more_replies": False,
+        }
+        if depth == 0:
+            top_level.append(node)
+        else:
+            nodes[comment.parent_id]["replies"].append(node)
+
+    top_level.sort(key=lambda node: node["id"])
+    next_cursor = top_level[-1]["id"] if len(top_level) == limit else None
+    return top_level, next_cursor
+
+# Read a post's comment thread; the next page's cursor is returned in the X-Next-Cursor header
+@router.get("/posts/{post_id}/comments", response_model=list[schemas.CommentNode])
+async def get_comments(
+    post_id: int,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+    depth: int = Query(THREAD_MAX_DEPTH, ge=0, le=THREAD_MAX_DEPTH),
+    db: AsyncSession = Depends(get_async_db),
+):
+    comments, next_cursor = await comment_thread(db, post_id, cursor, limit, depth)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return comments
+
 # Like a post
 class LikeResponse(BaseModel):
     message: str
+    liked: bool = True
+
+LIKE_KEY = ("user_id", "target_type", "target_id")  # columns of _user_target_uc
+
+
+async def insert_like(db: AsyncSession, user_id: int, target_type: str, target_id: int) -> bool:
+    """
+    Add a Like unless ``_user_target_uc`` already has it; returns False for a repeat.
+
+    An unknown user_id is a 404. Only that constraint is ignored (ON CONFLICT DO
+    NOTHING on its columns), so other integrity errors, e.g. a user deleted
+    meanwhile, still raise IntegrityError.
+    """
+    await require_user(db, user_id)
+    values = {"user_id": user_id, "target_type": target_type, "target_id": target_id}
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(models.Like).values(values).on_conflict_do_nothing(index_elements=LIKE_KEY)
+        return (await db.execute(statement)).rowcount > 0
+    # Other databases: insert in a savepoint; on a conflict, an existing row means a (racing) repeat
+    try:
+        async with db.begin_nested():
+            db.add(models.Like(**values))
+    except IntegrityError:
+        if await db.scalar(select(models.Like.id).filter_by(**values)) is not None:
+            return False
+        raise
+    return True
+
 
 @router.post("/posts/{post_id}/like", response_model=LikeResponse)
-def like_post(post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(models.CommunityPost).filter(models.CommunityPost.id == post_id).first()
-    if not db_post:
+async def like_post(post_id: int, like: schemas.LikeCreate, db: AsyncSession = Depends(get_async_db)):
+    # The Like row is the source of truth; _user_target_uc makes repeat likes no-ops
+    try:
+        inserted = await insert_like(db, like.user_id, "post", post_id)
+    except IntegrityError:
+        # Not a duplicate (those are ignored above): the user was deleted after require_user
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+    if not inserted:
+        await db.rollback()
+        return LikeResponse(message=f"Post {post_id} already liked")
+    if not await bump_counter(db, post_id, models.Post.like_count):
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    db_post.likes += 1
-    db.commit()
+    await db.commit()
     return LikeResponse(message=f"Post {post_id} liked successfully!")
+
+@router.delete("/posts/{post_id}/like", response_model=LikeResponse)
+async def unlike_post(post_id: int, user_id: int, db: AsyncSession = Depends(get_async_db)):
+    removed = (await db.execute(
+        delete(models.Like).where(
+            models.Like.user_id == user_id,
+            models.Like.target_type == "post",
+            models.Like.target_id == post_id,
+        )
+    )).rowcount
+    if removed:
+        await bump_counter(db, post_id, models.Post.like_count, -1)
+    await db.commit()
+    return LikeResponse(message=f"Post {post_id} unliked", liked=False)
+
+
+async def reconcile_counters(db: AsyncSession):
+    """Recompute every post's counters from the Like and Comment tables (repairs drift or backfills)."""
+    likes = (
+        select(func.count(models.Like.id))
+        .where(models.Like.target_type == "post", models.Like.target_id == models.Post.id)
+        .scalar_subquery()
+    )
+    comments = (
+        select(func.count(models.Comment.id))
+        .where(models.Comment.post_id == models.Post.id)
+        .scalar_subquery()
+    )
+    await db.execute(update(models.Post).values(like_count=likes, comment_count=comments))
+    await db.commit()
@@ -1,45 +1,77 @@
 # backend/routes/explore.py
 
+import json
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import os
-import openai
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-# openai.api_key will be set inside the route handler
+from ..llm_client import get_client, LLMUnavailable
+from ..chat_cache import ChatCache
 
 router = APIRouter()
 
+UNAVAILABLE_REPLY = "AI assistant is currently unavailable. Please try again later."
+
+# Answers to repeated questions are served without calling the LLM
+chat_cache = ChatCache.from_env()
+
+
 class ChatRequest(BaseModel):
     query: str
+    lang: str = "en"
+
+
+def chat_messages(req: ChatRequest):
+    query = req.query
+    if req.lang != "en":
+        query += f"\n\nAnswer in the language with code '{req.lang}'."
+    return [
+        {"role": "system", "content": "You are a helpful and knowledgeable agricultural assistant."},
+        {"role": "user", "content": query}
+    ]
+
 
 @router.post("/chat")
-def chat_ai(req: ChatRequest):
+async def chat_ai(req: ChatRequest):
+    reply = chat_cache.get(req.query, req.lang)
+    if reply is not None:
+        return {"reply": reply}
     try:
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful and knowledgeable agricultural assistant."},
-                {"role": "user", "content": req.query}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        # Validate response structure
-        reply = "AI assistant is currently unavailable. Please try again later."
-        if (
-            isinstance(response, dict) and
-            "choices" in response and
-            isinstance(response["choices"], list) and
-            len(response["choices"]) > 0 and
-            "message" in response["choices"][0] and
-            "content" in response["choices"][0]["message"]
-        ):
-            reply = response["choices"][0]["message"]["content"].strip()
-    except Exception as e:
-        return {"reply": "AI assistant is currently unavailable. Please try again later."}
-    except openai.error.OpenAIError:
-        return {"reply": "AI assistant is currently unavailable. Please try again later."}
+        reply = await get_client().chat(chat_messages(req), max_tokens=200, temperature=0.7)
+    except LLMUnavailable:
+        return {"reply": UNAVAILABLE_REPLY}
+    chat_cache.set(req.query, reply, req.lang)
+    return {"reply": reply}
+
+
+# Server-sent events: each token is sent as soon as the upstream produces it
+@router.post("/chat/stream")
+async def chat_ai_stream(req: ChatRequest):
+    async def events():
+        cached = chat_cache.get(req.query, req.lang)
+        if cached is not None:
+            yield f"data: {json.dumps({'token': cached})}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+        tokens = []
+        try:
+            async for token in get_client().stream_chat(chat_messages(req), max_tokens=200, temperature=0.7):
+                tokens.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except LLMUnavailable:
+            yield f"event: error\ndata: {json.dumps({'reply': UNAVAILABLE_REPLY})}\n\n"
+        else:
+            chat_cache.set(req.query, "".join(tokens).strip(), req.lang)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Chat cache size and hit-rate metrics
+@router.get("/chat/cache/stats")
+def chat_cache_stats():
+    return chat_cache.stats()
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import models, schemas
-from ..database import get_db
+from ..database import get_async_db
+from .. import sms
+from ..jobs import JobQueueFull, job_queue, mask
+from ..response_cache import ResponseCache
+from ..search import search_index
 from typing import List  # import List for response_model if Python < 3.9
 
 router = APIRouter(
@@ -9,40 +15,78 @@ router = APIRouter(
     tags=["Help & Support"]
 )
 
+# Phone that gets an SMS for every new support message; unset disables the notification
+SUPPORT_NOTIFY_PHONE = os.getenv("SUPPORT_NOTIFY_PHONE")
+
+
+async def notify_support(name, email, message):
+    """``support_notification`` job handler."""
+    await sms.send_sms(SUPPORT_NOTIFY_PHONE, f"New support message from {name} <{email}>: {message[:280]}")
+
+def redact_support_notification(name, email, message):
+    return {"email": mask(email, keep=6), "message_length": len(message)}
+
+job_queue.register("support_notification", notify_support, redact=redact_support_notification)
+
+QUICK_HELP = [
+    {"title": "Call Support", "description": "+91 1800 123 4567", "action": "tel:+9118001234567"},
+    {"title": "Email Support", "description": "support@cropcare-ai.com", "action": "mailto:support@cropcare-ai.com"},
+    {"title": "Live Chat", "description": "Chat with our experts", "action": "#"},
+    {"title": "Video Tutorials", "description": "Watch how-to videos", "action": "#"},
+    {"title": "Documentation", "description": "Read detailed guides", "action": "#"},
+    {"title": "User Guide", "description": "Download user manual", "action": "#"}
+]
+
+# Rendered FAQ / quick-help bodies; create_faq invalidates "faqs"
+responses = ResponseCache()
+
+
 # Static Quick Help Options
 @router.get("/quick-help")
-def get_quick_help():
-    return [
-        {"title": "Call Support", "description": "+91 1800 123 4567", "action": "tel:+9118001234567"},
-        {"title": "Email Support", "description": "support@cropcare-ai.com", "action": "mailto:support@cropcare-ai.com"},
-        {"title": "Live Chat", "description": "Chat with our experts", "action": "#"},
-        {"title": "Video Tutorials", "description": "Watch how-to videos", "action": "#"},
-        {"title": "Documentation", "description": "Read detailed guides", "action": "#"},
-        {"title": "User Guide", "description": "Download user manual", "action": "#"}
-    ]
+async def get_quick_help(request: Request):
+    async def build():
+        return QUICK_HELP
+    return responses.respond(request, await responses.get("quick-help", build))
 
 
 # Get FAQs
 @router.get("/faqs", response_model=List[schemas.FAQOut])
-def get_faqs(db: Session = Depends(get_db)):
-    return db.query(models.FAQ).order_by(models.FAQ.id).all()
+async def get_faqs(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        faqs = (await db.execute(select(models.FAQ).order_by(models.FAQ.id))).scalars().all()
+        return [{"id": faq.id, "question": faq.question, "answer": faq.answer} for faq in faqs]
+    return responses.respond(request, await responses.get("faqs", build))
 
 
 # Create FAQ (admin use)
 @router.post("/faqs", response_model=schemas.FAQOut)
-def create_faq(faq: schemas.FAQCreate, db: Session = Depends(get_db)):
+async def create_faq(faq: schemas.FAQCreate, db: AsyncSession = Depends(get_async_db)):
     new_faq = models.FAQ(**faq.dict())
     db.add(new_faq)
-    db.commit()
-    db.refresh(new_faq)
+    await db.flush()
+    await search_index.add(db, "faq", new_faq.id, new_faq.question, new_faq.answer)
+    await db.commit()
+    await db.refresh(new_faq)
+    responses.invalidate("faqs")
     return new_faq
 
 
+@router.get("/cache/stats")
+def cache_stats():
+    return responses.stats()
+
+
 # Contact Support (save message)
 @router.post("/contact", response_model=schemas.SupportMessageOut)
-def contact_support(message: schemas.SupportMessageCreate, db: Session = Depends(get_db)):
+async def contact_support(message: schemas.SupportMessageCreate, db: AsyncSession = Depends(get_async_db)):
     new_message = models.SupportMessage(**message.dict())
     db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
+    await db.commit()
+    await db.refresh(new_message)
+    if SUPPORT_NOTIFY_PHONE:
+        try:
+            job_queue.enqueue("support_notification", name=message.name, email=message.email, message=message.message)
+        except JobQueueFull:
+            # The message is saved; only the heads-up is lost
+            pass
     return new_message
@@ -1,122 +1,359 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from PIL import Image
-import numpy as np
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
 import io
-import tensorflow as tf
+import json
+import zipfile
+import numpy as np
 import os
-import openai
 from dotenv import load_dotenv
+from ..inference.batching import BatchQueueFull
+from ..inference.engine import InferenceEngine, ModelNotReady
+from ..inference.preprocessing import preprocess, preprocess_into, new_batch
+from ..inference.cascade import Cascade
+from ..inference.labels import CROP_CLASSES, CROPS, class_names, crop_key
+from ..inference.tta import MAX_VIEWS, augment, top_classes
+from ..inference.result_cache import PredictionCache, content_key
+from ..remedies import FALLBACK_REMEDY, LANG_PATTERN, RemedyStore
+from ..metrics import stage
+from ..uploads import BATCH_UPLOAD_MAX_BYTES, check_image, read_archive, read_image
+from ..prediction_jobs import PredictionJobRunner, PredictionJobsFull, check_callback_url
 
 #load env file
 load_dotenv()
 
-# TensorFlow imports
-load_model = tf.keras.models.load_model
-image = tf.keras.preprocessing.image
-preprocess_input = tf.keras.applications.mobilenet_v2.preprocess_input
-
 router = APIRouter()
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "model", "mobilenetv2_cropcare.keras")
 MODEL_PATH = os.path.abspath(MODEL_PATH)
 
 
-# Load the model once at startup
-try:
-    model = load_model(MODEL_PATH)
-except Exception as e:
-    raise RuntimeError(f"Failed to load model from {MODEL_PATH}: {e}")
-
-class_names = [
-    'Apple___Apple_scab',
-    'Apple___Black_rot',
-    'Apple___Cedar_apple_rust',
-    'Apple___healthy',
-    'Blueberry___healthy',
-    'Cherry_(including_sour)___Powdery_mildew',
-    'Cherry_(including_sour)___healthy',
-    'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot',
-    'Corn_(maize)___Common_rust_',
-    'Corn_(maize)___Northern_Leaf_Blight',
-    'Corn_(maize)___healthy',
-    'Grape___Black_rot',
-    'Grape___Esca_(Black_Measles)',
-    'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
-    'Grape___healthy',
-    'Orange___Haunglongbing_(Citrus_greening)',
-    'Peach___Bacterial_spot',
-    'Peach___healthy',
-    'Pepper,_bell___Bacterial_spot',
-    'Pepper,_bell___healthy',
-    'Potato___Early_blight',
-    'Potato___Late_blight',
-    'Potato___healthy',
-    'Raspberry___healthy',
-    'Soybean___healthy',
-    'Squash___Powdery_mildew',
-    'Strawberry___Leaf_scorch',
-    'Strawberry___healthy',
-    'Tomato___Bacterial_spot',
-    'Tomato___Early_blight',
-    'Tomato___Late_blight',
-    'Tomato___Leaf_Mold',
-    'Tomato___Septoria_leaf_spot',
-    'Tomato___Spider_mites Two-spotted_spider_mite',
-    'Tomato___Target_Spot',
-    'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
-    'Tomato___Tomato_mosaic_virus',
-    'Tomato___healthy'
-]
+# The model is loaded on first use or by the warm-up task started in main.lifespan
+engine = InferenceEngine(MODEL_PATH)
+
+# Crop-routed inference: known or confidently detected crops skip to a per-crop head or restricted softmax
+cascade = Cascade.from_env(engine)
+
+# Repeat uploads are answered from the result cache (None when disabled)
+result_cache = PredictionCache.from_env()
+
+# Remedies are served from the local store; the LLM is only asked on a miss
+remedy_store = RemedyStore()
+
+# Zip members are picked by extension; uploads themselves are checked by their content (see uploads.py)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Batch uploads: decode pool size, inference chunk size and file limits
+decode_pool = ThreadPoolExecutor(max_workers=int(os.getenv("DECODE_WORKERS", str(os.cpu_count() or 4))), thread_name_prefix="decode")
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "32"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("ZIP_MAX_MEMBER_BYTES", str(20 * 1024 * 1024)))
+
+# Opt-in top-k and test-time augmentation limits for /predict
+TOP_K_MAX = int(os.getenv("TOP_K_MAX", "5"))
+TTA_MAX_VIEWS = min(int(os.getenv("TTA_MAX_VIEWS", str(MAX_VIEWS))), MAX_VIEWS)
 
 
 @router.post("/predict")
-def predict(file: UploadFile = File(...)):
-    if not file.filename.endswith((".jpg", ".jpeg", ".png")):
-        raise HTTPException(status_code=400, detail="Invalid image format")
-
-    contents = file.file.read()
-    img = Image.open(io.BytesIO(contents)).convert("RGB")
-    img = img.resize((224, 224))
-    img_array = image.img_to_array(img)
-    img_array = np.expand_dims(img_array, axis=0)
-    img_array = preprocess_input(img_array)
-
-    predictions = model.predict(img_array)
-    class_index = np.argmax(predictions[0])
-    confidence = round(float(np.max(predictions[0])) * 100, 2)
+async def predict(
+    file: UploadFile = File(...),
+    lang: str = Query("en", pattern=LANG_PATTERN),
+    # More than one class, and/or several augmented views averaged, for low-confidence leaves
+    top_k: int = Query(1, ge=1, le=TOP_K_MAX),
+    tta: int = Query(1, ge=1, le=TTA_MAX_VIEWS, description="Augmented views in the forward pass (1 = single pass)"),
+    crop: Optional[str] = Query(None, description="Known crop, e.g. Tomato; only its conditions are considered"),
+):
+    crop = _crop_param(crop)
+    with stage("predict.read"):
+        # Size-capped chunked read; non-images and decompression bombs are rejected from the header
+        contents = await read_image(file)
+    return await run_prediction(contents, lang, top_k, tta, crop)
+
+
+def _crop_param(crop):
+    if crop is None:
+        return None
+    key = crop_key(crop)
+    if key not in CROP_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown crop; expected one of: {', '.join(CROPS)}")
+    return key
+
+
+def cache_variant(lang="en", top_k=1, tta=1, crop=None, full_model=False):
+    """Cache-key suffix naming everything besides the image that changes a result."""
+    variant = lang if top_k == 1 and tta == 1 else f"{lang}:k{top_k}:tta{tta}"
+    if crop:
+        variant += f":crop={crop}"
+    if full_model and cascade.enabled:
+        # /batch always runs the full model, so once the cascade routes, its results differ from /predict's
+        variant += ":full"
+    return variant
+
+
+async def run_prediction(contents: bytes, lang="en", top_k=1, tta=1, crop=None):
+    """Decode, infer and look up the remedy for one uploaded image (shared by /predict and prediction jobs)."""
+    variant = cache_variant(lang, top_k, tta, crop)
+    cache_key = f"{content_key(contents)}:{variant}"
+    if result_cache:
+        cached = result_cache.lookup_bytes(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        with stage("predict.preprocess"):
+            img_array = await run_in_threadpool(preprocess, contents)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+    if result_cache and result_cache.perceptual:
+        cached = result_cache.lookup_tensor(img_array, cache_key, variant=variant)
+        if cached is not None:
+            return cached
+
+    inputs = img_array
+    if tta > 1:
+        with stage("predict.augment"):
+            inputs = await run_in_threadpool(augment, img_array[0], tta)
+
+    try:
+        with stage("predict.inference"):
+            # All views go through the batcher together, so TTA is still one forward pass
+            predictions, route = await cascade.predict(inputs, crop)
+    except BatchQueueFull as e:
+        # Chained so prediction jobs can tell "busy" (retry later) from other 503s
+        raise HTTPException(status_code=503, detail="Server busy, please retry") from e
+    except ModelNotReady:
+        raise HTTPException(status_code=503, detail="Model is not available")
+    probabilities = predictions.mean(axis=0) if len(predictions) > 1 else predictions[0]
+    class_index = int(np.argmax(probabilities))
+    confidence = round(float(probabilities[class_index]) * 100, 2)
     predicted_class = class_names[class_index]
 
-    remedy = get_ai_prescription(predicted_class)
+    with stage("predict.remedy"):
+        remedy = await get_ai_prescription(predicted_class, lang)
 
-    return {
+    result = {
         "prediction": predicted_class,
         "confidence": confidence,
         "remedy": remedy
     }
-# Function to get AI-generated remedy
-def get_ai_prescription(disease: str) -> str:
-    prompt = f"A farmer's crop is diagnosed with {disease}. Suggest detailed, actionable remedies for this disease."
+    if top_k > 1:
+        result["top_k"] = [
+            {"prediction": class_names[i], "confidence": round(float(probabilities[i]) * 100, 2)}
+            for i in top_classes(probabilities, top_k)
+        ]
+    if len(predictions) > 1:
+        # Share of views whose own top class matches the averaged one
+        agreement = float(np.mean(np.argmax(predictions, axis=1) == class_index))
+        result["tta"] = {"views": len(predictions), "agreement": round(agreement, 3)}
+    if crop or cascade.enabled:
+        result["cascade"] = route
+    # A fallback remedy means the LLM was down; don't pin it to this image for the cache TTL
+    if result_cache and remedy != FALLBACK_REMEDY:
+        result_cache.store(result, cache_key, img_array, variant=variant)
+    return result
 
+
+# Jobs queued by POST /jobs run the same pipeline on background workers (started in main.lifespan)
+prediction_jobs = PredictionJobRunner.from_env(run_prediction)
+
+
+# Async prediction: store the upload and return at once; poll GET /jobs/{id} or receive callback_url
+@router.post("/jobs", status_code=202)
+async def create_prediction_job(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    lang: str = Query("en", pattern=LANG_PATTERN),
+    top_k: int = Query(1, ge=1, le=TOP_K_MAX),
+    tta: int = Query(1, ge=1, le=TTA_MAX_VIEWS),
+    crop: Optional[str] = None,
+    callback_url: Optional[str] = Query(None, description="Receives the finished job as a JSON POST"),
+):
+    crop = _crop_param(crop)
+    if callback_url:
+        await check_callback_url(callback_url)
+    contents = await read_image(file)
+    params = {"lang": lang, "top_k": top_k, "tta": tta, "crop": crop}
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert agricultural assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=100,
-            temperature=0.7
-        )
-        return response['choices'][0]['message']['content'].strip()
-    except Exception as e:
-        return "AI assistant unavailable. Please try again later."
-
-
-
-# Health check route
+        job_id = await prediction_jobs.submit(contents, params, callback_url)
+    except PredictionJobsFull:
+        raise HTTPException(status_code=503, detail="Too many pending prediction jobs, please retry", headers={"Retry-After": "30"})
+    status_url = str(request.url_for("get_prediction_job", job_id=job_id))
+    response.headers["Location"] = status_url
+    return {"id": job_id, "status": "queued", "status_url": status_url}
+
+
+# Queue depth, outcomes and rejections of prediction jobs
+@router.get("/jobs/stats")
+async def prediction_job_stats():
+    return await prediction_jobs.stats()
+
+
+@router.get("/jobs/{job_id}")
+async def get_prediction_job(job_id: str):
+    job = await prediction_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+def _expand_archive(filename: str, contents: bytes):
+    """Yield ``(name, bytes)`` for every image inside a zip archive."""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(contents))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"{filename} is not a valid zip archive")
+    with archive:
+        members = [info for info in archive.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)]
+        # Declared sizes are checked before anything is inflated, so a zip bomb never expands
+        if sum(info.file_size for info in members) > BATCH_UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"{filename} expands to more than {BATCH_UPLOAD_MAX_BYTES} bytes")
+        for info in members:
+            if info.file_size > ZIP_MAX_MEMBER_BYTES:
+                raise HTTPException(status_code=413, detail=f"{info.filename} in {filename} is too large")
+            contents = archive.read(info)
+            try:
+                check_image(contents)
+            except HTTPException as e:
+                raise HTTPException(status_code=e.status_code, detail=f"{info.filename} in {filename}: {e.detail}")
+            yield f"{filename}/{info.filename}", contents
+
+
+def _decode_into(contents: bytes, out: np.ndarray):
+    try:
+        preprocess_into(contents, out)
+        return None
+    except Exception:
+        return "Could not decode image"
+
+
+async def _decode_chunk(items):
+    """Decode a chunk in parallel into one preallocated batch; returns the batch and per-item errors."""
+    batch = new_batch(len(items))
+    loop = asyncio.get_running_loop()
+    errors = await asyncio.gather(*(
+        loop.run_in_executor(decode_pool, _decode_into, contents, batch[i])
+        for i, (_, contents, _) in enumerate(items)
+    ))
+    return batch, errors
+
+
+# Batch prediction for field surveys: many files or a zip archive, streamed back as NDJSON
+@router.post("/batch")
+async def predict_batch(files: List[UploadFile] = File(...), lang: str = Query("en", pattern=LANG_PATTERN)):
+    uploads = []
+    for upload in files:
+        if upload.filename.lower().endswith(".zip"):
+            uploads.extend(_expand_archive(upload.filename, await read_archive(upload)))
+        else:
+            uploads.append((upload.filename, await read_image(upload)))
+        if len(uploads) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FILES} images per batch")
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No images found in upload")
+
+    variant = cache_variant(lang, full_model=True)
+
+    async def results():
+        # Cached images are answered straight away; the rest go through decode + inference
+        pending = []
+        for index, (name, contents) in enumerate(uploads):
+            cache_key = f"{content_key(contents)}:{variant}"
+            cached = result_cache.lookup_bytes(cache_key) if result_cache else None
+            if cached is not None:
+                yield json.dumps({"index": index, "filename": name, **cached}) + "\n"
+            else:
+                pending.append((index, contents, cache_key))
+
+        # One remedy lookup per predicted class across the whole batch
+        remedies = {}
+        chunks = [pending[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(pending), BATCH_CHUNK_SIZE)]
+        next_chunk = asyncio.ensure_future(_decode_chunk(chunks[0])) if chunks else None
+        for k, chunk in enumerate(chunks):
+            batch, errors = await next_chunk
+            # Decode the next chunk while this one is being inferred
+            if k + 1 < len(chunks):
+                next_chunk = asyncio.ensure_future(_decode_chunk(chunks[k + 1]))
+
+            decoded = [i for i, error in enumerate(errors) if error is None]
+            # Near-duplicates of cached images (same scheme as /predict) skip inference
+            similar = {}
+            if result_cache and result_cache.perceptual:
+                for i in decoded:
+                    hit = result_cache.lookup_tensor(batch[i:i + 1], chunk[i][2], variant=variant)
+                    if hit is not None:
+                        similar[i] = hit
+                decoded = [i for i in decoded if i not in similar]
+            predictions = None
+            if decoded:
+                try:
+                    predictions = await engine.predict(batch[decoded])
+                except BatchQueueFull:
+                    errors = ["Server busy, please retry" if e is None else e for e in errors]
+                except ModelNotReady:
+                    errors = ["Model is not available" if e is None else e for e in errors]
+
+            classes = {}
+            if predictions is not None:
+                for row, i in enumerate(decoded):
+                    class_index = int(np.argmax(predictions[row]))
+                    classes[i] = (class_names[class_index], round(float(predictions[row][class_index]) * 100, 2))
+                for name in set(c for c, _ in classes.values()) - remedies.keys():
+                    remedies[name] = asyncio.ensure_future(get_ai_prescription(name, lang))
+                await asyncio.gather(*(remedies[c] for c, _ in classes.values()))
+
+            for i, (index, _, cache_key) in enumerate(chunk):
+                line = {"index": index, "filename": uploads[index][0]}
+                if i in similar:
+                    line.update(similar[i])
+                elif i in classes:
+                    predicted_class, confidence = classes[i]
+                    result = {"prediction": predicted_class, "confidence": confidence, "remedy": remedies[predicted_class].result()}
+                    if result_cache and result["remedy"] != FALLBACK_REMEDY:
+                        result_cache.store(result, cache_key, batch[i:i + 1], variant=variant)
+                    line.update(result)
+                else:
+                    line["error"] = errors[i]
+                yield json.dumps(line) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+# Function to get AI-generated remedy
+async def get_ai_prescription(disease: str, lang: str = "en") -> str:
+    return await remedy_store.get(disease, lang)
+
+
+# Remedy store coverage and hit/miss counters
+@router.get("/remedies/stats")
+def remedy_stats():
+    return remedy_store.stats()
+
+
+# Micro-batching metrics (batch size, queue depth, wait time)
+@router.get("/batching/stats")
+def batching_stats():
+    return engine.batcher.stats() if engine.ready else {"loaded": False}
+
+
+# Prediction cache hit/miss counters
+@router.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats() if result_cache else {"enabled": False}
+
+
+# Health check route; "ready" turns true once the model has loaded
 @router.get("/health")
 def health():
-    return {"status": "Backend is running"}
+    status = {"status": "Backend is running", **engine.status()}
+    if cascade.enabled:
+        status["cascade"] = cascade.status()
+    return status
 
 
 
@@ -0,0 +1,27 @@
+"""Search routes for the CropCareAI backend."""
+import os
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db, schemas
+from ..search import search_index
+
+router = APIRouter()
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+# Ranked results can't use keyset pages; a cap on the offset keeps deep pages cheap
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", "1000"))
+
+
+# Ranked matches across posts, FAQs and help posts; every word is matched as a prefix
+@router.get("", response_model=schemas.SearchResults)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    db: AsyncSession = Depends(get_async_db),
+):
+    total, hits = await search_index.search(db, q, limit, offset)
+    next_offset = offset + limit if offset + limit < min(total, SEARCH_MAX_OFFSET + limit) else None
+    return {"query": q, "total": total, "results": hits, "next_offset": next_offset}
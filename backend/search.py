@@ -0,0 +1,313 @@
+# backend/search.py
+"""Full-text search over community posts, FAQs and help posts.
+
+Three interchangeable indexes with the same interface:
+
+* ``PostgresSearchIndex`` - a ``search_documents`` table with a weighted
+  ``tsvector`` column and a GIN index, ranked by ``ts_rank_cd``.
+* ``SQLiteSearchIndex`` - an FTS5 virtual table ranked by BM25, for local
+  SQLite databases.
+* ``MemorySearchIndex`` - an in-process inverted index with BM25 scoring,
+  rebuilt from the database at startup; the fallback when neither is available.
+
+Every query term is matched as a prefix ("tom blig" finds "tomato blight"),
+all terms must match, and titles weigh more than bodies. New posts and FAQs
+are indexed as they're created; ``python -m backend.search --rebuild``
+re-indexes everything.
+
+Configuration (environment):
+    SEARCH_BACKEND   auto (default), postgres, sqlite or memory
+"""
+import argparse
+import asyncio
+import bisect
+import heapq
+import math
+import os
+import sqlite3
+import threading
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import make_url
+
+from .chat_cache import normalize_query
+from .database import DATABASE_URL, AsyncSessionLocal, models
+
+# Stable small codes so (doc_type, doc_id) packs into one integer key
+DOC_TYPES = {"post": 1, "faq": 2, "help": 3}
+SNIPPET_LENGTH = 200
+MAX_QUERY_TERMS = 8
+
+
+def query_terms(query: str):
+    """Distinct normalized words of ``query``, at most MAX_QUERY_TERMS of them."""
+    return list(dict.fromkeys(normalize_query(query).split()))[:MAX_QUERY_TERMS]
+
+
+async def load_documents(db):
+    """Yield ``(doc_type, doc_id, title, body)`` for everything searchable."""
+    sources = (
+        ("post", select(models.Post.id, models.Post.content).where(models.Post.is_deleted.is_(False))),
+        ("faq", select(models.FAQ.id, models.FAQ.question, models.FAQ.answer)),
+        ("help", select(models.HelpPost.id, models.HelpPost.title, models.HelpPost.description)),
+    )
+    for doc_type, stmt in sources:
+        async for row in await db.stream(stmt.execution_options(yield_per=5000)):
+            if doc_type == "post":
+                yield doc_type, row[0], "", row[1] or ""
+            else:
+                yield doc_type, row[0], row[1] or "", row[2] or ""
+
+
+class MemorySearchIndex:
+    """Inverted index with BM25 scoring, held in this process."""
+
+    name = "memory"
+    k1 = 1.2
+    b = 0.75
+    max_expansions = 64  # vocabulary words a single prefix may expand to
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}      # token -> {doc: term frequency}
+        self._vocab = []         # sorted tokens, for prefix lookups
+        self._docs = {}          # doc -> (doc_type, doc_id, title, snippet)
+        self._doc_tokens = {}    # doc -> tokens, to unindex on update
+        self._lengths = {}
+        self._total_length = 0
+
+    async def setup(self):
+        async with AsyncSessionLocal() as db:
+            async for doc in load_documents(db):
+                self.add_document(*doc)
+
+    async def add(self, db, doc_type, doc_id, title, body):
+        self.add_document(doc_type, doc_id, title, body)
+
+    async def search(self, db, query, limit, offset):
+        return self.search_terms(query_terms(query), limit, offset)
+
+    def add_document(self, doc_type, doc_id, title, body):
+        key = doc_id * 8 + DOC_TYPES[doc_type]
+        counts = {}
+        # Title words count twice, which is how they outrank body words
+        for token in normalize_query(title).split() * 2 + normalize_query(body).split():
+            counts[token] = counts.get(token, 0) + 1
+        with self._lock:
+            self._remove(key)
+            for token, tf in counts.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._vocab, token)
+                postings[key] = tf
+            length = sum(counts.values())
+            self._docs[key] = (doc_type, doc_id, title, body[:SNIPPET_LENGTH])
+            self._doc_tokens[key] = tuple(counts)
+            self._lengths[key] = length
+            self._total_length += length
+
+    def _remove(self, key):
+        for token in self._doc_tokens.pop(key, ()):
+            self._postings[token].pop(key, None)
+        self._total_length -= self._lengths.pop(key, 0)
+        self._docs.pop(key, None)
+
+    def _expand(self, prefix):
+        start = bisect.bisect_left(self._vocab, prefix)
+        end = bisect.bisect_left(self._vocab, prefix + "\uffff", lo=start)
+        return self._vocab[start:min(end, start + self.max_expansions)]
+
+    def search_terms(self, terms, limit, offset):
+        with self._lock:
+            if not terms or not self._docs:
+                return 0, []
+            n = len(self._docs)
+            avg_length = self._total_length / n
+            expanded = [[self._postings[token] for token in self._expand(term)] for term in terms]
+            # Rarest term first keeps the running candidate set small
+            expanded.sort(key=lambda lists: sum(map(len, lists)))
+            scores = None
+            for postings_lists in expanded:
+                term_scores = {}
+                for postings in postings_lists:
+                    idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc, tf in postings.items():
+                        if scores is not None and doc not in scores:
+                            continue
+                        norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / avg_length)
+                        term_scores[doc] = term_scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                scores = term_scores if scores is None else {doc: scores[doc] + s for doc, s in term_scores.items()}
+                if not scores:
+                    return 0, []
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])[offset:]
+            return len(scores), [self._hit(self._docs[doc], score) for doc, score in top]
+
+    @staticmethod
+    def _hit(doc, score):
+        doc_type, doc_id, title, snippet = doc
+        return {"type": doc_type, "id": doc_id, "title": title, "snippet": snippet, "score": round(score, 4)}
+
+    def __len__(self):
+        return len(self._docs)
+
+
+class SQLiteSearchIndex:
+    """FTS5 table in the application's SQLite database."""
+
+    name = "sqlite"
+    # bm25 column weights: doc_type, doc_id (unindexed), title, body
+    RANK = "bm25(search_fts, 0.0, 0.0, 2.0, 1.0)"
+
+    async def setup(self):
+        async with AsyncSessionLocal() as db:
+            await db.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+                "doc_type UNINDEXED, doc_id UNINDEXED, title, body, tokenize='porter unicode61', prefix='2 3')"
+            ))
+            if not (await db.execute(text("SELECT count(*) FROM search_fts"))).scalar():
+                await self.add_all(db, load_documents(db))
+            await db.commit()
+
+    async def add_all(self, db, documents, batch_size=5000):
+        batch = []
+        async for doc_type, doc_id, title, body in documents:
+            batch.append({"rowid": doc_id * 8 + DOC_TYPES[doc_type], "doc_type": doc_type, "doc_id": doc_id, "title": title, "body": body})
+            if len(batch) >= batch_size:
+                await self._insert(db, batch)
+                batch = []
+        if batch:
+            await self._insert(db, batch)
+
+    async def _insert(self, db, rows):
+        await db.execute(text("DELETE FROM search_fts WHERE rowid = :rowid"), [{"rowid": row["rowid"]} for row in rows])
+        await db.execute(text(
+            "INSERT INTO search_fts (rowid, doc_type, doc_id, title, body) VALUES (:rowid, :doc_type, :doc_id, :title, :body)"
+        ), rows)
+
+    async def add(self, db, doc_type, doc_id, title, body):
+        await self._insert(db, [{"rowid": doc_id * 8 + DOC_TYPES[doc_type], "doc_type": doc_type, "doc_id": doc_id, "title": title, "body": body}])
+
+    async def search(self, db, query, limit, offset):
+        terms = query_terms(query)
+        if not terms:
+            return 0, []
+        # Terms are \w+ only, so quoting them can't break the MATCH syntax
+        match = " AND ".join(f'"{term}"*' for term in terms)
+        total = (await db.execute(text("SELECT count(*) FROM search_fts WHERE search_fts MATCH :match"), {"match": match})).scalar()
+        rows = await db.execute(text(
+            f"SELECT doc_type, doc_id, title, substr(body, 1, {SNIPPET_LENGTH}), -{self.RANK} FROM search_fts "
+            f"WHERE search_fts MATCH :match ORDER BY {self.RANK} LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset})
+        return total, [
+            {"type": doc_type, "id": doc_id, "title": title, "snippet": snippet, "score": round(score, 4)}
+            for doc_type, doc_id, title, snippet, score in rows
+        ]
+
+
+class PostgresSearchIndex:
+    """``search_documents`` table with a stored, weighted tsvector and a GIN index."""
+
+    name = "postgres"
+
+    async def setup(self):
+        async with AsyncSessionLocal() as db:
+            await db.execute(text(
+                "CREATE TABLE IF NOT EXISTS search_documents ("
+                " doc_type varchar(8) NOT NULL, doc_id integer NOT NULL,"
+                " title text NOT NULL DEFAULT '', body text NOT NULL DEFAULT '',"
+                " tsv tsvector GENERATED ALWAYS AS ("
+                "  setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')"
+                " ) STORED,"
+                " PRIMARY KEY (doc_type, doc_id))"
+            ))
+            await db.execute(text("CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)"))
+            if (await db.execute(text("SELECT NOT EXISTS (SELECT 1 FROM search_documents)"))).scalar():
+                await self.add_all(db, load_documents(db))
+            await db.commit()
+
+    UPSERT = text(
+        "INSERT INTO search_documents (doc_type, doc_id, title, body) VALUES (:doc_type, :doc_id, :title, :body) "
+        "ON CONFLICT (doc_type, doc_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body"
+    )
+
+    async def add_all(self, db, documents, batch_size=5000):
+        batch = []
+        async for doc_type, doc_id, title, body in documents:
+            batch.append({"doc_type": doc_type, "doc_id": doc_id, "title": title, "body": body})
+            if len(batch) >= batch_size:
+                await db.execute(self.UPSERT, batch)
+                batch = []
+        if batch:
+            await db.execute(self.UPSERT, batch)
+
+    async def add(self, db, doc_type, doc_id, title, body):
+        await db.execute(self.UPSERT, {"doc_type": doc_type, "doc_id": doc_id, "title": title, "body": body})
+
+    async def search(self, db, query, limit, offset):
+        terms = query_terms(query)
+        if not terms:
+            return 0, []
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        rows = (await db.execute(text(
+            f"SELECT doc_type, doc_id, title, left(body, {SNIPPET_LENGTH}), ts_rank_cd(tsv, q) AS score, count(*) OVER () "
+            "FROM search_documents, to_tsquery('english', :tsquery) q "
+            "WHERE tsv @@ q ORDER BY score DESC, doc_id LIMIT :limit OFFSET :offset"
+        ), {"tsquery": tsquery, "limit": limit, "offset": offset})).all()
+        if not rows and offset:
+            # Past the last page the window count is gone with the rows
+            total = (await db.execute(text(
+                "SELECT count(*) FROM search_documents WHERE tsv @@ to_tsquery('english', :tsquery)"
+            ), {"tsquery": tsquery})).scalar()
+            return total, []
+        return (rows[0][5] if rows else 0), [
+            {"type": doc_type, "id": doc_id, "title": title, "snippet": snippet, "score": round(float(score), 4)}
+            for doc_type, doc_id, title, snippet, score, _ in rows
+        ]
+
+
+def fts5_available():
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def from_env():
+    kind = os.getenv("SEARCH_BACKEND", "auto").lower()
+    if kind == "auto":
+        backend = make_url(DATABASE_URL).get_backend_name()
+        if backend == "postgresql":
+            kind = "postgres"
+        elif backend == "sqlite" and fts5_available():
+            kind = "sqlite"
+        else:
+            kind = "memory"
+    return {"postgres": PostgresSearchIndex, "sqlite": SQLiteSearchIndex}.get(kind, MemorySearchIndex)()
+
+
+search_index = from_env()
+
+
+async def rebuild():
+    """Re-index every post, FAQ and help post (backfill, or repair after direct DB edits)."""
+    if isinstance(search_index, MemorySearchIndex):
+        await search_index.setup()
+        return len(search_index)
+    async with AsyncSessionLocal() as db:
+        await search_index.add_all(db, load_documents(db))
+        await db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the search index")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index all documents")
+    args = parser.parse_args()
+    if args.rebuild:
+        asyncio.run(rebuild())
+        print(f"Rebuilt the {search_index.name} search index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# backend/sms.py
+"""Outgoing SMS through one long-lived transport.
+
+Configuration (environment):
+    SMS_TRANSPORT         twilio (default) or stub
+    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
+    SMS_POOL_SIZE         pooled HTTPS connections to Twilio (default 10)
+    SMS_TIMEOUT           seconds to wait on a Twilio HTTP request (default 10)
+"""
+import asyncio
+import os
+from collections import deque
+
+from dotenv import load_dotenv
+
+from .jobs import mask
+
+load_dotenv()
+
+
+class TwilioTransport:
+    """
+    A single Twilio client reused for every message.
+
+    The client and its keep-alive connection pool are built on first use, so
+    importing this module doesn't need credentials.
+    """
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None, pool_size=None, timeout=None):
+        self.account_sid = account_sid or os.getenv("TWILIO_ACCOUNT_SID")
+        self.auth_token = auth_token or os.getenv("TWILIO_AUTH_TOKEN")
+        self.from_number = from_number or os.getenv("TWILIO_PHONE_NUMBER")
+        self.pool_size = pool_size or int(os.getenv("SMS_POOL_SIZE", "10"))
+        self.timeout = timeout or float(os.getenv("SMS_TIMEOUT", "10"))
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            if not self.account_sid or not self.auth_token or not self.from_number:
+                raise RuntimeError("Twilio credentials not set in environment variables")
+            from requests.adapters import HTTPAdapter
+            from twilio.http.http_client import TwilioHttpClient
+            from twilio.rest import Client
+
+            # Bounded, so a hung request can't hold a job worker's thread past the job timeout for long
+            http_client = TwilioHttpClient(pool_connections=True, timeout=self.timeout)
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            http_client.session.mount("https://", adapter)
+            self._client = Client(self.account_sid, self.auth_token, http_client=http_client)
+        return self._client
+
+    def _send(self, to, body):
+        return self._get_client().messages.create(body=body, from_=self.from_number, to=to).sid
+
+    async def send(self, to, body):
+        # The Twilio SDK is blocking; run it on a thread so the event loop keeps serving
+        return await asyncio.to_thread(self._send, to, body)
+
+
+class StubTransport:
+    """Records messages instead of sending them, for tests and local development."""
+
+    def __init__(self, fail_times=0):
+        self.sent = deque(maxlen=1000)
+        self.fail_times = fail_times
+
+    async def send(self, to, body):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("stub transport failure")
+        self.sent.append({"to": to, "body": body})
+        return f"stub-{len(self.sent)}"
+
+
+def from_env():
+    if os.getenv("SMS_TRANSPORT", "twilio").lower() == "stub":
+        return StubTransport()
+    return TwilioTransport()
+
+
+transport = from_env()
+
+
+async def send_sms(to, body):
+    """``sms`` job handler."""
+    await transport.send(to, body)
+
+
+def redact_sms(to, body):
+    """Dead-letter record of an ``sms`` job: the body may hold an OTP and is left out."""
+    return {"to": mask(to), "body_length": len(body)}
@@ -0,0 +1,17 @@
+# backend/tests/conftest.py
+"""Every test runs against one throwaway SQLite file.
+
+The database module reads DATABASE_URL at import, so it is set here, before
+any test module imports ``backend``.
+"""
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="cropcare-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.sqlite3')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+# The API without TensorFlow, SMS or a second worker
+os.environ["ENABLE_PREDICT"] = "0"
+os.environ["PREDICT_WARMUP"] = "0"
+os.environ["SMS_TRANSPORT"] = "stub"
+os.environ.pop("WEB_CONCURRENCY", None)
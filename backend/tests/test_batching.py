@@ -0,0 +1,56 @@
+# backend/tests/test_batching.py
+"""The micro-batcher must survive callers that give up on their request."""
+import asyncio
+import threading
+
+import numpy as np
+
+from ..inference.batching import MicroBatcher
+
+
+def slow_model(release):
+    def predict(inputs):
+        release.wait(5)
+        return inputs * 2
+    return predict
+
+
+def test_cancelled_waiters_do_not_stall_the_batcher():
+    release = threading.Event()
+    batcher = MicroBatcher(slow_model(release), max_batch_size=1, max_wait_ms=0).start()
+
+    async def run():
+        # One request inside the running batch, one still queued behind it
+        in_flight = asyncio.ensure_future(asyncio.wrap_future(batcher.submit(np.ones((1, 2)))))
+        queued = asyncio.ensure_future(asyncio.wrap_future(batcher.submit(np.ones((1, 2)))))
+        await asyncio.sleep(0.05)
+        in_flight.cancel()
+        queued.cancel()
+        await asyncio.gather(in_flight, queued, return_exceptions=True)
+        release.set()
+        return await asyncio.wait_for(asyncio.wrap_future(batcher.submit(np.full((1, 2), 3.0))), 5)
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        batcher.stop(timeout=5)
+    assert result.tolist() == [[6.0, 6.0]]
+    assert batcher.stats()["requests"] == 2  # the cancelled queued request was never run
+
+
+def test_failed_batch_keeps_the_thread_alive():
+    calls = []
+
+    def flaky(inputs):
+        calls.append(len(inputs))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return inputs
+
+    batcher = MicroBatcher(flaky, max_batch_size=1, max_wait_ms=0).start()
+    try:
+        first = batcher.submit(np.ones((1, 1)))
+        assert isinstance(first.exception(timeout=5), RuntimeError)
+        assert batcher.predict(np.ones((1, 1)), timeout=5).tolist() == [[1.0]]
+    finally:
+        batcher.stop(timeout=5)
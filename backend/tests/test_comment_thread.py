@@ -0,0 +1,80 @@
+# backend/tests/test_comment_thread.py
+"""N+1 guard for ``comment_thread``: the statement count must not grow with the thread."""
+import asyncio
+
+import pytest
+
+from ..benchmarks.bench_comments import EXPECTED_QUERIES, count_queries, seed_thread
+from ..database import AsyncSessionLocal, Base, engine, get_async_engine, models
+from ..routes.community import comment_thread
+
+SIZES = [1, 10, 100, 1000]
+USERS = 20
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(models.Post.__table__.insert(), [
+            {"id": post_id, "user_id": 1, "content": f"post {post_id}"} for post_id in range(1, len(SIZES) + 2)
+        ])
+    for post_id, size in enumerate(SIZES, start=1):
+        seed_thread(post_id, size, USERS, seed=post_id)
+    # One reply chain deeper than THREAD_MAX_DEPTH, so the cut-off path runs too
+    chain_post = len(SIZES) + 1
+    with engine.begin() as conn:
+        conn.execute(models.Comment.__table__.insert(), [
+            {"id": chain_post * 1_000_000 + i, "post_id": chain_post, "user_id": 1 + i % USERS,
+             "parent_id": chain_post * 1_000_000 + i - 1 if i else None, "content": f"reply {i}"}
+            for i in range(50)
+        ])
+    yield
+    engine.dispose()
+
+
+def statements_for(post_id, **options):
+    async def run():
+        try:
+            async with AsyncSessionLocal() as db:
+                with count_queries(get_async_engine().sync_engine) as statements:
+                    thread, _ = await comment_thread(db, post_id, **options)
+            return thread, statements
+        finally:
+            # The async engine's connections belong to this event loop
+            await get_async_engine().dispose()
+
+    return asyncio.run(run())
+
+
+def count(nodes):
+    return sum(1 + count(node["replies"]) for node in nodes)
+
+
+@pytest.mark.parametrize("post_id,size", list(enumerate(SIZES, start=1)))
+def test_thread_is_two_statements(post_id, size):
+    thread, statements = statements_for(post_id, limit=size)
+    # Replies below THREAD_MAX_DEPTH are cut off, so a random tree may return a few less
+    assert 0 < count(thread) <= size
+    assert len(statements) == EXPECTED_QUERIES
+
+
+def test_paged_thread_is_two_statements():
+    post_id = SIZES.index(1000) + 1
+    thread, statements = statements_for(post_id, limit=10)
+    assert 10 <= count(thread) < 1000
+    assert len(statements) == EXPECTED_QUERIES
+
+
+def test_deep_thread_is_two_statements():
+    thread, statements = statements_for(len(SIZES) + 1)
+    assert len(statements) == EXPECTED_QUERIES
+    node, depth = thread[0], 0
+    while node["replies"]:
+        node, depth = node["replies"][0], depth + 1
+    assert node.get("has_more_replies")
+    assert depth < 50
@@ -0,0 +1,63 @@
+# backend/tests/test_community.py
+"""Community writes answer 4xx for unknown users, posts and parent comments (not a 500)."""
+import pytest
+from fastapi.testclient import TestClient
+
+from ..database import Base, engine, models
+from ..main import app
+
+USER_ID = 2000
+MISSING_USER = 999999
+
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": USER_ID, "username": "commenter", "email": "commenter@example.com", "password_hash": "x"},
+        ])
+    with TestClient(app) as client:
+        yield client
+
+
+def new_post(client):
+    response = client.post("/community/posts", json={"user_id": USER_ID, "content": "a post"})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_post_from_unknown_user_is_404(client):
+    response = client.post("/community/posts", json={"user_id": MISSING_USER, "content": "ghost"})
+    assert response.status_code == 404
+
+
+def test_comment_checks_user_and_parent(client):
+    post_id, other_post_id = new_post(client), new_post(client)
+    url = f"/community/posts/{post_id}/comments"
+    parent = client.post(url, json={"user_id": USER_ID, "content": "parent"})
+    assert parent.status_code == 200
+    parent_id = parent.json()["id"]
+
+    assert client.post(url, json={"user_id": USER_ID, "content": "reply", "parent_id": parent_id}).status_code == 200
+    assert client.post(url, json={"user_id": MISSING_USER, "content": "ghost"}).status_code == 404
+    assert client.post(url, json={"user_id": USER_ID, "content": "orphan", "parent_id": 999999}).status_code == 404
+    elsewhere = client.post(
+        f"/community/posts/{other_post_id}/comments",
+        json={"user_id": USER_ID, "content": "cross-post", "parent_id": parent_id},
+    )
+    assert elsewhere.status_code == 400
+
+
+def test_like_from_unknown_user_is_404_and_not_stored(client):
+    post_id = new_post(client)
+    url = f"/community/posts/{post_id}/like"
+    assert client.post(url, json={"user_id": MISSING_USER}).status_code == 404
+    assert client.post(url, json={"user_id": USER_ID}).status_code == 200
+    again = client.post(url, json={"user_id": USER_ID})
+    assert again.status_code == 200
+    with engine.connect() as conn:
+        likes = conn.execute(
+            models.Like.__table__.select().where(models.Like.target_id == post_id)
+        ).fetchall()
+    assert [like.user_id for like in likes] == [USER_ID]
@@ -0,0 +1,47 @@
+# backend/tests/test_feed.py
+"""Paging the community feed through the API: every post once, then the end."""
+import pytest
+from fastapi.testclient import TestClient
+
+from ..database import Base, engine, models
+from ..main import app
+
+USER_ID = 1000
+
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": USER_ID, "username": "feeder", "email": "feeder@example.com", "password_hash": "x"},
+        ])
+    with TestClient(app) as client:
+        yield client
+
+
+def read_feed(client, limit):
+    pages, cursor = [], None
+    while len(pages) < 100:
+        response = client.get("/community/posts", params={"limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([post["id"] for post in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+    pytest.fail(f"feed did not end: {pages[:5]}...")
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_feed_pages_posts_created_through_the_api(client, limit):
+    # Created back to back, so several share a second (what broke the SQLite cursor)
+    created = [
+        client.post("/community/posts", json={"user_id": USER_ID, "content": f"post {i} at limit {limit}"}).json()["id"]
+        for i in range(5)
+    ]
+    pages = read_feed(client, limit)
+    seen = [post_id for page in pages for post_id in page]
+    assert len(seen) == len(set(seen)), f"repeated posts: {pages}"
+    assert all(len(page) <= limit for page in pages)
+    mine = [post_id for post_id in seen if post_id in created]
+    assert mine == sorted(created, reverse=True)
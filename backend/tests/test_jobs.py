@@ -0,0 +1,51 @@
+# backend/tests/test_jobs.py
+"""Job queue: slow attempts time out, and nothing pending is dropped silently at shutdown."""
+import asyncio
+import json
+
+from ..jobs import JobQueue
+
+
+def read_dead_letters(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_slow_attempt_times_out_and_is_dead_lettered(tmp_path):
+    path = str(tmp_path / "dead.jsonl")
+
+    async def run():
+        queue = JobQueue(workers=1, max_retries=0, timeout=0.05, dead_letter_path=path)
+
+        async def hang():
+            await asyncio.sleep(10)
+        queue.register("hang", hang)
+        queue.enqueue("hang")
+        await queue.stop(timeout=1.0)
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["failed"] == 1
+    [record] = read_dead_letters(path)
+    assert record["job"] == "hang" and record["error"].startswith("TimeoutError")
+
+
+def test_job_in_retry_backoff_is_dead_lettered_at_shutdown(tmp_path):
+    path = str(tmp_path / "dead.jsonl")
+
+    async def run():
+        queue = JobQueue(workers=1, max_retries=3, retry_base=60, dead_letter_path=path)
+
+        async def fail(to):
+            raise ConnectionError("upstream down")
+        queue.register("sms", fail, redact=lambda to: {"to": to[-2:]})
+        queue.enqueue("sms", to="+911234")
+        while not queue.stats()["retrying"]:
+            await asyncio.sleep(0.01)
+        await queue.stop(timeout=0.1)
+
+    asyncio.run(run())
+    [record] = read_dead_letters(path)
+    assert record["note"] == "not retried: shutting down"
+    assert record["attempts"] == 1 and record["details"] == {"to": "34"}
+    assert "upstream down" in record["error"]
@@ -0,0 +1,31 @@
+# backend/tests/test_otp_store.py
+"""OTP store: rate-limit and attempt counters expire with their window; one-process stores need one worker."""
+import asyncio
+
+import pytest
+
+from .. import otp_store
+
+
+def test_rate_limit_counter_carries_its_window():
+    async def run():
+        redis = otp_store.FakeRedis()
+        store = otp_store.RedisOTPStore(redis, rate_limit=2, rate_window=60)
+        await store.issue("+911", "111111")
+        await store.issue("+911", "222222")
+        with pytest.raises(otp_store.OTPRateLimited):
+            await store.issue("+911", "333333")
+        assert 0 < await redis.ttl("otp:sends:+911") <= 60
+        assert await store.verify("+911", "000000") == otp_store.INVALID
+        assert 0 < await redis.ttl("otp:attempts:+911") <= store.ttl
+        assert await store.verify("+911", "222222") == otp_store.VALID
+    asyncio.run(run())
+
+
+def test_per_process_store_refused_with_several_workers(monkeypatch):
+    monkeypatch.setenv("OTP_STORE", "memory")
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    with pytest.raises(RuntimeError):
+        otp_store.from_env()
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert isinstance(otp_store.from_env(), otp_store.MemoryOTPStore)
@@ -0,0 +1,32 @@
+# backend/tests/test_prediction_jobs.py
+"""Prediction job queue: uploads count against a byte budget, and stop() gives back every claimed job."""
+import asyncio
+
+import pytest
+
+from ..prediction_jobs import QUEUED, PredictionJobRunner, PredictionJobsFull, PredictionJobStore
+
+
+def test_pending_uploads_are_capped_by_size(tmp_path):
+    store = PredictionJobStore(str(tmp_path / "jobs.sqlite3"), max_pending=100, max_pending_bytes=1000)
+    store.create(b"x" * 600, {})
+    with pytest.raises(PredictionJobsFull):
+        store.create(b"x" * 600, {})
+    store.create(b"x" * 400, {})
+    store.close()
+
+
+def test_stop_requeues_a_job_claimed_during_cancellation(tmp_path):
+    store = PredictionJobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create(b"image", {"lang": "en"})
+
+    async def run():
+        runner = PredictionJobRunner(store)
+        # What a worker's claim thread leaves behind when its task is cancelled mid-claim
+        assert (await asyncio.to_thread(runner._claim))[0] == job_id
+        await runner.stop()
+
+    asyncio.run(run())
+    job = store.get(job_id)
+    assert job["status"] == QUEUED and job["attempts"] == 0
+    store.close()
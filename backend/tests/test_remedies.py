@@ -0,0 +1,30 @@
+# backend/tests/test_remedies.py
+"""Remedy store: workers sharing one file keep each other's remedies; unknown languages are refused."""
+import asyncio
+import json
+
+import pytest
+
+from ..remedies import RemedyStore
+
+
+async def never_called(disease, lang):
+    raise AssertionError("the LLM should not be asked")
+
+
+def test_stores_sharing_a_file_merge_their_remedies(tmp_path):
+    path = str(tmp_path / "remedies.json")
+    first, second = RemedyStore(path, never_called), RemedyStore(path, never_called)
+    first.put("Tomato___Early_blight", "en", "copper spray")
+    second.put("Potato___Late_blight", "hi", "fungicide")
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved == {"en": {"Tomato___Early_blight": "copper spray"}, "hi": {"Potato___Late_blight": "fungicide"}}
+    assert RemedyStore(path, never_called).lookup("Tomato___Early_blight") == "copper spray"
+
+
+def test_unsupported_language_is_refused(tmp_path):
+    store = RemedyStore(str(tmp_path / "remedies.json"), never_called)
+    with pytest.raises(ValueError):
+        asyncio.run(store.get("Tomato___Early_blight", "xx"))
+    assert not (tmp_path / "remedies.json").exists()
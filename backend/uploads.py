@@ -0,0 +1,245 @@
+# backend/uploads.py
+"""Bounded, early-rejecting ingestion of image uploads.
+
+``UploadLimitMiddleware`` caps the request body of upload routes while it is
+still arriving: an oversized ``Content-Length`` is answered with 413 before
+any of the body is read, and a body that keeps streaming past the cap is
+cut off as soon as it crosses it.
+
+That middleware is the only network-level limit. Starlette's multipart
+parser spools every uploaded file (in memory, then in a temporary file) before
+the route runs, so by the time ``read_image`` sees an upload, the whole
+request body up to the cap has already been received.
+
+``read_image`` then copies one spooled file into memory in chunks. It stops at
+UPLOAD_MAX_BYTES, sniffs the format from the magic bytes of the first
+chunk, and parses the width and height from the JPEG/PNG header as soon as
+they arrive. Files that aren't images, or whose header declares more than
+UPLOAD_MAX_PIXELS (decompression bombs: a small file that would decode to
+gigabytes), are rejected before the rest of the spooled file is copied and
+before PIL ever sees them.
+
+Configuration (environment):
+    UPLOAD_MAX_BYTES          largest single image in bytes (default 10 MiB)
+    UPLOAD_MAX_PIXELS         largest width x height an image may declare (default 50,000,000)
+    BATCH_UPLOAD_MAX_BYTES    largest batch request (all files and archives) in bytes (default 200 MiB)
+    UPLOAD_CHUNK_SIZE         bytes read per chunk (default 64 KiB)
+"""
+import os
+import struct
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", "50000000"))
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+# Room for multipart boundaries, part headers and small form fields around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06")
+
+# JPEG start-of-frame markers carry the dimensions; C4 (DHT), C8 (JPG) and CC (DAC) share the range but don't
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+# Give up looking for the dimensions this far into a JPEG (EXIF and ICC blocks come first)
+_MAX_HEADER_BYTES = 1024 * 1024
+
+
+class UploadRejected(HTTPException):
+    """An upload refused before decoding; the status is 400, 413 or 415."""
+
+
+class ImageHeader:
+    __slots__ = ("format", "width", "height")
+
+    def __init__(self, format, width, height):
+        self.format = format
+        self.width = width
+        self.height = height
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+
+def sniff(data: bytes):
+    """"jpeg", "png" or "zip" from the leading magic bytes, else None."""
+    if data.startswith(JPEG_MAGIC):
+        return "jpeg"
+    if data.startswith(PNG_MAGIC):
+        return "png"
+    if data.startswith(ZIP_MAGICS):
+        return "zip"
+    return None
+
+
+def _png_header(data: bytes):
+    # Signature, then the IHDR chunk: length, b"IHDR", width, height
+    if len(data) < 24:
+        return None
+    if data[12:16] != b"IHDR":
+        raise UploadRejected(status_code=400, detail="Could not decode image")
+    width, height = struct.unpack(">II", data[16:24])
+    return ImageHeader("png", width, height)
+
+
+def _jpeg_header(data: bytes):
+    offset = 2
+    while True:
+        # Markers are 0xFF followed by the marker byte; extra 0xFF fill bytes are allowed
+        while offset < len(data) and data[offset] == 0xFF:
+            offset += 1
+        if offset >= len(data):
+            return None
+        marker = data[offset]
+        offset += 1
+        if marker in _STANDALONE_MARKERS:
+            continue
+        if marker == 0xDA or marker == 0xD9:
+            # Start of scan / end of image with no frame header
+            raise UploadRejected(status_code=400, detail="Could not decode image")
+        if offset + 2 > len(data):
+            return None
+        (length,) = struct.unpack(">H", data[offset:offset + 2])
+        if marker in _SOF_MARKERS:
+            if offset + 7 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[offset + 3:offset + 7])
+            return ImageHeader("jpeg", width, height)
+        offset += length
+
+
+def parse_header(data: bytes):
+    """
+    The image's format and declared dimensions from its first bytes.
+
+    Returns None while ``data`` is too short to tell; raises ``UploadRejected``
+    for anything that isn't a JPEG or PNG.
+    """
+    kind = sniff(data)
+    if kind == "jpeg":
+        return _jpeg_header(data)
+    if kind == "png":
+        return _png_header(data)
+    if len(data) < len(PNG_MAGIC) and (JPEG_MAGIC.startswith(data[:3]) or PNG_MAGIC.startswith(data)):
+        return None
+    raise UploadRejected(status_code=415, detail="Unsupported file type; upload a JPEG or PNG image")
+
+
+def check_image(data: bytes, max_pixels=UPLOAD_MAX_PIXELS) -> ImageHeader:
+    """Validate an image that is already in memory (e.g. a zip member)."""
+    header = parse_header(data[:_MAX_HEADER_BYTES])
+    if header is None:
+        raise UploadRejected(status_code=400, detail="Could not decode image")
+    _check_dimensions(header, max_pixels)
+    return header
+
+
+def _check_dimensions(header, max_pixels):
+    if header.width == 0 or header.height == 0:
+        raise UploadRejected(status_code=400, detail="Could not decode image")
+    if header.pixels > max_pixels:
+        raise UploadRejected(
+            status_code=413,
+            detail=f"Image is {header.width}x{header.height}; at most {max_pixels} pixels are accepted",
+        )
+
+
+async def _read_limited(upload: UploadFile, max_bytes: int, inspect=None) -> bytes:
+    # The multipart parser knows the size of spooled files; reject those without reading them
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadRejected(status_code=413, detail=f"{upload.filename} is larger than {max_bytes} bytes")
+    buffer = bytearray()
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise UploadRejected(status_code=413, detail=f"{upload.filename} is larger than {max_bytes} bytes")
+        if inspect is not None and inspect(buffer):
+            inspect = None
+    if inspect is not None and not inspect(buffer, final=True):
+        raise UploadRejected(status_code=400, detail="Could not decode image")
+    return bytes(buffer)
+
+
+async def read_image(upload: UploadFile, max_bytes=UPLOAD_MAX_BYTES, max_pixels=UPLOAD_MAX_PIXELS) -> bytes:
+    """Read one (already spooled) image upload, rejecting oversized, non-image and bomb files from the header."""
+
+    def inspect(buffer, final=False):
+        header = parse_header(bytes(buffer[:_MAX_HEADER_BYTES]))
+        if header is None:
+            if len(buffer) >= _MAX_HEADER_BYTES:
+                raise UploadRejected(status_code=400, detail="Could not decode image")
+            return False
+        _check_dimensions(header, max_pixels)
+        return True
+
+    return await _read_limited(upload, max_bytes, inspect)
+
+
+async def read_archive(upload: UploadFile, max_bytes=BATCH_UPLOAD_MAX_BYTES) -> bytes:
+    """Read a zip upload with a size cap, rejecting anything that doesn't start like a zip."""
+
+    def inspect(buffer, final=False):
+        if len(buffer) < 4 and not final:
+            return False
+        if sniff(bytes(buffer[:4])) != "zip":
+            raise UploadRejected(status_code=415, detail=f"{upload.filename} is not a zip archive")
+        return True
+
+    return await _read_limited(upload, max_bytes, inspect)
+
+
+class UploadLimitMiddleware:
+    """
+    Pure ASGI middleware capping request bodies per path, e.g.
+    ``{"/predict/predict": UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD}``.
+
+    A declared ``Content-Length`` over the cap gets 413 without the body being
+    read; a chunked or understated body is cut off at the cap (FastAPI turns
+    the ``UploadRejected`` raised from ``receive`` into the 413 response).
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = dict(limits)
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                return await _reject(send, limit)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadRejected(status_code=413, detail=f"Request body is larger than {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def _reject(send, limit):
+    body = b'{"detail":"Request body is larger than %d bytes"}' % limit
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close")],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -76,9 +76,11 @@ export async function addComment(postId, commentData) {
 }
 
 // Like post
-export async function likePost(postId) {
+export async function likePost(postId, userId) {
   const res = await fetch(`${API_BASE_URL}/community/posts/${postId}/like`, {
     method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ user_id: userId }),
   });
   return res.json();
 }
@@ -124,8 +124,14 @@ const Community = () => {
 
   // Handle like
   const handleLike = async (postId: number) => {
+    // Likes are per user; the id is stored by the login page
+    const userId = Number(localStorage.getItem('userId'));
+    if (!userId) {
+      alert('Please sign in to like posts');
+      return;
+    }
     try {
-      await likePost(postId);
+      await likePost(postId, userId);
       setPosts((prev) =>
         prev.map((p) => (p.id === postId ? { ...p, likes: (p.likes || 0) + 1 } : p))
       );
@@ -87,6 +87,7 @@ const Login = () => {
     try {
       const res = await verifyOtp({ phone_number: phoneNumber, otp_code: otp });
       if (res.id) {
+        localStorage.setItem('userId', String(res.id));
         alert('OTP verified successfully!');
       } else {
         alert(res.detail || 'OTP verification failed');
@@ -101,6 +102,7 @@ const Login = () => {
     try {
       const res = await signupEmail({ name: 'User', email, password });
       if (res.id) {
+        localStorage.setItem('userId', String(res.id));
         alert('Signed up successfully!');
       } else {
         alert(res.detail || 'Signup failed');
@@ -115,6 +117,7 @@ const Login = () => {
     try {
       const res = await signupPhone({ name: 'User', phone_number: phoneNumber });
       if (res.id) {
+        localStorage.setItem('userId', String(res.id));
         alert('Phone signup successful!');
       } else {
         alert(res.detail || 'Signup failed');